@@ -0,0 +1,176 @@
+"""initial schema
+
+Revision ID: 3f1c2a9b7d10
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('username', sa.String(length=100), nullable=False),
+        sa.Column('password', sa.Text(), nullable=False),
+        sa.Column('full_name', sa.String(length=50), nullable=True),
+        sa.Column('gender', sa.String(length=10), nullable=True),
+        sa.Column('day_of_birth', sa.DateTime(), nullable=True),
+        sa.Column('bio', sa.Text(), nullable=True),
+        sa.Column('avatar_pic', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('phone_number', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_phone_number'), 'users', ['phone_number'], unique=True)
+
+    op.create_table(
+        'musics',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('singer', sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'posts',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('post_file', sa.Text(), nullable=True),
+        sa.Column('likes', sa.Integer(), nullable=True),
+        sa.Column('views', sa.Integer(), nullable=True),
+        sa.Column('access_to_views', sa.Boolean(), nullable=True),
+        sa.Column('access_to_likes', sa.Boolean(), nullable=True),
+        sa.Column('access_to_comments', sa.Boolean(), nullable=True),
+        sa.Column('owner_id', postgresql.UUID(), nullable=False),
+        sa.Column('music_id', postgresql.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['music_id'], ['musics.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'post_likes',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(), nullable=True),
+        sa.Column('post_id', postgresql.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'post_id', name='_user_post_like_uc')
+    )
+
+    op.create_table(
+        'comments',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('post_id', postgresql.UUID(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'comment_replies',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('comment_id', postgresql.UUID(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['comment_id'], ['comments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'comment_likes',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(), nullable=True),
+        sa.Column('comment_id', postgresql.UUID(), nullable=True),
+        sa.Column('comment_reply_id', postgresql.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['comment_id'], ['comments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['comment_reply_id'], ['comment_replies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'comment_id', name='_user_comment_like_uc')
+    )
+
+    op.create_table(
+        'codes',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(), nullable=True),
+        sa.Column('code', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'post_views',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(), nullable=True),
+        sa.Column('post_id', postgresql.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'post_id', name='_user_post_uc')
+    )
+
+    op.create_table(
+        'saves',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(), nullable=True),
+        sa.Column('post_id', postgresql.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'post_id', name='_user_save_uc')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('saves')
+    op.drop_table('post_views')
+    op.drop_table('codes')
+    op.drop_table('comment_likes')
+    op.drop_table('comment_replies')
+    op.drop_table('comments')
+    op.drop_table('post_likes')
+    op.drop_table('posts')
+    op.drop_table('musics')
+    op.drop_index(op.f('ix_users_phone_number'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,48 @@
+"""like counters
+
+Revision ID: 5b0d3e7a9c42
+Revises: c7e91f04b2a8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0d3e7a9c42'
+down_revision: Union[str, None] = 'c7e91f04b2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('comments', sa.Column('likes', sa.Integer(), nullable=True, server_default='0'))
+    op.add_column('comment_replies', sa.Column('likes', sa.Integer(), nullable=True, server_default='0'))
+    op.create_unique_constraint('_user_reply_like_uc', 'comment_likes', ['user_id', 'comment_reply_id'])
+
+    # Counters were never maintained before, rebuild them from the like rows.
+    op.execute("""
+        UPDATE posts SET likes = counts.likes
+        FROM (SELECT post_id, count(*) AS likes FROM post_likes GROUP BY post_id) AS counts
+        WHERE posts.id = counts.post_id
+    """)
+    op.execute("""
+        UPDATE comments SET likes = counts.likes
+        FROM (SELECT comment_id, count(*) AS likes FROM comment_likes WHERE comment_id IS NOT NULL GROUP BY comment_id) AS counts
+        WHERE comments.id = counts.comment_id
+    """)
+    op.execute("""
+        UPDATE comment_replies SET likes = counts.likes
+        FROM (SELECT comment_reply_id, count(*) AS likes FROM comment_likes WHERE comment_reply_id IS NOT NULL
+              GROUP BY comment_reply_id) AS counts
+        WHERE comment_replies.id = counts.comment_reply_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_constraint('_user_reply_like_uc', 'comment_likes', type_='unique')
+    op.drop_column('comment_replies', 'likes')
+    op.drop_column('comments', 'likes')
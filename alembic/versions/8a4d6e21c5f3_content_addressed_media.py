@@ -0,0 +1,54 @@
+"""content addressed media
+
+Revision ID: 8a4d6e21c5f3
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d6e21c5f3'
+down_revision: Union[str, None] = '3f1c2a9b7d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'media',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.Text(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('digest')
+    )
+    op.create_index('ix_media_unreferenced', 'media', ['updated_at'], postgresql_where=sa.text('ref_count <= 0'))
+
+    op.add_column('posts', sa.Column('media_digest', sa.String(length=64), nullable=True))
+    op.create_foreign_key('posts_media_digest_fkey', 'posts', 'media', ['media_digest'], ['digest'], ondelete='SET NULL')
+    op.create_index(op.f('ix_posts_media_digest'), 'posts', ['media_digest'])
+
+    op.add_column('users', sa.Column('avatar_digest', sa.String(length=64), nullable=True))
+    op.create_foreign_key('users_avatar_digest_fkey', 'users', 'media', ['avatar_digest'], ['digest'], ondelete='SET NULL')
+    op.create_index(op.f('ix_users_avatar_digest'), 'users', ['avatar_digest'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_users_avatar_digest'), table_name='users')
+    op.drop_constraint('users_avatar_digest_fkey', 'users', type_='foreignkey')
+    op.drop_column('users', 'avatar_digest')
+
+    op.drop_index(op.f('ix_posts_media_digest'), table_name='posts')
+    op.drop_constraint('posts_media_digest_fkey', 'posts', type_='foreignkey')
+    op.drop_column('posts', 'media_digest')
+
+    op.drop_index('ix_media_unreferenced', table_name='media')
+    op.drop_table('media')
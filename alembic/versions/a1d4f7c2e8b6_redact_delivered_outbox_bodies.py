@@ -0,0 +1,27 @@
+"""redact delivered outbox bodies
+
+Revision ID: a1d4f7c2e8b6
+Revises: f2c8a4e6b9d1
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1d4f7c2e8b6'
+down_revision: Union[str, None] = 'f2c8a4e6b9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Finished messages are redacted on delivery from now on; these were stored before that.
+    op.execute("UPDATE outbox SET body = '[redacted]' WHERE status != 'pending'")
+
+
+def downgrade() -> None:
+    # The bodies are gone, there is nothing to put back.
+    pass
@@ -0,0 +1,36 @@
+"""keyset pagination indexes
+
+Revision ID: a9f3e5c1d7b2
+Revises: e4b8c2d6f1a3
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9f3e5c1d7b2'
+down_revision: Union[str, None] = 'e4b8c2d6f1a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_posts_owner_created', 'posts', ['owner_id', 'created_at', 'id']),
+    ('ix_comments_post_created', 'comments', ['post_id', 'created_at', 'id']),
+    ('ix_saves_user_created', 'saves', ['user_id', 'created_at', 'id']),
+    ('ix_post_likes_user_created', 'post_likes', ['user_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
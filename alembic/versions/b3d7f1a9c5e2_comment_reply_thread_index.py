@@ -0,0 +1,29 @@
+"""comment reply thread index
+
+Revision ID: b3d7f1a9c5e2
+Revises: f6c1a8e3b5d9
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d7f1a9c5e2'
+down_revision: Union[str, None] = 'f6c1a8e3b5d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comment_replies_comment_created', 'comment_replies', ['comment_id', 'created_at', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_comment_replies_comment_created', table_name='comment_replies',
+                      postgresql_concurrently=True, if_exists=True)
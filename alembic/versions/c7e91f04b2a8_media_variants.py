@@ -0,0 +1,26 @@
+"""media variants
+
+Revision ID: c7e91f04b2a8
+Revises: 8a4d6e21c5f3
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e91f04b2a8'
+down_revision: Union[str, None] = '8a4d6e21c5f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('media', sa.Column('variants', postgresql.JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('media', 'variants')
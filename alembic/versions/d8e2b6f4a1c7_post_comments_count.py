@@ -0,0 +1,35 @@
+"""post comments count
+
+Revision ID: d8e2b6f4a1c7
+Revises: b3d7f1a9c5e2
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e2b6f4a1c7'
+down_revision: Union[str, None] = 'b3d7f1a9c5e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('comments_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute("""
+        UPDATE posts SET comments_count = counts.total
+        FROM (
+            SELECT comments.post_id, count(DISTINCT comments.id) + count(comment_replies.id) AS total
+            FROM comments LEFT JOIN comment_replies ON comment_replies.comment_id = comments.id
+            GROUP BY comments.post_id
+        ) AS counts
+        WHERE posts.id = counts.post_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'comments_count')
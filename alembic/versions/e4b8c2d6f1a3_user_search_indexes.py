@@ -0,0 +1,37 @@
+"""user search indexes
+
+Revision ID: e4b8c2d6f1a3
+Revises: 5b0d3e7a9c42
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8c2d6f1a3'
+down_revision: Union[str, None] = '5b0d3e7a9c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Built concurrently so a large users table stays writable meanwhile.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_username_trgm', 'users', ['username'], postgresql_using='gin',
+                        postgresql_ops={'username': 'gin_trgm_ops'}, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_users_full_name_trgm', 'users', ['full_name'], postgresql_using='gin',
+                        postgresql_ops={'full_name': 'gin_trgm_ops'}, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_users_username_prefix', 'users', [sa.text('lower(username) text_pattern_ops')],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_username_prefix', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_users_full_name_trgm', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_users_username_trgm', table_name='users', postgresql_concurrently=True, if_exists=True)
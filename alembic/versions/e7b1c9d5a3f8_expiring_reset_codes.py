@@ -0,0 +1,37 @@
+"""expiring reset codes
+
+Revision ID: e7b1c9d5a3f8
+Revises: c5a9d3f7e1b4
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b1c9d5a3f8'
+down_revision: Union[str, None] = 'c5a9d3f7e1b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Codes issued before expiry existed are treated as already expired. The column holds naive UTC
+    # (the app compares it with utcnow), so the backfill must be UTC too, not the server's local now().
+    op.add_column('codes', sa.Column('expires_at', sa.DateTime(), nullable=False,
+                                     server_default=sa.text("timezone('utc', now())")))
+    op.alter_column('codes', 'expires_at', server_default=None)
+    op.execute("""
+        DELETE FROM codes WHERE id NOT IN (SELECT max(id) FROM codes GROUP BY user_id) OR user_id IS NULL
+    """)
+    op.create_unique_constraint('_user_code_uc', 'codes', ['user_id'])
+    op.create_index('ix_codes_expires_at', 'codes', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_codes_expires_at', table_name='codes')
+    op.drop_constraint('_user_code_uc', 'codes', type_='unique')
+    op.drop_column('codes', 'expires_at')
@@ -0,0 +1,33 @@
+"""rate limits
+
+Revision ID: f2c8a4e6b9d1
+Revises: e7b1c9d5a3f8
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a4e6b9d1'
+down_revision: Union[str, None] = 'e7b1c9d5a3f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rate_limits',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('key', sa.String(length=300), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limits')
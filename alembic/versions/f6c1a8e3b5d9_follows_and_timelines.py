@@ -0,0 +1,65 @@
+"""follows and timelines
+
+Revision ID: f6c1a8e3b5d9
+Revises: a9f3e5c1d7b2
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c1a8e3b5d9'
+down_revision: Union[str, None] = 'a9f3e5c1d7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('following_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'follows',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', postgresql.UUID(), nullable=False),
+        sa.Column('follower_id', postgresql.UUID(), nullable=False),
+        sa.Column('following_id', postgresql.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['follower_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['following_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('follower_id', 'following_id', name='_follower_following_uc')
+    )
+    op.create_index(op.f('ix_follows_following_id'), 'follows', ['following_id'])
+
+    op.create_table(
+        'timelines',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', postgresql.UUID(), nullable=False),
+        sa.Column('post_id', postgresql.UUID(), nullable=False),
+        sa.Column('author_id', postgresql.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    op.create_index('ix_timelines_user_created', 'timelines', ['user_id', 'created_at', 'post_id'])
+    op.create_index('ix_timelines_user_author', 'timelines', ['user_id', 'author_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timelines_user_author', table_name='timelines')
+    op.drop_index('ix_timelines_user_created', table_name='timelines')
+    op.drop_table('timelines')
+
+    op.drop_index(op.f('ix_follows_following_id'), table_name='follows')
+    op.drop_table('follows')
+
+    op.drop_column('users', 'following_count')
+    op.drop_column('users', 'followers_count')
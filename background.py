@@ -0,0 +1,35 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+periodic_jobs = []
+running_tasks = []
+
+
+def periodic(interval: float):
+    def register(job):
+        periodic_jobs.append((interval, job))
+        return job
+    return register
+
+
+async def run_periodically(interval: float, job):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            logger.exception('Background job %s failed', job.__name__)
+
+
+def start_background_jobs():
+    for interval, job in periodic_jobs:
+        running_tasks.append(asyncio.create_task(run_periodically(interval, job)))
+
+
+async def stop_background_jobs():
+    for task in running_tasks:
+        task.cancel()
+    await asyncio.gather(*running_tasks, return_exceptions=True)
+    running_tasks.clear()
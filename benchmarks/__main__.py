@@ -0,0 +1,202 @@
+"""Load-test the API and compare the results against a stored baseline.
+
+Run from the repository root with the app's usual environment (.env):
+
+    python -m benchmarks --concurrency 32 --duration 60 --output run.json
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.2
+
+The app is started with uvicorn in a subprocess, so the load generator never
+competes with it for the event loop; its load shedding limits are raised to
+the benchmark's concurrency. The bench_* users and their content are seeded
+deterministically and reused between runs, with the comments and likes that
+earlier runs wrote put back first. Queries per request come
+from the server's /metrics, so use a single worker when that number matters.
+Exits with status 1 when the baseline comparison finds a regression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from benchmarks.report import summarize, print_table, compare
+from benchmarks.scenarios import SCENARIOS, DEFAULT_MIX, VirtualUser
+from benchmarks.seed import seed
+from config import AUTH_MAX_IN_FLIGHT, MAX_IN_FLIGHT_REQUESTS
+
+ROOT = Path(__file__).resolve().parent.parent
+# The throttles exist to stop abuse; left on they would only measure how fast the benchmark gets a 429.
+UNTHROTTLED = {
+    'LOGIN_IP_LIMIT': '1000000/1',
+    'LOGIN_IDENTIFIER_LIMIT': '1000000/1',
+    'RESET_IP_LIMIT': '1000000/1',
+    'RESET_IDENTIFIER_LIMIT': '1000000/1',
+}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}', choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, keep_rate_limits: bool, concurrency: int) -> subprocess.Popen:
+    env = dict(os.environ) if keep_rate_limits else {**os.environ, **UNTHROTTLED}
+    # Otherwise logins above AUTH_MAX_IN_FLIGHT concurrent users would measure 503s, not the login path.
+    env['AUTH_MAX_IN_FLIGHT'] = str(max(AUTH_MAX_IN_FLIGHT, concurrency))
+    env['MAX_IN_FLIGHT_REQUESTS'] = str(max(MAX_IN_FLIGHT_REQUESTS, concurrency))
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=ROOT, env=env
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen | None, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f'The server exited with status {server.returncode}')
+        try:
+            if (await client.get('/health/ready')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise SystemExit('The server did not become ready in time')
+
+
+async def sign_in(user: VirtualUser, attempts: int = 20):
+    # Setup isn't measured; a login shed by the hashing queue is retried rather than leaving the user anonymous.
+    for _ in range(attempts):
+        await user.sign_in()
+        if user.headers:
+            return
+        await asyncio.sleep(user.rng.uniform(0.5, 1.5))
+    raise SystemExit(f'{user.username} could not sign in')
+
+
+async def drive(user: VirtualUser, names: list, weights: list, deadline: float):
+    while time.monotonic() < deadline:
+        await SCENARIOS[user.rng.choices(names, weights)[0]](user)
+
+
+async def run(args) -> dict:
+    weights = parse_mix(args.mix)
+    server = None
+    if args.url is None:
+        port = free_port()
+        server = start_server(port, args.workers, args.keep_rate_limits, args.concurrency)
+        base_url = f'http://127.0.0.1:{port}'
+    else:
+        if args.concurrency > AUTH_MAX_IN_FLIGHT:
+            raise SystemExit(f'--concurrency {args.concurrency} is above AUTH_MAX_IN_FLIGHT ({AUTH_MAX_IN_FLIGHT}), '
+                             'logins would be shed with 503s; raise it on the server and here')
+        base_url = args.url.rstrip('/')
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            await wait_until_ready(client, server)
+            dataset = await seed(args.users, args.posts_per_user, args.comments_per_post, args.likes_per_post,
+                                 args.saves_per_user, args.follows_per_user, args.seed, args.reseed)
+            results = {}
+            users = [
+                VirtualUser(client, dataset, index % len(dataset.usernames), random.Random(args.seed + index), results)
+                for index in range(args.concurrency)
+            ]
+            await asyncio.gather(*(sign_in(user) for user in users))
+
+            started = time.monotonic()
+            names = list(weights)
+            tasks = [asyncio.create_task(drive(user, names, list(weights.values()), started + args.warmup + args.duration))
+                     for user in users]
+            await asyncio.sleep(args.warmup)
+            metrics_before = (await client.get('/metrics')).text
+            for user in users:
+                user.recording = True
+            measured_from = time.monotonic()
+            await asyncio.gather(*tasks)
+            duration = time.monotonic() - measured_from
+            metrics_after = (await client.get('/metrics')).text
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    return {
+        'meta': {
+            'at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'duration': round(duration, 2),
+            'mix': args.mix,
+            'seed': args.seed,
+            'users': args.users,
+            'posts_per_user': args.posts_per_user,
+        },
+        'endpoints': summarize(results, duration, metrics_before, metrics_after),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Load-test the API.')
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of load before measuring starts')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='scenario weights, e.g. view_post=5,search=1')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts-per-user', type=int, default=10)
+    parser.add_argument('--comments-per-post', type=int, default=5)
+    parser.add_argument('--likes-per-post', type=int, default=10)
+    parser.add_argument('--saves-per-user', type=int, default=20)
+    parser.add_argument('--follows-per-user', type=int, default=50)
+    parser.add_argument('--reseed', action='store_true', help='drop and recreate the bench_* data')
+    parser.add_argument('--keep-rate-limits', action='store_true')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--save-baseline', help='write the results as the new baseline')
+    parser.add_argument('--baseline', help='compare against this baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown before failing')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_table(report['endpoints'])
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        regressions = compare(report['endpoints'], args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+"""Generate a large synthetic dataset and bulk-load it with COPY.
+
+    python -m benchmarks.generate --users 500000 --posts 1000000 --workers 8
+
+Rows are produced by a streaming pipeline: every table is cut into fixed-size
+chunks and each chunk is generated from its own seeded RNG straight into
+COPY by a worker process, so nothing is held in memory and the same seed
+gives the same data whatever the worker count. Tables are loaded parents
+first so every foreign key resolves.
+
+Follows and post owners are power-law skewed towards low user numbers (the
+"celebrities"); likes, comments and views per post are Pareto distributed.
+
+Secondary indexes and foreign keys of the loaded tables are dropped before
+loading; afterwards the indexes are rebuilt in parallel and every foreign key
+is re-added and validated in a single pass. Their definitions are saved to
+--deferred-file first, so an interrupted run can put them back with
+--restore. Primary keys and unique constraints stay, they keep the data valid.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import asyncpg
+from werkzeug.security import generate_password_hash
+
+from benchmarks.seed import WORDS
+from config import DB_USER, DB_PASS, DB_HOST, DB_PORT, DB_NAME, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH
+
+DSN = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+CHUNK_SIZE = 20000
+PARETO_ALPHA = 1.6
+TIME_SPAN = timedelta(days=365)
+# Per-parent child numbers live in the low 20 bits of the generated ids.
+MAX_CHILDREN = (1 << 20) - 1
+
+COLUMNS = {
+    'users': ('id', 'username', 'password', 'full_name', 'gender', 'avatar_pic', 'email', 'followers_count',
+              'following_count', 'created_at', 'updated_at'),
+    'follows': ('id', 'follower_id', 'following_id', 'created_at', 'updated_at'),
+    'posts': ('id', 'title', 'owner_id', 'likes', 'views', 'comments_count', 'access_to_views', 'access_to_likes',
+              'access_to_comments', 'created_at', 'updated_at'),
+    'comments': ('id', 'content', 'post_id', 'user_id', 'likes', 'created_at', 'updated_at'),
+    'post_likes': ('id', 'user_id', 'post_id', 'created_at', 'updated_at'),
+    'post_views': ('user_id', 'post_id', 'created_at', 'updated_at'),
+}
+# Parents first: users before anything pointing at them, posts before their likes, comments and views.
+LOAD_ORDER = ('users', 'follows', 'posts', 'comments', 'post_likes', 'post_views')
+ID_TAGS = {'users': 1, 'follows': 2, 'posts': 3, 'comments': 4, 'post_likes': 5}
+
+
+class Settings:
+    def __init__(self, args, password_hash: str):
+        self.seed = args.seed
+        self.users = args.users
+        self.posts = args.posts
+        self.follows_per_user = args.follows_per_user
+        self.likes_per_post = args.likes_per_post
+        self.comments_per_post = args.comments_per_post
+        self.views_per_post = args.views_per_post
+        self.follow_skew = args.follow_skew
+        self.post_skew = args.post_skew
+        self.password_hash = password_hash
+        self.started = datetime(2025, 1, 1)
+
+
+def row_id(settings: Settings, table: str, index: int) -> str:
+    # Deterministic and increasing with the index, which keeps primary key inserts append-only.
+    return f'{settings.seed:08x}-{ID_TAGS[table]:04x}-4000-8000-{index:012x}'
+
+
+def child_id(settings: Settings, table: str, parent: int, number: int) -> str:
+    return row_id(settings, table, (parent << 20) | number)
+
+
+def chunk_rng(settings: Settings, name: str, chunk: int) -> random.Random:
+    return random.Random(f'{settings.seed}:{name}:{chunk}')
+
+
+def skewed_index(rng: random.Random, size: int, skew: float) -> int:
+    # u ** skew piles up near 0, giving a power-law share of picks to the lowest indexes.
+    return int(size * rng.random() ** skew)
+
+
+def pareto_count(rng: random.Random, mean: float, cap: int) -> int:
+    if mean <= 0:
+        return 0
+    return min(int(mean * (PARETO_ALPHA - 1) / PARETO_ALPHA * rng.paretovariate(PARETO_ALPHA)), cap)
+
+
+def post_created_at(settings: Settings, index: int) -> datetime:
+    return settings.started + TIME_SPAN * (index / max(settings.posts, 1))
+
+
+def post_counts(settings: Settings, chunk: int, size: int) -> list[tuple[int, int, int]]:
+    """(likes, comments, views) for every post of a chunk; the posts and their children both derive them from here."""
+    rng = chunk_rng(settings, 'post_counts', chunk)
+    cap = min(settings.users, MAX_CHILDREN)
+    return [(pareto_count(rng, settings.likes_per_post, cap), pareto_count(rng, settings.comments_per_post, MAX_CHILDREN),
+             pareto_count(rng, settings.views_per_post, cap)) for _ in range(size)]
+
+
+def distinct_users(rng: random.Random, settings: Settings, count: int) -> list[int]:
+    return rng.sample(range(settings.users), count)
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+def user_rows(settings: Settings, chunk: int, start: int, stop: int):
+    rng = chunk_rng(settings, 'users', chunk)
+    for index in range(start, stop):
+        created_at = settings.started + TIME_SPAN * rng.random()
+        username = f'gen{settings.seed}_{index}'
+        # Follow counters are filled in from the follows table once it is loaded.
+        yield (row_id(settings, 'users', index), username, settings.password_hash, sentence(rng, 2).title(),
+               rng.choice(('male', 'female')), 'media/profile_pictures/default.png', f'{username}@example.com', 0, 0,
+               created_at, created_at)
+
+
+def follow_rows(settings: Settings, chunk: int, start: int, stop: int):
+    rng = chunk_rng(settings, 'follows', chunk)
+    cap = min(settings.users - 1, MAX_CHILDREN)
+    for follower in range(start, stop):
+        wanted = pareto_count(rng, settings.follows_per_user, cap)
+        following, attempts = set(), 0
+        while len(following) < wanted and attempts < wanted * 4:
+            attempts += 1
+            target = skewed_index(rng, settings.users, settings.follow_skew)
+            if target != follower:
+                following.add(target)
+        follower_id = row_id(settings, 'users', follower)
+        for number, target in enumerate(sorted(following)):
+            created_at = settings.started + TIME_SPAN * rng.random()
+            yield (child_id(settings, 'follows', follower, number), follower_id, row_id(settings, 'users', target),
+                   created_at, created_at)
+
+
+def post_rows(settings: Settings, chunk: int, start: int, stop: int):
+    rng = chunk_rng(settings, 'posts', chunk)
+    for index, (likes, comments, views) in zip(range(start, stop), post_counts(settings, chunk, stop - start)):
+        created_at = post_created_at(settings, index)
+        owner = skewed_index(rng, settings.users, settings.post_skew)
+        yield (row_id(settings, 'posts', index), sentence(rng, 4), row_id(settings, 'users', owner), likes, views,
+               comments, True, True, True, created_at, created_at)
+
+
+def comment_rows(settings: Settings, chunk: int, start: int, stop: int):
+    rng = chunk_rng(settings, 'comments', chunk)
+    for index, (_, comments, _) in zip(range(start, stop), post_counts(settings, chunk, stop - start)):
+        post_id, posted_at = row_id(settings, 'posts', index), post_created_at(settings, index)
+        for number in range(comments):
+            created_at = posted_at + timedelta(minutes=rng.randrange(1, 7 * 24 * 60))
+            yield (child_id(settings, 'comments', index, number), sentence(rng, 6), post_id,
+                   row_id(settings, 'users', rng.randrange(settings.users)), 0, created_at, created_at)
+
+
+def like_rows(settings: Settings, chunk: int, start: int, stop: int):
+    rng = chunk_rng(settings, 'post_likes', chunk)
+    for index, (likes, _, _) in zip(range(start, stop), post_counts(settings, chunk, stop - start)):
+        post_id, posted_at = row_id(settings, 'posts', index), post_created_at(settings, index)
+        for number, user in enumerate(distinct_users(rng, settings, likes)):
+            created_at = posted_at + timedelta(minutes=rng.randrange(1, 7 * 24 * 60))
+            yield child_id(settings, 'post_likes', index, number), row_id(settings, 'users', user), post_id, created_at, created_at
+
+
+def view_rows(settings: Settings, chunk: int, start: int, stop: int):
+    rng = chunk_rng(settings, 'post_views', chunk)
+    for index, (_, _, views) in zip(range(start, stop), post_counts(settings, chunk, stop - start)):
+        post_id, posted_at = row_id(settings, 'posts', index), post_created_at(settings, index)
+        for user in distinct_users(rng, settings, views):
+            created_at = posted_at + timedelta(minutes=rng.randrange(1, 7 * 24 * 60))
+            yield row_id(settings, 'users', user), post_id, created_at, created_at
+
+
+GENERATORS = {
+    'users': user_rows,
+    'follows': follow_rows,
+    'posts': post_rows,
+    'comments': comment_rows,
+    'post_likes': like_rows,
+    'post_views': view_rows,
+}
+
+
+def parent_count(settings: Settings, table: str) -> int:
+    # Every table is chunked by the rows it hangs off, so a chunk's children are generated together.
+    return settings.users if table in ('users', 'follows') else settings.posts
+
+
+async def copy_chunk(table: str, settings: Settings, chunk: int) -> int:
+    start = chunk * CHUNK_SIZE
+    stop = min(start + CHUNK_SIZE, parent_count(settings, table))
+    connection = await asyncpg.connect(DSN, server_settings={'synchronous_commit': 'off'})
+    try:
+        result = await connection.copy_records_to_table(
+            table, records=GENERATORS[table](settings, chunk, start, stop), columns=COLUMNS[table]
+        )
+    finally:
+        await connection.close()
+    return int(result.split()[-1])
+
+
+def load_chunk(table: str, settings: Settings, chunk: int) -> int:
+    return asyncio.run(copy_chunk(table, settings, chunk))
+
+
+def load_table(pool: ProcessPoolExecutor, table: str, settings: Settings) -> int:
+    chunks = range((parent_count(settings, table) + CHUNK_SIZE - 1) // CHUNK_SIZE)
+    started, rows = time.monotonic(), 0
+    for future in as_completed([pool.submit(load_chunk, table, settings, chunk) for chunk in chunks]):
+        rows += future.result()
+    elapsed = time.monotonic() - started
+    print(f'{table:<12} {rows:>12,} rows in {elapsed:7.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)')
+    return rows
+
+
+async def deferrable(connection, tables) -> dict:
+    indexes = await connection.fetch(
+        "SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS definition "
+        "FROM pg_index i WHERE i.indrelid = ANY($1::regclass[]) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)",
+        list(tables)
+    )
+    foreign_keys = await connection.fetch(
+        "SELECT conrelid::regclass::text AS table, conname AS name, pg_get_constraintdef(oid) AS definition "
+        "FROM pg_constraint WHERE contype = 'f' AND conrelid = ANY($1::regclass[])",
+        list(tables)
+    )
+    return {'indexes': [dict(row) for row in indexes], 'foreign_keys': [dict(row) for row in foreign_keys]}
+
+
+async def drop_deferred(deferred_file: str, tables) -> dict:
+    connection = await asyncpg.connect(DSN)
+    try:
+        deferred = await deferrable(connection, tables)
+        # Written before anything is dropped, so a crash mid-load never loses a definition.
+        with open(deferred_file, 'w') as file:
+            json.dump(deferred, file, indent=2)
+        async with connection.transaction():
+            for foreign_key in deferred['foreign_keys']:
+                await connection.execute(f"ALTER TABLE {foreign_key['table']} DROP CONSTRAINT IF EXISTS \"{foreign_key['name']}\"")
+            for index in deferred['indexes']:
+                await connection.execute(f"DROP INDEX IF EXISTS {index['name']}")
+    finally:
+        await connection.close()
+    print(f"Dropped {len(deferred['indexes'])} secondary indexes and {len(deferred['foreign_keys'])} foreign keys, "
+          f"definitions saved to {deferred_file}")
+    return deferred
+
+
+async def rebuild_indexes(indexes: list[dict], workers: int, maintenance_work_mem: str):
+    queue = asyncio.Queue()
+    for index in indexes:
+        queue.put_nowait(index)
+
+    async def build():
+        connection = await asyncpg.connect(DSN, server_settings={
+            'maintenance_work_mem': maintenance_work_mem, 'statement_timeout': '0'
+        })
+        try:
+            while not queue.empty():
+                index = queue.get_nowait()
+                started = time.monotonic()
+                await connection.execute(index['definition'].replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1))
+                print(f"Rebuilt {index['name']} in {time.monotonic() - started:.1f}s")
+        finally:
+            await connection.close()
+
+    await asyncio.gather(*(build() for _ in range(min(workers, len(indexes)))))
+
+
+async def restore_foreign_keys(foreign_keys: list[dict]):
+    # NOT VALID then VALIDATE checks every row in one join per constraint instead of one lookup per row.
+    connection = await asyncpg.connect(DSN, server_settings={'statement_timeout': '0'})
+    try:
+        existing = {(row['table'], row['name']) for row in await connection.fetch(
+            "SELECT conrelid::regclass::text AS table, conname AS name FROM pg_constraint WHERE contype = 'f'"
+        )}
+        for foreign_key in foreign_keys:
+            table, name = foreign_key['table'], foreign_key['name']
+            started = time.monotonic()
+            if (table, name) not in existing:
+                await connection.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {foreign_key["definition"]} NOT VALID')
+            await connection.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT "{name}"')
+            print(f'Validated {name} in {time.monotonic() - started:.1f}s')
+    finally:
+        await connection.close()
+
+
+async def restore_deferred(deferred: dict, workers: int, maintenance_work_mem: str):
+    await rebuild_indexes(deferred['indexes'], workers, maintenance_work_mem)
+    await restore_foreign_keys(deferred['foreign_keys'])
+
+
+async def count_follows(settings: Settings):
+    # Counted in one pass over the loaded follows instead of tracked across worker processes.
+    connection = await asyncpg.connect(DSN, server_settings={'statement_timeout': '0'})
+    try:
+        await connection.execute(
+            "UPDATE users SET followers_count = coalesce(f.followers, 0), following_count = coalesce(g.following, 0) "
+            "FROM users u "
+            "LEFT JOIN (SELECT following_id, count(*) AS followers FROM follows GROUP BY following_id) f "
+            "ON f.following_id = u.id "
+            "LEFT JOIN (SELECT follower_id, count(*) AS following FROM follows GROUP BY follower_id) g "
+            "ON g.follower_id = u.id "
+            "WHERE users.id = u.id AND users.username LIKE $1",
+            f'gen{settings.seed}\\_%'
+        )
+    finally:
+        await connection.close()
+
+
+async def analyze(tables):
+    connection = await asyncpg.connect(DSN, server_settings={'statement_timeout': '0'})
+    try:
+        for table in tables:
+            await connection.execute(f'ANALYZE {table}')
+    finally:
+        await connection.close()
+
+
+async def truncate(tables):
+    connection = await asyncpg.connect(DSN)
+    try:
+        await connection.execute(f"TRUNCATE {', '.join(tables)} CASCADE")
+    finally:
+        await connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.generate', description='Bulk-load synthetic data.')
+    parser.add_argument('--users', type=int, default=500000)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--follows-per-user', type=float, default=10)
+    parser.add_argument('--likes-per-post', type=float, default=4)
+    parser.add_argument('--comments-per-post', type=float, default=1)
+    parser.add_argument('--views-per-post', type=float, default=3)
+    parser.add_argument('--follow-skew', type=float, default=3, help='higher gives celebrities more followers')
+    parser.add_argument('--post-skew', type=float, default=1.5, help='higher concentrates posts on fewer users')
+    parser.add_argument('--tables', default=','.join(LOAD_ORDER), help='subset of ' + ','.join(LOAD_ORDER))
+    parser.add_argument('--seed', type=int, default=1, help='also namespaces ids and usernames, so seeds can coexist')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--no-defer', action='store_true', help='load with every index and foreign key in place')
+    parser.add_argument('--deferred-file', default='deferred_ddl.json')
+    parser.add_argument('--restore', action='store_true', help='only restore what --deferred-file holds')
+    parser.add_argument('--maintenance-work-mem', default='512MB')
+    parser.add_argument('--truncate', action='store_true', help='empty the loaded tables (and their dependents) first')
+    args = parser.parse_args()
+
+    if args.restore:
+        with open(args.deferred_file) as file:
+            asyncio.run(restore_deferred(json.load(file), args.workers, args.maintenance_work_mem))
+        os.remove(args.deferred_file)
+        return
+    if not args.no_defer and os.path.exists(args.deferred_file):
+        raise SystemExit(f'{args.deferred_file} is left from an interrupted run, put its indexes and foreign keys '
+                         f'back with --restore first')
+
+    tables = [table for table in LOAD_ORDER if table in args.tables.split(',')]
+    settings = Settings(args, generate_password_hash('generated-password-1', PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH))
+    if args.truncate:
+        asyncio.run(truncate(tables))
+    deferred = None if args.no_defer else asyncio.run(drop_deferred(args.deferred_file, tables))
+
+    started, rows = time.monotonic(), 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for table in tables:
+            rows += load_table(pool, table, settings)
+    print(f'Loaded {rows:,} rows in {time.monotonic() - started:.1f}s')
+
+    if 'follows' in tables:
+        asyncio.run(count_follows(settings))
+    if deferred is not None:
+        started = time.monotonic()
+        asyncio.run(restore_deferred(deferred, args.workers, args.maintenance_work_mem))
+        os.remove(args.deferred_file)
+        print(f'Restored indexes and foreign keys in {time.monotonic() - started:.1f}s')
+    asyncio.run(analyze(tables))
+
+
+if __name__ == '__main__':
+    main()
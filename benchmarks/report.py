@@ -0,0 +1,73 @@
+import json
+import math
+import re
+
+METRIC_LINE_REGEX = re.compile(r'^db_queries_per_request_(sum|count)\{method="([^"]+)",route="([^"]+)"\} (\S+)$')
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # Nearest rank, so every reported value is a latency that was actually observed.
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def query_totals(metrics_text: str) -> dict:
+    """Per-route (statements, requests) from the server's /metrics output."""
+    totals = {}
+    for line in metrics_text.splitlines():
+        match = METRIC_LINE_REGEX.match(line)
+        if match:
+            kind, method, route, value = match.groups()
+            sums = totals.setdefault(f'{method} {route}', [0.0, 0.0])
+            sums[0 if kind == 'sum' else 1] = float(value)
+    return totals
+
+
+def summarize(results: dict, duration: float, metrics_before: str, metrics_after: str) -> dict:
+    before, after = query_totals(metrics_before), query_totals(metrics_after)
+    endpoints = {}
+    for label, (latencies, errors) in sorted(results.items()):
+        latencies.sort()
+        queries, requests = after.get(label, [0, 0])
+        queries -= before.get(label, [0, 0])[0]
+        requests -= before.get(label, [0, 0])[1]
+        endpoints[label] = {
+            'requests': len(latencies),
+            'errors': errors[0],
+            'rps': round(len(latencies) / duration, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries_per_request': round(queries / requests, 2) if requests else None,
+        }
+    return endpoints
+
+
+def print_table(endpoints: dict):
+    header = f"{'endpoint':<40} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'q/req':>6}"
+    print(header)
+    print('-' * len(header))
+    for label, row in endpoints.items():
+        queries = '-' if row['queries_per_request'] is None else row['queries_per_request']
+        print(f"{label:<40} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9} {row['p50_ms']:>9} "
+              f"{row['p95_ms']:>9} {row['p99_ms']:>9} {queries:>6}")
+
+
+def compare(endpoints: dict, baseline_path: str, tolerance: float) -> list[str]:
+    """Regressions against a stored run: slower p95/p99, lower throughput or more queries per request."""
+    with open(baseline_path) as file:
+        baseline = json.load(file)['endpoints']
+    regressions = []
+    for label, row in endpoints.items():
+        base = baseline.get(label)
+        if base is None:
+            continue
+        for key in ('p95_ms', 'p99_ms'):
+            if row[key] > base[key] * (1 + tolerance):
+                regressions.append(f'{label}: {key} {base[key]} -> {row[key]}')
+        if row['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{label}: rps {base['rps']} -> {row['rps']}")
+        # Statement counts don't depend on the machine, so any real increase is a regression.
+        if row['queries_per_request'] is not None and base['queries_per_request'] is not None \
+                and row['queries_per_request'] > base['queries_per_request'] + 0.5:
+            regressions.append(f"{label}: queries/request {base['queries_per_request']} -> {row['queries_per_request']}")
+    return regressions
@@ -0,0 +1,81 @@
+import random
+import time
+
+import httpx
+
+from benchmarks.seed import Dataset, PASSWORD
+
+
+class VirtualUser:
+    """One closed-loop client: it waits for each response before sending its next request."""
+
+    def __init__(self, client: httpx.AsyncClient, dataset: Dataset, index: int, rng: random.Random, results: dict):
+        self.client = client
+        self.dataset = dataset
+        self.username = dataset.usernames[index]
+        self.rng = rng
+        self.results = results
+        self.headers = {}
+        self.recording = False
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        if self.recording:
+            latencies, errors = self.results.setdefault(label, ([], [0]))
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[0] += 1
+        return response
+
+    async def sign_in(self):
+        response = await self.request('POST /auth/login', 'POST', '/auth/login', json={
+            'username_or_phone_number_or_email': self.username, 'password': PASSWORD
+        })
+        if response.status_code == 200:
+            self.headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+    def post_id(self):
+        return self.rng.choice(self.dataset.post_ids)
+
+
+async def login(user: VirtualUser):
+    await user.sign_in()
+
+
+async def view_post(user: VirtualUser):
+    post_id = user.post_id()
+    await user.request('GET /posts/{post_uuid}', 'GET', f'/posts/{post_id}')
+    await user.request('GET /comments/thread/{post_id}', 'GET', f'/comments/thread/{post_id}')
+
+
+async def comment(user: VirtualUser):
+    await user.request('POST /comments/add-comment/{post_id}', 'POST', f'/comments/add-comment/{user.post_id()}',
+                       json={'comment': 'benchmark comment'})
+
+
+async def like(user: VirtualUser):
+    post_id = user.post_id()
+    await user.request('POST /likes/like/{post_id}', 'POST', f'/likes/like/{post_id}')
+    await user.request('DELETE /likes/unlike/{post_id}', 'DELETE', f'/likes/unlike/{post_id}')
+
+
+async def search(user: VirtualUser):
+    query = user.rng.choice(user.dataset.usernames)[:user.rng.randint(4, 9)]
+    await user.request('GET /search/autocomplete', 'GET', '/search/autocomplete', params={'q': query})
+    await user.request('GET /search/{username}', 'GET', f'/search/{query}')
+
+
+async def saved_posts(user: VirtualUser):
+    await user.request('GET /saves/saved-posts', 'GET', '/saves/saved-posts')
+
+
+SCENARIOS = {
+    'login': login,
+    'view_post': view_post,
+    'comment': comment,
+    'like': like,
+    'search': search,
+    'saved_posts': saved_posts,
+}
+DEFAULT_MIX = 'login=1,view_post=10,comment=2,like=4,search=3,saved_posts=3'
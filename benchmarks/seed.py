@@ -0,0 +1,146 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, insert, update, func
+from werkzeug.security import generate_password_hash
+
+from config import PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH
+from database import AsyncSessionLocal
+from models import UsersModel, PostsModel, CommentsModel, PostLikesModel, SavesModel, FollowsModel
+
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'bench-password-1'
+CHUNK_SIZE = 1000
+WORDS = ('sunset', 'coffee', 'mountain', 'city', 'weekend', 'friends', 'beach', 'morning', 'street', 'music',
+         'travel', 'dinner', 'snow', 'garden', 'concert', 'river', 'family', 'workout', 'books', 'night')
+
+
+class Dataset:
+    def __init__(self, user_ids: list, usernames: list, post_ids: list):
+        self.user_ids = user_ids
+        self.usernames = usernames
+        self.post_ids = post_ids
+
+
+def username(index: int) -> str:
+    return f'{USERNAME_PREFIX}{index:06d}'
+
+
+def random_uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+async def insert_chunked(db, model, rows: list):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        await db.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+async def load_dataset() -> Dataset:
+    async with AsyncSessionLocal() as db:
+        users = (await db.execute(
+            select(UsersModel.id, UsersModel.username).filter(UsersModel.username.startswith(USERNAME_PREFIX))
+            .order_by(UsersModel.username)
+        )).all()
+        post_ids = (await db.scalars(
+            select(PostsModel.id).join(UsersModel, UsersModel.id == PostsModel.owner_id)
+            .filter(UsersModel.username.startswith(USERNAME_PREFIX)).order_by(PostsModel.id)
+        )).all()
+    return Dataset([user.id for user in users], [user.username for user in users], list(post_ids))
+
+
+def build_rows(users: int, posts_per_user: int, comments_per_post: int, likes_per_post: int, saves_per_user: int,
+               follows_per_user: int, seed_value: int) -> dict:
+    """Every bench_* row, generated the same way for the same arguments."""
+    rng = random.Random(seed_value)
+    started = datetime.utcnow() - timedelta(days=30)
+    password = generate_password_hash(PASSWORD, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+    user_rows = [{
+        'id': random_uuid(rng),
+        'username': username(index),
+        'password': password,
+        'full_name': sentence(rng, 2).title(),
+        'gender': rng.choice(('male', 'female')),
+        'email': f'{username(index)}@bench.local',
+        'created_at': started,
+    } for index in range(users)]
+    user_ids = [row['id'] for row in user_rows]
+
+    follow_rows, followers, following = [], dict.fromkeys(user_ids, 0), dict.fromkeys(user_ids, 0)
+    for follower_id in user_ids:
+        for following_id in rng.sample(user_ids, min(follows_per_user, users)):
+            if following_id != follower_id:
+                follow_rows.append({'id': random_uuid(rng), 'follower_id': follower_id, 'following_id': following_id})
+                followers[following_id] += 1
+                following[follower_id] += 1
+    for row in user_rows:
+        row['followers_count'] = followers[row['id']]
+        row['following_count'] = following[row['id']]
+
+    post_rows = [{
+        'id': random_uuid(rng),
+        'title': sentence(rng, 4),
+        'owner_id': owner_id,
+        'created_at': started + timedelta(seconds=rng.randrange(30 * 24 * 3600)),
+        'comments_count': comments_per_post,
+        'likes': min(likes_per_post, users),
+    } for owner_id in user_ids for _ in range(posts_per_user)]
+    post_ids = [row['id'] for row in post_rows]
+
+    comment_rows = [{
+        'id': random_uuid(rng),
+        'content': sentence(rng, 6),
+        'post_id': post['id'],
+        'user_id': rng.choice(user_ids),
+        'created_at': post['created_at'] + timedelta(minutes=rng.randrange(1, 600)),
+    } for post in post_rows for _ in range(comments_per_post)]
+    like_rows = [{'id': random_uuid(rng), 'user_id': user_id, 'post_id': post_id}
+                 for post_id in post_ids for user_id in rng.sample(user_ids, min(likes_per_post, users))]
+    save_rows = [{'id': random_uuid(rng), 'user_id': user_id, 'post_id': post_id}
+                 for user_id in user_ids for post_id in rng.sample(post_ids, min(saves_per_user, len(post_ids)))]
+    # Parents before children, so every foreign key already resolves.
+    return {UsersModel: user_rows, FollowsModel: follow_rows, PostsModel: post_rows, CommentsModel: comment_rows,
+            PostLikesModel: like_rows, SavesModel: save_rows}
+
+
+async def restore_mutable_rows(db, rows: dict, dataset: Dataset):
+    """Put back the comments and likes, and their counters, that earlier runs' write scenarios changed."""
+    if sorted(row['id'] for row in rows[PostsModel]) != sorted(dataset.post_ids):
+        raise SystemExit('The seeded benchmark data came from another --seed, rerun with --reseed to replace it')
+    for model in (CommentsModel, PostLikesModel):
+        await db.execute(delete(model).filter(model.post_id.in_(
+            select(PostsModel.id).filter(PostsModel.owner_id.in_(dataset.user_ids))
+        )))
+        await insert_chunked(db, model, rows[model])
+    await db.execute(update(PostsModel), [
+        {'id': post['id'], 'comments_count': post['comments_count'], 'likes': post['likes']} for post in rows[PostsModel]
+    ])
+
+
+async def seed(users: int, posts_per_user: int, comments_per_post: int, likes_per_post: int, saves_per_user: int,
+               follows_per_user: int, seed_value: int = 42, reseed: bool = False) -> Dataset:
+    """Create the bench_* users and their content, or reuse them when the same sizes were seeded before.
+
+    Reused data gets its comments and likes reset, so every run starts from the same state.
+    """
+    rows = build_rows(users, posts_per_user, comments_per_post, likes_per_post, saves_per_user, follows_per_user,
+                      seed_value)
+    async with AsyncSessionLocal() as db:
+        existing = await db.scalar(select(func.count()).filter(UsersModel.username.startswith(USERNAME_PREFIX)))
+        if existing and not reseed:
+            dataset = await load_dataset()
+            if len(dataset.user_ids) != users or len(dataset.post_ids) != users * posts_per_user:
+                raise SystemExit('The seeded benchmark data has other sizes, rerun with --reseed to replace it')
+            await restore_mutable_rows(db, rows, dataset)
+            await db.commit()
+            return dataset
+        # Everything else hangs off the users through ON DELETE CASCADE.
+        await db.execute(delete(UsersModel).filter(UsersModel.username.startswith(USERNAME_PREFIX)))
+        for model, model_rows in rows.items():
+            await insert_chunked(db, model, model_rows)
+        await db.commit()
+    # Loaded back so a fresh seed and a reused one hand scenarios the same ordering.
+    return await load_dataset()
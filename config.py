@@ -1,5 +1,6 @@
 from pytz import timezone
-from decouple import config
+from uuid import UUID
+from decouple import config, Csv
 
 # Database Secrets
 DB_USER = config('DB_USER')
@@ -8,15 +9,105 @@ DB_PORT = config('DB_PORT', cast=int, default=5432)
 DB_PASS = config('DB_PASS')
 DB_NAME = config('DB_NAME')
 
+# Connection pool (per worker: workers * (size + overflow) must stay under Postgres max_connections)
+DB_POOL_SIZE = config('DB_POOL_SIZE', cast=int, default=10)
+DB_MAX_OVERFLOW = config('DB_MAX_OVERFLOW', cast=int, default=10)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', cast=float, default=10)
+DB_POOL_RECYCLE = config('DB_POOL_RECYCLE', cast=int, default=30 * 60)
+DB_POOL_PRE_PING = config('DB_POOL_PRE_PING', cast=bool, default=True)
+DB_STATEMENT_TIMEOUT = config('DB_STATEMENT_TIMEOUT', cast=int, default=15000)
+DB_IDLE_IN_TRANSACTION_TIMEOUT = config('DB_IDLE_IN_TRANSACTION_TIMEOUT', cast=int, default=60000)
+
+# Startup (Alembic owns the schema in production)
+ENVIRONMENT = config('ENVIRONMENT', default='development')
+CREATE_SCHEMA = config('CREATE_SCHEMA', cast=bool, default=ENVIRONMENT != 'production')
+POOL_WARM_CONNECTIONS = config('POOL_WARM_CONNECTIONS', cast=int, default=5)
+HEALTH_CHECK_TIMEOUT = config('HEALTH_CHECK_TIMEOUT', cast=float, default=2)
+
+# Request metrics (a statement shape repeated more than this in one request is logged as a likely N+1)
+N_PLUS_ONE_THRESHOLD = config('N_PLUS_ONE_THRESHOLD', cast=int, default=5)
+
+# Slow query log (opt-in; thresholds in milliseconds, sampled plans kept for /admin/slow-queries)
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', cast=bool, default=False)
+SLOW_QUERY_THRESHOLD = config('SLOW_QUERY_THRESHOLD', cast=float, default=200)
+SLOW_QUERY_EXPLAIN_RATE = config('SLOW_QUERY_EXPLAIN_RATE', cast=float, default=0.1)
+SLOW_QUERY_BUFFER_SIZE = config('SLOW_QUERY_BUFFER_SIZE', cast=int, default=50)
+# User ids rather than usernames: users pick (and can change) their own usernames.
+ADMIN_USER_IDS = config('ADMIN_USER_IDS', cast=Csv(cast=UUID), default='')
+
 # JWT Secrets
 SECRET_KEYS = config('SECRET_KEYS')
 ALGORITHM = config('ALGORITHM')
 
 ACCESS_TOKEN_TIME = config('ACCESS_TOKEN_TIME', cast=int)
 REFRESH_TOKEN_TIME = config('REFRESH_TOKEN_TIME', cast=int)
+TOKEN_CACHE_SIZE = config('TOKEN_CACHE_SIZE', cast=int, default=10000)
+
+# Password hashing. The method is a full werkzeug spec (e.g. scrypt:32768:8:1 or
+# pbkdf2:sha256:600000); stored hashes with any other spec are upgraded on login.
+PASSWORD_HASH_METHOD = config('PASSWORD_HASH_METHOD', default='scrypt:32768:8:1')
+PASSWORD_SALT_LENGTH = config('PASSWORD_SALT_LENGTH', cast=int, default=16)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', cast=int, default=2)
+PASSWORD_HASH_CONCURRENCY = config('PASSWORD_HASH_CONCURRENCY', cast=int, default=32)
+PASSWORD_HASH_QUEUE_TIMEOUT = config('PASSWORD_HASH_QUEUE_TIMEOUT', cast=float, default=5)
+
+# Password reset codes (seconds)
+RESET_CODE_TTL = config('RESET_CODE_TTL', cast=int, default=15 * 60)
+RESET_CODE_SWEEP_INTERVAL = config('RESET_CODE_SWEEP_INTERVAL', cast=int, default=10 * 60)
+RESET_CODE_SWEEP_BATCH_SIZE = config('RESET_CODE_SWEEP_BATCH_SIZE', cast=int, default=5000)
+
+# Rate limiting and load shedding. Limits are "requests/seconds" token buckets;
+# the backend is memory (per process) or postgres (shared by all workers).
+RATE_LIMIT_BACKEND = config('RATE_LIMIT_BACKEND', default='memory')
+RATE_LIMIT_MEMORY_KEYS = config('RATE_LIMIT_MEMORY_KEYS', cast=int, default=100000)
+# How many proxies in front of the app append to X-Forwarded-For; 0 ignores the header.
+RATE_LIMIT_TRUSTED_PROXIES = config('RATE_LIMIT_TRUSTED_PROXIES', cast=int, default=0)
+LOGIN_IP_LIMIT = config('LOGIN_IP_LIMIT', default='30/60')
+LOGIN_IDENTIFIER_LIMIT = config('LOGIN_IDENTIFIER_LIMIT', default='5/60')
+RESET_IP_LIMIT = config('RESET_IP_LIMIT', default='10/3600')
+RESET_IDENTIFIER_LIMIT = config('RESET_IDENTIFIER_LIMIT', default='3/3600')
+CHECK_CODE_IP_LIMIT = config('CHECK_CODE_IP_LIMIT', default='20/3600')
+CHECK_CODE_IDENTIFIER_LIMIT = config('CHECK_CODE_IDENTIFIER_LIMIT', default='5/3600')
+MAX_IN_FLIGHT_REQUESTS = config('MAX_IN_FLIGHT_REQUESTS', cast=int, default=1000)
+AUTH_MAX_IN_FLIGHT = config('AUTH_MAX_IN_FLIGHT', cast=int, default=64)
+
+# Current user cache (seconds)
+USER_CACHE_TTL = config('USER_CACHE_TTL', cast=float, default=30)
+USER_CACHE_SIZE = config('USER_CACHE_SIZE', cast=int, default=10000)
 
 # Upload file
 UPLOAD_FOLDER = config('UPLOAD_FOLDER')
+UPLOAD_CHUNK_SIZE = config('UPLOAD_CHUNK_SIZE', cast=int, default=1024 * 1024)
+MAX_UPLOAD_SIZE = config('MAX_UPLOAD_SIZE', cast=int, default=20 * 1024 * 1024)
+MAX_IMAGE_UPLOAD_SIZE = config('MAX_IMAGE_UPLOAD_SIZE', cast=int, default=20 * 1024 * 1024)
+MAX_VIDEO_UPLOAD_SIZE = config('MAX_VIDEO_UPLOAD_SIZE', cast=int, default=500 * 1024 * 1024)
+
+# Media store garbage collection (seconds)
+MEDIA_GC_INTERVAL = config('MEDIA_GC_INTERVAL', cast=int, default=60 * 60)
+MEDIA_GC_GRACE = config('MEDIA_GC_GRACE', cast=int, default=60 * 60)
+MEDIA_GC_BATCH_SIZE = config('MEDIA_GC_BATCH_SIZE', cast=int, default=500)
+
+# Post views write-behind buffer (seconds)
+VIEWS_FLUSH_INTERVAL = config('VIEWS_FLUSH_INTERVAL', cast=float, default=5)
+VIEWS_FLUSH_BATCH_SIZE = config('VIEWS_FLUSH_BATCH_SIZE', cast=int, default=1000)
+
+# Resized image variants
+DERIVATIVE_WORKERS = config('DERIVATIVE_WORKERS', cast=int, default=2)
+
+# Comment counter reconciliation (seconds)
+COMMENTS_RECONCILE_INTERVAL = config('COMMENTS_RECONCILE_INTERVAL', cast=int, default=6 * 60 * 60)
+COMMENTS_RECONCILE_BATCH_SIZE = config('COMMENTS_RECONCILE_BATCH_SIZE', cast=int, default=1000)
+
+# Pagination and search
+PAGE_SIZE = config('PAGE_SIZE', cast=int, default=20)
+MAX_PAGE_SIZE = config('MAX_PAGE_SIZE', cast=int, default=100)
+AUTOCOMPLETE_LIMIT = config('AUTOCOMPLETE_LIMIT', cast=int, default=10)
+THREAD_REPLY_LIMIT = config('THREAD_REPLY_LIMIT', cast=int, default=3)
+BATCH_POSTS_LIMIT = config('BATCH_POSTS_LIMIT', cast=int, default=50)
+
+# Home feed fan-out
+FANOUT_FOLLOWER_LIMIT = config('FANOUT_FOLLOWER_LIMIT', cast=int, default=10000)
+TIMELINE_BACKFILL_SIZE = config('TIMELINE_BACKFILL_SIZE', cast=int, default=50)
 
 # Time zone
 tashkent = timezone("Asia/Tashkent")
@@ -25,4 +116,20 @@ EMAIL_SENDER = config('SENDER_EMAIL')
 EMAIL_SENDER_PASSWORD = config('SENDER_EMAIL_PASSWORD')
 
 VONAGE_KEY = config('VONAGE_KEY')
-VONAGE_SECRET = config('VONAGE_SECRET')
\ No newline at end of file
+VONAGE_SECRET = config('VONAGE_SECRET')
+
+# Outbound notifications. EMAIL_TRANSPORT is smtp or log, SMS_TRANSPORT is vonage or log.
+EMAIL_TRANSPORT = config('EMAIL_TRANSPORT', default='smtp')
+SMS_TRANSPORT = config('SMS_TRANSPORT', default='vonage')
+SMTP_HOST = config('SMTP_HOST', default='smtp.gmail.com')
+SMTP_PORT = config('SMTP_PORT', cast=int, default=587)
+SMTP_STARTTLS = config('SMTP_STARTTLS', cast=bool, default=True)
+SMTP_TIMEOUT = config('SMTP_TIMEOUT', cast=float, default=30)
+NOTIFICATIONS_INTERVAL = config('NOTIFICATIONS_INTERVAL', cast=float, default=1)
+NOTIFICATIONS_BATCH_SIZE = config('NOTIFICATIONS_BATCH_SIZE', cast=int, default=100)
+NOTIFICATIONS_MAX_ATTEMPTS = config('NOTIFICATIONS_MAX_ATTEMPTS', cast=int, default=6)
+NOTIFICATIONS_RETRY_DELAY = config('NOTIFICATIONS_RETRY_DELAY', cast=float, default=10)
+NOTIFICATIONS_MAX_RETRY_DELAY = config('NOTIFICATIONS_MAX_RETRY_DELAY', cast=float, default=60 * 60)
+NOTIFICATIONS_RETENTION = config('NOTIFICATIONS_RETENTION', cast=int, default=7 * 24 * 60 * 60)
+# A claimed batch is sent outside any transaction; if its worker dies the rows come back after the lease.
+NOTIFICATIONS_LEASE = config('NOTIFICATIONS_LEASE', cast=float, default=NOTIFICATIONS_BATCH_SIZE * SMTP_TIMEOUT + 60)
@@ -0,0 +1,53 @@
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from background import periodic
+from config import COMMENTS_RECONCILE_INTERVAL, COMMENTS_RECONCILE_BATCH_SIZE
+from database import AsyncSessionLocal
+from models import PostsModel, CommentsModel, CommentRepliesModel
+
+
+async def adjust_comments_count(db: AsyncSession, post_id, delta) -> int | None:
+    return await db.scalar(
+        update(PostsModel).filter(PostsModel.id == post_id).values(
+            comments_count=func.greatest(PostsModel.comments_count + delta, 0)
+        ).returning(PostsModel.comments_count).execution_options(synchronize_session=False)
+    )
+
+
+def counted_comments(post_id):
+    """Top-level comments plus their replies, as a scalar subquery correlated on ``post_id``."""
+    comments = select(func.count()).select_from(CommentsModel).filter(CommentsModel.post_id == post_id)
+    replies = select(func.count()).select_from(CommentRepliesModel).join(
+        CommentsModel, CommentsModel.id == CommentRepliesModel.comment_id
+    ).filter(CommentsModel.post_id == post_id)
+    return comments.scalar_subquery() + replies.scalar_subquery()
+
+
+async def reconcile_comments_count(db: AsyncSession, batch_size: int = COMMENTS_RECONCILE_BATCH_SIZE) -> int:
+    """Recount comments post by post in id order and repair counters that drifted."""
+    repaired, last_id = 0, None
+    while True:
+        batch = select(PostsModel.id).order_by(PostsModel.id).limit(batch_size)
+        if last_id is not None:
+            batch = batch.filter(PostsModel.id > last_id)
+        post_ids = (await db.scalars(batch)).all()
+        if not post_ids:
+            return repaired
+        fresh = select(PostsModel.id, counted_comments(PostsModel.id).label('total')).filter(
+            PostsModel.id.in_(post_ids)
+        ).subquery()
+        result = await db.execute(
+            update(PostsModel).filter(PostsModel.id == fresh.c.id, PostsModel.comments_count != fresh.c.total).values(
+                comments_count=fresh.c.total
+            ).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        repaired += result.rowcount
+        last_id = post_ids[-1]
+
+
+@periodic(COMMENTS_RECONCILE_INTERVAL)
+async def reconcile_comment_counters():
+    async with AsyncSessionLocal() as db:
+        await reconcile_comments_count(db)
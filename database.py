@@ -1,11 +1,130 @@
-from sqlalchemy import create_engine
+import asyncio
+import bisect
+import time
+from contextlib import AsyncExitStack
+from sqlalchemy import event, text, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from config import DB_USER, DB_NAME, DB_PORT, DB_PASS, DB_HOST
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import DB_USER, DB_NAME, DB_PORT, DB_PASS, DB_HOST, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, \
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT, DB_IDLE_IN_TRANSACTION_TIMEOUT
+
+
+class PoolStats:
+    """Counters fed by pool events; checkout waits are bucketed in seconds."""
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+    def __init__(self):
+        self.connects = 0
+        self.invalidations = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(self.WAIT_BUCKETS) + 1)
+
+    def record_wait(self, seconds: float):
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.wait_buckets[bisect.bisect_left(self.WAIT_BUCKETS, seconds)] += 1
+
+    def snapshot(self, pool) -> dict:
+        return {
+            'size': pool.size(),
+            'max_overflow': DB_MAX_OVERFLOW,
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'connects': self.connects,
+            'invalidations': self.invalidations,
+            'checkouts': self.checkouts,
+            'checkout_timeouts': self.timeouts,
+            'checkout_wait_seconds': {
+                'total': round(self.wait_total, 6),
+                'max': round(self.wait_max, 6),
+                'buckets': {
+                    **{f'le_{bound}': count for bound, count in zip(self.WAIT_BUCKETS, self.wait_buckets)},
+                    'le_inf': self.wait_buckets[-1],
+                },
+            },
+        }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # There is no "before checkout" pool event, so the wait (queueing plus any new connect) is timed here.
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
 
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(url=DATABASE_URL, future=True)
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+async_engine = create_async_engine(
+    url=ASYNC_DATABASE_URL,
+    poolclass=InstrumentedPool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={'server_settings': {
+        'statement_timeout': str(DB_STATEMENT_TIMEOUT),
+        'idle_in_transaction_session_timeout': str(DB_IDLE_IN_TRANSACTION_TIMEOUT),
+    }},
+)
+
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+Base = declarative_base()
+
+
+@event.listens_for(async_engine.sync_engine, 'connect')
+def count_connect(dbapi_connection, connection_record):
+    pool_stats.connects += 1
+
+
+@event.listens_for(async_engine.sync_engine, 'checkout')
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.checkouts += 1
+
+
+@event.listens_for(async_engine.sync_engine, 'invalidate')
+def count_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.invalidations += 1
+
+
+async def create_schema():
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+async def warm_pool(connections: int) -> int:
+    """Open pooled connections up front so the first requests don't pay for the handshake."""
+    connections = min(connections, async_engine.pool.size())
+    async with AsyncExitStack() as stack:
+        # Held together, otherwise the pool would hand the same connection back every time.
+        opened = await asyncio.gather(*(stack.enter_async_context(async_engine.connect()) for _ in range(connections)))
+        await asyncio.gather(*(connection.execute(text('SELECT 1')) for connection in opened))
+    return connections
+
+
+async def ping():
+    async with async_engine.connect() as connection:
+        await connection.execute(text('SELECT 1'))
+
 
-SessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+async def server_connections() -> dict:
+    async with async_engine.connect() as connection:
+        row = (await connection.execute(text(
+            "SELECT current_setting('max_connections')::int AS max_connections, "
+            "(SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()) AS in_use"
+        ))).mappings().one()
+    return dict(row)
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select, update
+
+from config import DERIVATIVE_WORKERS
+from database import AsyncSessionLocal
+from models import MediaModel
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SIZES = {
+    'thumb': 150,
+    'medium': 640,
+    'full': 1080,
+}
+VARIANT_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+process_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global process_pool
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor(max_workers=DERIVATIVE_WORKERS)
+    return process_pool
+
+
+async def warm_process_pool():
+    # Forks every worker (and imports Pillow there) before the first upload needs one.
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(get_process_pool(), os.getpid) for _ in range(DERIVATIVE_WORKERS)))
+
+
+def shutdown_process_pool():
+    global process_pool
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
+        process_pool = None
+
+
+def render_variants(source_path: str) -> dict:
+    # Runs in a worker process, so it only touches the filesystem.
+    variants = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        for name, size in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            variant = {'width': resized.width, 'height': resized.height}
+            for extension, image_format in VARIANT_FORMATS.items():
+                path = f"{source_path}.{name}.{extension}"
+                encoded = resized.convert('RGB') if image_format == 'JPEG' else resized
+                encoded.save(f"{path}.part", format=image_format, quality=82, optimize=True)
+                os.replace(f"{path}.part", path)
+                variant[extension] = path
+            variants[name] = variant
+    return variants
+
+
+def variant_paths(media: MediaModel) -> list[str]:
+    return [
+        path
+        for variant in (media.variants or {}).values()
+        for extension, path in variant.items()
+        if extension in VARIANT_FORMATS
+    ]
+
+
+def closest_variant(media: MediaModel | None, size: int, extension: str = 'webp') -> dict | None:
+    if media is None or not media.variants:
+        return None
+    by_size = sorted(media.variants.items(), key=lambda item: max(item[1]['width'], item[1]['height']))
+    for name, variant in by_size:
+        if max(variant['width'], variant['height']) >= size:
+            break
+    return {'name': name, 'width': variant['width'], 'height': variant['height'], 'path': variant[extension]}
+
+
+async def generate_derivatives(digest: str):
+    async with AsyncSessionLocal() as db:
+        media = await db.scalar(select(MediaModel).filter(MediaModel.digest == digest))
+    # The session is closed while the worker renders, so no connection idles in a transaction meanwhile.
+    if media is None or media.variants or not (media.content_type or '').startswith('image/'):
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        variants = await loop.run_in_executor(get_process_pool(), render_variants, media.path)
+    except (UnidentifiedImageError, OSError) as error:
+        # The upload check trusts the declared content type; undecodable media is served without variants.
+        logger.warning('Could not render variants of %s: %s', digest, error)
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(MediaModel).filter(MediaModel.digest == digest).values(variants=variants))
+        await db.commit()
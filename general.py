@@ -1,29 +1,32 @@
+import hashlib
 import re
-from werkzeug.security import generate_password_hash
-from config import SECRET_KEYS, ALGORITHM
+import time
+from collections import OrderedDict
+from config import SECRET_KEYS, ALGORITHM, TOKEN_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_SIZE
 from typing import Annotated
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, Request
+from uuid import UUID
+from sqlalchemy import select, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from fastapi import Depends, HTTPException, Request, status
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from database import SessionLocal
+from database import AsyncSessionLocal
+from models import UsersModel
 
 USERNAME_REGEX = re.compile(r'^[a-z0-9_-]{3,15}$')
 PHONE_NUMBER_REGEX = re.compile(r'^[\+]?[(]?[0-9]{3}[)]?[-\s\.]?[0-9]{3}[-\s\.]?[0-9]{4,6}$')
 EMAIL_REGEX = re.compile(r'[^@ \t\r\n]+@[^@ \t\r\n]+\.[^@ \t\r\n]+')
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 
 
 def decode_jwt(token: str) -> dict:
@@ -33,30 +36,120 @@ def decode_jwt(token: str) -> dict:
         return {}
 
 
+class TokenCache:
+    """LRU cache of verified token claims, keyed by the token hash and dropped at ``exp``."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict[bytes, dict] = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self.key(token)
+        claims = self.entries.get(key)
+        if claims is None:
+            return None
+        if claims['exp'] <= time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return claims
+
+    def put(self, token: str, claims: dict):
+        if 'exp' not in claims:
+            return
+        self.entries[self.key(token)] = claims
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
-    async def __call__(self, request: Request):
+    async def __call__(self, request: Request) -> dict:
         credentials: HTTPAuthorizationCredentials = await super(JWTBearer, self).__call__(request)
-        token = self.verify_jwt(credentials.credentials)
         if credentials:
             if not credentials.scheme == "Bearer":
                 raise HTTPException(status_code=403, detail="Invalid authentication scheme.")
-            if not token:
+            claims = self.verify_jwt(credentials.credentials)
+            if not claims:
                 raise HTTPException(status_code=403, detail="Invalid token or expired token.")
-            return credentials.credentials
+            return claims
         else:
             raise HTTPException(status_code=403, detail="Invalid authorization code.")
 
-    def verify_jwt(self, jwtoken: str) -> bool:
+    def verify_jwt(self, jwtoken: str) -> dict:
+        claims = token_cache.get(jwtoken)
+        if claims is not None:
+            return claims
 
         try:
-            payload = decode_jwt(jwtoken)
+            claims = decode_jwt(jwtoken)
         except:
-            payload = None
+            claims = {}
+
+        if claims:
+            token_cache.put(jwtoken, claims)
+        return claims
+
+
+jwt_bearer = JWTBearer()
+
+
+class UserCache:
+    """Short-lived per-process cache of user rows, so a request loads its user at most once."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def load(self, db: AsyncSession, user_id: str) -> UsersModel | None:
+        entry = self.entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            user = UsersModel(**entry[1])
+            make_transient_to_detached(user)
+            db.add(user)
+            return user
+
+        user = await db.scalar(select(UsersModel).filter(UsersModel.id == user_id))
+        if user is not None:
+            self.entries[user_id] = (
+                time.monotonic() + self.ttl,
+                {attr.key: getattr(user, attr.key) for attr in inspect(UsersModel).column_attrs}
+            )
+            self.entries.move_to_end(user_id)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        self.entries.pop(str(user_id), None)
+
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
+
+
+async def get_current_user(db: db_dependency, claims: dict = Depends(jwt_bearer)) -> UsersModel:
+    user = await user_cache.load(db, claims['user_id'])
+    if user is None:
+        raise HTTPException(detail='User not found', status_code=status.HTTP_404_NOT_FOUND)
+    return user
+
+
+async def get_current_user_id(claims: dict = Depends(jwt_bearer)) -> UUID:
+    return UUID(claims['user_id'])
+
 
-        return bool(payload)
+current_user = Annotated[UsersModel, Depends(get_current_user)]
+current_user_id = Annotated[UUID, Depends(get_current_user_id)]
 
 
 async def detect_user_input(text):
@@ -74,4 +167,4 @@ def check_password(password: str):
         return False
     elif not any(c.isalnum() for c in password):
         return False
-    return generate_password_hash(password)
+    return True
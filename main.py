@@ -1,19 +1,79 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import exc
+from sqlalchemy.orm import configure_mappers
+
 from routers.authentication import router
 from routers.comments import comments
 from routers.posts import posts
 from routers.saves import saves
 from routers.users import users
 from routers.search import search
-from database import Base, engine
+from routers.media import media
+from routers.likes import likes
+from routers.feed import feed
+from routers.health import health, Readiness
+from routers.metrics import metrics
+from routers.admin import admin
+from config import CREATE_SCHEMA, POOL_WARM_CONNECTIONS
+from database import async_engine, create_schema, warm_pool
+from background import start_background_jobs, stop_background_jobs
+from derivatives import warm_process_pool, shutdown_process_pool
+from passwords import shutdown_hash_executor
+from notifications import close_transports
+from views import flush_view_buffer
+from ratelimit import RateLimitMiddleware
+from metrics import MetricsMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CREATE_SCHEMA:
+        await create_schema()
+    configure_mappers()
+    warmed = await warm_pool(POOL_WARM_CONNECTIONS)
+    await warm_process_pool()
+    logger.info('Warmed %s database connections', warmed)
+    start_background_jobs()
+    Readiness.ready = True
+
+    yield
+
+    Readiness.ready = False
+    await stop_background_jobs()
+    await flush_view_buffer()
+    shutdown_process_pool()
+    shutdown_hash_executor()
+    close_transports()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RateLimitMiddleware)
+# Outermost, so shed and throttled requests are counted too.
+app.add_middleware(MetricsMiddleware)
+
 
-app = FastAPI()
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout(request: Request, error: exc.TimeoutError):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT: the worker is overloaded, not broken.
+    return JSONResponse({'detail': 'Server is busy, try again later'}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'retry-after': '1'})
 
-Base.metadata.create_all(engine)
 
+app.include_router(health)
+app.include_router(metrics)
 app.include_router(router)
 app.include_router(posts)
 app.include_router(search)
 app.include_router(comments)
 app.include_router(saves)
-app.include_router(users)
\ No newline at end of file
+app.include_router(users)
+app.include_router(media)
+app.include_router(likes)
+app.include_router(feed)
+app.include_router(admin)
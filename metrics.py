@@ -0,0 +1,193 @@
+import bisect
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import N_PLUS_ONE_THRESHOLD
+from database import async_engine, pool_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Expanded IN lists and multi-row VALUES differ only in how many placeholders they carry.
+PLACEHOLDER_LIST_REGEX = re.compile(r'\$\d+(?:::[\w\[\]]+)?(?:\s*,\s*\$\d+(?:::[\w\[\]]+)?)*')
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self, label_names: tuple) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in self.series.items():
+            base = format_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {cumulative}')
+        return lines
+
+
+class Total:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.series: Counter = Counter()
+
+    def inc(self, labels: tuple, value: float = 1):
+        self.series[labels] += value
+
+    def render(self, label_names: tuple) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines.extend(f'{self.name}{{{format_labels(label_names, labels)}}} {value}' for labels, value in self.series.items())
+        return lines
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_latency = Histogram('http_request_duration_seconds', 'Time until the response body was sent.', LATENCY_BUCKETS)
+requests_total = Total('http_requests_total', 'Responses by route and status code.')
+request_queries = Histogram('db_queries_per_request', 'SQL statements executed while serving a request.', QUERY_COUNT_BUCKETS)
+request_db_time = Histogram('db_time_per_request_seconds', 'Time spent in SQL statements per request.', LATENCY_BUCKETS)
+n_plus_one_total = Total('db_n_plus_one_requests_total',
+                         f'Requests that ran one statement shape more than {N_PLUS_ONE_THRESHOLD} times.')
+
+
+class RequestStats:
+    __slots__ = ('scope', 'queries', 'db_time', 'shapes', 'open')
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes: Counter = Counter()
+        self.open = True
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar('current_request', default=None)
+
+
+def statement_shape(statement: str) -> str:
+    return PLACEHOLDER_LIST_REGEX.sub('$n', ' '.join(statement.split()))
+
+
+@event.listens_for(async_engine.sync_engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(async_engine.sync_engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    started = conn.info.pop('query_started', None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    # Background tasks run after the response went out; their queries are not the request's.
+    if stats.open:
+        stats.queries += 1
+        stats.db_time += elapsed
+        stats.shapes[statement_shape(statement)] += 1
+
+
+def route_name(scope: Scope) -> str:
+    route = scope.get('route')
+    # Unmatched paths share one label so scanners can't blow up the series count.
+    return getattr(route, 'path', '<unmatched>')
+
+
+class MetricsMiddleware:
+    """Records latency, status and SQL accounting for every HTTP request, labelled by route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False) and stats.open:
+                self.finish(scope, stats, status_code, time.perf_counter() - started)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            if stats.open:
+                self.finish(scope, stats, status_code, time.perf_counter() - started)
+
+    @staticmethod
+    def finish(scope: Scope, stats: RequestStats, status_code: int, elapsed: float):
+        stats.open = False
+        labels = (scope['method'], route_name(scope))
+        request_latency.observe(labels, elapsed)
+        requests_total.inc(labels + (status_code,))
+        request_queries.observe(labels, stats.queries)
+        request_db_time.observe(labels, stats.db_time)
+        if stats.shapes:
+            shape, repeats = stats.shapes.most_common(1)[0]
+            if repeats > N_PLUS_ONE_THRESHOLD:
+                n_plus_one_total.inc(labels)
+                logger.warning('Possible N+1 in %s %s: %s statements, %s x %s', *labels, stats.queries, repeats,
+                               shape[:200])
+
+
+def render_pool() -> list[str]:
+    snapshot = pool_stats.snapshot(async_engine.pool)
+    lines = []
+    for key in ('size', 'max_overflow', 'checked_out', 'idle', 'overflow'):
+        lines += [f'# TYPE db_pool_{key} gauge', f'db_pool_{key} {snapshot[key]}']
+    for key in ('connects', 'invalidations', 'checkouts', 'checkout_timeouts'):
+        lines += [f'# TYPE db_pool_{key}_total counter', f'db_pool_{key}_total {snapshot[key]}']
+    lines.append('# TYPE db_pool_checkout_wait_seconds histogram')
+    cumulative = 0
+    for bound, count in zip(pool_stats.WAIT_BUCKETS + ('+Inf',), pool_stats.wait_buckets):
+        cumulative += count
+        lines.append(f'db_pool_checkout_wait_seconds_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f'db_pool_checkout_wait_seconds_sum {pool_stats.wait_total}')
+    lines.append(f'db_pool_checkout_wait_seconds_count {cumulative}')
+    return lines
+
+
+def render() -> str:
+    lines = request_latency.render(('method', 'route'))
+    lines += requests_total.render(('method', 'route', 'status'))
+    lines += request_queries.render(('method', 'route'))
+    lines += request_db_time.render(('method', 'route'))
+    lines += n_plus_one_total.render(('method', 'route'))
+    lines += render_pool()
+    return '\n'.join(lines) + '\n'
@@ -1,9 +1,9 @@
 from database import Base
 from datetime import datetime
-from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, String, Boolean, UniqueConstraint
+from sqlalchemy import DDL, event, func, Column, Integer, BigInteger, Float, Text, ForeignKey, DateTime, String, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 
 class BaseModel(Base):
@@ -12,6 +12,21 @@ class BaseModel(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class MediaModel(BaseModel):
+    __tablename__ = 'media'
+
+    digest = Column(String(64), primary_key=True)
+    path = Column(Text, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100))
+    ref_count = Column(Integer, default=0, nullable=False)
+    variants = Column(JSONB)
+
+    __table_args__ = (
+        Index('ix_media_unreferenced', 'updated_at', postgresql_where=ref_count <= 0),
+    )
+
+
 class UsersModel(BaseModel):
     __tablename__ = "users"
 
@@ -23,8 +38,11 @@ class UsersModel(BaseModel):
     day_of_birth = Column(DateTime)
     bio = Column(Text)
     avatar_pic = Column(String, default='media/profile_pictures/default.png')
+    avatar_digest = Column(String(64), ForeignKey('media.digest', ondelete='SET NULL'), index=True)
     email = Column(String, unique=True, index=True)
     phone_number = Column(String, unique=True, index=True)
+    followers_count = Column(Integer, default=0, nullable=False)
+    following_count = Column(Integer, default=0, nullable=False)
 
     posts = relationship('PostsModel', back_populates='owner', cascade="all, delete")
     comments = relationship('CommentsModel', back_populates='user', cascade="all, delete")
@@ -33,6 +51,17 @@ class UsersModel(BaseModel):
     comment_likes = relationship('CommentLikesModel', back_populates='user', cascade="all, delete")
     saves = relationship('SavesModel', back_populates='user', cascade='all, delete')
 
+    __table_args__ = (
+        Index('ix_users_username_trgm', 'username', postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}),
+        Index('ix_users_full_name_trgm', 'full_name', postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}),
+        Index('ix_users_username_prefix', func.lower(username).label('username_lower'),
+              postgresql_ops={'username_lower': 'text_pattern_ops'}),
+    )
+
+
+# The trigram indexes need pg_trgm before the users table is created.
+event.listen(UsersModel.__table__, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+
 
 class MusicsModel(BaseModel):
     __tablename__ = 'musics'
@@ -49,7 +78,10 @@ class PostLikesModel(BaseModel):
     user_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'))
     post_id = Column(UUID, ForeignKey('posts.id', ondelete='CASCADE'))
 
-    __table_args__ = (UniqueConstraint('user_id', 'post_id', name='_user_post_like_uc'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'post_id', name='_user_post_like_uc'),
+        Index('ix_post_likes_user_created', 'user_id', 'created_at', 'id'),
+    )
 
 class PostsModel(BaseModel):
     __tablename__ = 'posts'
@@ -57,8 +89,10 @@ class PostsModel(BaseModel):
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     title = Column(String(200), nullable=False)
     post_file = Column(Text, nullable=True)
+    media_digest = Column(String(64), ForeignKey('media.digest', ondelete='SET NULL'), index=True)
     likes = Column(Integer, default=0)
     views = Column(Integer, default=0)
+    comments_count = Column(Integer, default=0, nullable=False)
     access_to_views = Column(Boolean, default=True)
     access_to_likes = Column(Boolean, default=True)
     access_to_comments = Column(Boolean, default=True)
@@ -72,6 +106,8 @@ class PostsModel(BaseModel):
     post_views = relationship('PostViewsModel', back_populates='post', cascade='all, delete')
     saves = relationship('SavesModel', back_populates='post', cascade='all, delete')
 
+    __table_args__ = (Index('ix_posts_owner_created', 'owner_id', 'created_at', 'id'),)
+
 
 class CommentsModel(BaseModel):
     __tablename__ = 'comments'
@@ -81,12 +117,15 @@ class CommentsModel(BaseModel):
 
     post_id = Column(UUID, ForeignKey('posts.id', ondelete='CASCADE'), nullable=False)
     user_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    likes = Column(Integer, default=0)
 
     post = relationship('PostsModel', back_populates='comments')
     user = relationship('UsersModel', back_populates='comments')
     replies = relationship('CommentRepliesModel', back_populates='comment', cascade="all, delete")
     comment_likes = relationship('CommentLikesModel', back_populates='comment', cascade="all, delete")
 
+    __table_args__ = (Index('ix_comments_post_created', 'post_id', 'created_at', 'id'),)
+
 
 class CommentRepliesModel(BaseModel):
     __tablename__ = 'comment_replies'
@@ -96,10 +135,13 @@ class CommentRepliesModel(BaseModel):
 
     comment_id = Column(UUID, ForeignKey('comments.id', ondelete='CASCADE'), nullable=False)
     user_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    likes = Column(Integer, default=0)
 
     comment = relationship('CommentsModel', back_populates='replies')
     user = relationship('UsersModel', back_populates='replies')
 
+    __table_args__ = (Index('ix_comment_replies_comment_created', 'comment_id', 'created_at', 'id'),)
+
 
 class CommentLikesModel(BaseModel):
     __tablename__ = 'comment_likes'
@@ -108,7 +150,10 @@ class CommentLikesModel(BaseModel):
     comment_id = Column(UUID, ForeignKey('comments.id', ondelete='CASCADE'), nullable=True)
     comment_reply_id = Column(UUID, ForeignKey('comment_replies.id', ondelete='CASCADE'), nullable=True)
 
-    __table_args__ = (UniqueConstraint('user_id', 'comment_id', name='_user_comment_like_uc'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'comment_id', name='_user_comment_like_uc'),
+        UniqueConstraint('user_id', 'comment_reply_id', name='_user_reply_like_uc'),
+    )
 
     user = relationship("UsersModel", back_populates="comment_likes")
     comment = relationship("CommentsModel", back_populates="comment_likes")
@@ -118,6 +163,36 @@ class CodesModel(BaseModel):
     id = Column(Integer, primary_key=True)
     user_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
     code = Column(Integer)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', name='_user_code_uc'),
+        Index('ix_codes_expires_at', 'expires_at'),
+    )
+
+class OutboxModel(BaseModel):
+    __tablename__ = 'outbox'
+
+    id = Column(BigInteger, primary_key=True)
+    channel = Column(String(10), nullable=False)
+    recipient = Column(String, nullable=False)
+    subject = Column(String(200))
+    body = Column(Text, nullable=False)
+    status = Column(String(10), default='pending', nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime)
+    last_error = Column(Text)
+
+    __table_args__ = (
+        Index('ix_outbox_pending', 'next_attempt_at', postgresql_where=status == 'pending'),
+    )
+
+class RateLimitModel(BaseModel):
+    __tablename__ = 'rate_limits'
+
+    key = Column(String(300), primary_key=True)
+    tokens = Column(Float, nullable=False)
 
 class PostViewsModel(BaseModel):
     __tablename__ = 'post_views'
@@ -131,6 +206,30 @@ class PostViewsModel(BaseModel):
     post = relationship("PostsModel", back_populates="post_views")
 
 
+class FollowsModel(BaseModel):
+    __tablename__ = 'follows'
+
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    follower_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    following_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint('follower_id', 'following_id', name='_follower_following_uc'),)
+
+
+class TimelineModel(BaseModel):
+    """A post delivered to a follower's home feed; created_at is the post's."""
+    __tablename__ = 'timelines'
+
+    user_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    post_id = Column(UUID, ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    author_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (
+        Index('ix_timelines_user_created', 'user_id', 'created_at', 'post_id'),
+        Index('ix_timelines_user_author', 'user_id', 'author_id'),
+    )
+
+
 class SavesModel(BaseModel):
     __tablename__ = 'saves'
 
@@ -138,7 +237,10 @@ class SavesModel(BaseModel):
     user_id = Column(UUID, ForeignKey('users.id', ondelete='CASCADE'))
     post_id = Column(UUID, ForeignKey('posts.id', ondelete='CASCADE'))
 
-    __table_args__ = (UniqueConstraint('user_id', 'post_id', name='_user_save_uc'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'post_id', name='_user_save_uc'),
+        Index('ix_saves_user_created', 'user_id', 'created_at', 'id'),
+    )
 
     user = relationship("UsersModel", back_populates="saves")
     post = relationship("PostsModel", back_populates='saves')
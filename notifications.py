@@ -0,0 +1,207 @@
+import logging
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import vonage
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from background import periodic
+from config import EMAIL_SENDER, EMAIL_SENDER_PASSWORD, VONAGE_KEY, VONAGE_SECRET, SMTP_HOST, SMTP_PORT, SMTP_STARTTLS, \
+    SMTP_TIMEOUT, EMAIL_TRANSPORT, SMS_TRANSPORT, NOTIFICATIONS_INTERVAL, NOTIFICATIONS_BATCH_SIZE, \
+    NOTIFICATIONS_MAX_ATTEMPTS, NOTIFICATIONS_RETRY_DELAY, NOTIFICATIONS_MAX_RETRY_DELAY, NOTIFICATIONS_RETENTION, \
+    NOTIFICATIONS_LEASE
+from database import AsyncSessionLocal
+from models import OutboxModel
+
+logger = logging.getLogger(__name__)
+
+# Bodies carry reset codes, so they are only kept while the message may still be sent.
+REDACTED_BODY = '[redacted]'
+
+
+class SmtpTransport:
+    """Keeps one SMTP session open and sends a whole batch through it."""
+
+    def __init__(self, host: str, port: int, starttls: bool, username: str, password: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.server: smtplib.SMTP | None = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> smtplib.SMTP:
+        if self.server is not None:
+            try:
+                self.server.noop()
+                return self.server
+            except smtplib.SMTPException:
+                self.close()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.password:
+            server.login(self.username, self.password)
+        self.server = server
+        return server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException:
+                pass
+            self.server = None
+
+    def send(self, messages: list[OutboxModel]) -> dict:
+        errors = {}
+        with self.lock:
+            for message in messages:
+                mime = MIMEMultipart()
+                mime['From'] = self.username
+                mime['To'] = message.recipient
+                mime['Subject'] = message.subject or ''
+                mime.attach(MIMEText(message.body, 'plain'))
+                try:
+                    self.connect().sendmail(self.username, message.recipient, mime.as_string())
+                except (smtplib.SMTPException, OSError) as e:
+                    errors[message.id] = str(e)
+                    if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                        self.close()
+        return errors
+
+
+class VonageSmsTransport:
+    def __init__(self, key: str, secret: str):
+        self.key = key
+        self.secret = secret
+        self.sms = None
+
+    def send(self, messages: list[OutboxModel]) -> dict:
+        if self.sms is None:
+            self.sms = vonage.Sms(vonage.Client(key=self.key, secret=self.secret))
+        errors = {}
+        for message in messages:
+            try:
+                response = self.sms.send_message({"from": "Vonage APIs", "to": message.recipient, "text": message.body})
+                if response["messages"][0]["status"] != "0":
+                    errors[message.id] = response["messages"][0]["error-text"]
+            except Exception as e:
+                errors[message.id] = str(e)
+        return errors
+
+
+class LogTransport:
+    """Logs messages instead of delivering them, for local development."""
+
+    def send(self, messages: list[OutboxModel]) -> dict:
+        for message in messages:
+            logger.info('%s to %s: %s', message.channel, message.recipient, message.body)
+        return {}
+
+
+def build_transports() -> dict:
+    return {
+        'email': SmtpTransport(SMTP_HOST, SMTP_PORT, SMTP_STARTTLS, EMAIL_SENDER, EMAIL_SENDER_PASSWORD, SMTP_TIMEOUT)
+        if EMAIL_TRANSPORT == 'smtp' else LogTransport(),
+        'sms': VonageSmsTransport(VONAGE_KEY, VONAGE_SECRET) if SMS_TRANSPORT == 'vonage' else LogTransport(),
+    }
+
+
+transports = build_transports()
+
+
+def set_transport(channel: str, transport):
+    transports[channel] = transport
+
+
+def close_transports():
+    for transport in transports.values():
+        if isinstance(transport, SmtpTransport):
+            transport.close()
+
+
+def enqueue(db: AsyncSession, channel: str, recipient: str, body: str, subject: str | None = None):
+    # Added to the caller's session, so the message is only queued if its transaction commits.
+    db.add(OutboxModel(channel=channel, recipient=recipient, subject=subject, body=body))
+
+
+def enqueue_reset_code(db: AsyncSession, user, code: int):
+    if user.email:
+        enqueue(db, 'email', user.email, f"Your password reset code is: {code:06d}", subject="Password Reset Code")
+    else:
+        enqueue(db, 'sms', user.phone_number, f"Your Password Reset Code: {code:06d}")
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(NOTIFICATIONS_RETRY_DELAY * 2 ** (attempts - 1), NOTIFICATIONS_MAX_RETRY_DELAY))
+
+
+async def claim_batch(db: AsyncSession, batch_size: int) -> list[OutboxModel]:
+    """Lease due messages to this worker and commit, so nothing stays locked while they are sent."""
+    now = datetime.utcnow()
+    due = select(OutboxModel.id).filter(
+        OutboxModel.status == 'pending', OutboxModel.next_attempt_at <= now
+    ).order_by(OutboxModel.next_attempt_at).limit(batch_size).with_for_update(skip_locked=True)
+    messages = (await db.scalars(
+        update(OutboxModel).filter(OutboxModel.id.in_(due.scalar_subquery())).values(
+            attempts=OutboxModel.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=NOTIFICATIONS_LEASE)
+        ).returning(OutboxModel)
+    )).all()
+    await db.commit()
+    return messages
+
+
+async def deliver_batch(db: AsyncSession, batch_size: int = NOTIFICATIONS_BATCH_SIZE) -> int:
+    """Send one batch of due messages; several workers never claim the same message."""
+    messages = await claim_batch(db, batch_size)
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message.channel, []).append(message)
+    errors = {}
+    for channel, channel_messages in by_channel.items():
+        transport = transports.get(channel)
+        if transport is None:
+            errors.update({message.id: f'No transport for {channel}' for message in channel_messages})
+            continue
+        errors.update(await run_in_threadpool(transport.send, channel_messages))
+
+    now = datetime.utcnow()
+    for message in messages:
+        if message.id not in errors:
+            message.status = 'sent'
+            message.sent_at = now
+            message.body = REDACTED_BODY
+        elif message.attempts >= NOTIFICATIONS_MAX_ATTEMPTS:
+            message.status = 'failed'
+            message.last_error = errors[message.id]
+            message.body = REDACTED_BODY
+            logger.warning('Giving up on %s message %s: %s', message.channel, message.id, errors[message.id])
+        else:
+            message.last_error = errors[message.id]
+            message.next_attempt_at = now + retry_delay(message.attempts)
+    await db.commit()
+    return len(messages)
+
+
+async def purge_outbox(db: AsyncSession):
+    await db.execute(delete(OutboxModel).filter(
+        OutboxModel.status != 'pending',
+        OutboxModel.updated_at < datetime.utcnow() - timedelta(seconds=NOTIFICATIONS_RETENTION)
+    ))
+    await db.commit()
+
+
+@periodic(NOTIFICATIONS_INTERVAL)
+async def deliver_notifications():
+    async with AsyncSessionLocal() as db:
+        while await deliver_batch(db) == NOTIFICATIONS_BATCH_SIZE:
+            pass
+        await purge_outbox(db)
@@ -0,0 +1,55 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Annotated
+from uuid import UUID
+from fastapi import HTTPException, Query, status
+from sqlalchemy import DateTime, literal, tuple_
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+from config import MAX_PAGE_SIZE
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([str(value) if not isinstance(value, (int, float)) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(detail='Invalid cursor', status_code=status.HTTP_400_BAD_REQUEST)
+    return values
+
+
+# Page size query parameter shared by every list endpoint.
+page_limit = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+
+
+def seek_position(cursor: str):
+    created_at, row_id = decode_cursor(cursor, 2)
+    try:
+        return tuple_(literal(datetime.fromisoformat(created_at), DateTime), literal(UUID(row_id), PG_UUID))
+    except (TypeError, ValueError):
+        raise HTTPException(detail='Invalid cursor', status_code=status.HTTP_400_BAD_REQUEST)
+
+
+def keyset(query, model, cursor: str | None, limit: int, id_column=None):
+    """Order ``query`` newest first on (created_at, id) and seek past ``cursor``.
+
+    Fetches one extra row so :func:`page` can tell whether another page exists.
+    """
+    id_column = model.id if id_column is None else id_column
+    if cursor is not None:
+        query = query.filter(tuple_(model.created_at, id_column) < seek_position(cursor))
+    return query.order_by(model.created_at.desc(), id_column.desc()).limit(limit + 1)
+
+
+def page(rows, limit: int, key=lambda row: (row.created_at, row.id)) -> dict:
+    rows = list(rows)
+    next_cursor = encode_cursor(*key(rows[limit - 1])) if len(rows) > limit else None
+    return {'items': rows[:limit], 'next_cursor': next_cursor}
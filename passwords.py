@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from config import PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH, PASSWORD_HASH_WORKERS, PASSWORD_HASH_CONCURRENCY, \
+    PASSWORD_HASH_QUEUE_TIMEOUT
+
+# hashlib's scrypt/pbkdf2 release the GIL, so a small thread pool hashes in parallel
+# without touching the event loop or the threadpool Starlette uses for everything else.
+hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+hash_slots = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+# werkzeug expands the configured method (defaults for cost, rounds, ...), so compare against what it actually writes.
+CURRENT_METHOD = generate_password_hash('probe', PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH).split('$', 1)[0]
+
+
+async def run_hasher(function, *args):
+    try:
+        await asyncio.wait_for(hash_slots.acquire(), PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(detail='Server is busy, try again later', status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hash_executor, function, *args)
+    finally:
+        hash_slots.release()
+
+
+async def hash_password(password: str) -> str:
+    return await run_hasher(generate_password_hash, password, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+
+async def verify_password(password_hash: str, password: str) -> bool:
+    return await run_hasher(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    method, _, rest = password_hash.partition('$')
+    salt, _, _ = rest.partition('$')
+    return method != CURRENT_METHOD or len(salt) != PASSWORD_SALT_LENGTH
+
+
+def shutdown_hash_executor():
+    hash_executor.shutdown(wait=False, cancel_futures=True)
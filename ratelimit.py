@@ -0,0 +1,230 @@
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, literal
+from sqlalchemy.dialects.postgresql import insert
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from background import periodic
+from config import RATE_LIMIT_BACKEND, RATE_LIMIT_MEMORY_KEYS, RATE_LIMIT_TRUSTED_PROXIES, MAX_IN_FLIGHT_REQUESTS, \
+    AUTH_MAX_IN_FLIGHT, LOGIN_IP_LIMIT, LOGIN_IDENTIFIER_LIMIT, RESET_IP_LIMIT, RESET_IDENTIFIER_LIMIT, \
+    CHECK_CODE_IP_LIMIT, CHECK_CODE_IDENTIFIER_LIMIT
+from database import AsyncSessionLocal
+from general import detect_user_input, jwt_bearer
+from models import RateLimitModel
+
+MAX_BODY_SIZE = 64 * 1024
+
+
+def parse_limit(limit: str) -> tuple[int, float]:
+    """'5/60' means bursts of 5, refilled at 5 per 60 seconds."""
+    count, seconds = limit.split('/')
+    return int(count), int(count) / float(seconds)
+
+
+class MemoryBackend:
+    """Per-process token buckets; fine for a single worker, use the Postgres backend otherwise."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (capacity, now))
+        tokens = max(min(capacity, tokens + (now - updated) * rate) - 1, -1)
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return tokens
+
+
+class PostgresBackend:
+    """Token buckets shared by every worker, refilled and taken from in a single upsert."""
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        now = datetime.utcnow()
+        refilled = func.least(
+            capacity,
+            RateLimitModel.tokens + func.extract('epoch', literal(now) - RateLimitModel.updated_at) * rate
+        )
+        async with AsyncSessionLocal() as db:
+            tokens = await db.scalar(
+                insert(RateLimitModel).values(key=key, tokens=capacity - 1, updated_at=now).on_conflict_do_update(
+                    index_elements=['key'],
+                    set_={'tokens': func.greatest(refilled - 1, -1), 'updated_at': now}
+                ).returning(RateLimitModel.tokens)
+            )
+            await db.commit()
+        return tokens
+
+
+async def login_identifier(scope: Scope, body: bytes) -> str | None:
+    try:
+        identifier = json.loads(body).get('username_or_phone_number_or_email')
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(identifier, str):
+        return None
+    return f"{await detect_user_input(identifier) or 'unknown'}:{identifier.lower()}"
+
+
+async def token_identifier(scope: Scope, body: bytes) -> str | None:
+    authorization = dict(scope['headers']).get(b'authorization', b'').decode()
+    scheme, _, token = authorization.partition(' ')
+    claims = jwt_bearer.verify_jwt(token) if scheme == 'Bearer' and token else {}
+    return f"user:{claims['user_id']}" if claims.get('user_id') else None
+
+
+async def path_user_identifier(scope: Scope, body: bytes) -> str | None:
+    # /auth/check-code/{code}/{user_id}: the account being guessed at, whatever code is tried.
+    return f"user:{scope['path'].rstrip('/').rsplit('/', 1)[-1]}"
+
+
+class Rule:
+    def __init__(self, name: str, ip_limit: str, identifier_limit: str, identify):
+        self.name = name
+        self.ip_limit = parse_limit(ip_limit)
+        self.identifier_limit = parse_limit(identifier_limit)
+        self.identify = identify
+        self.in_flight = 0
+
+
+RULES = {
+    ('POST', '/auth/login'): Rule('login', LOGIN_IP_LIMIT, LOGIN_IDENTIFIER_LIMIT, login_identifier),
+    ('POST', '/auth/forgot-password'): Rule('reset', RESET_IP_LIMIT, RESET_IDENTIFIER_LIMIT, login_identifier),
+    ('GET', '/users/forgot-password'): Rule('reset', RESET_IP_LIMIT, RESET_IDENTIFIER_LIMIT, token_identifier),
+    # Both code checks share buckets, so a six digit code can't be brute-forced through either of them.
+    ('POST', '/auth/check-code/{code}/{user_id}'): Rule('check_code', CHECK_CODE_IP_LIMIT, CHECK_CODE_IDENTIFIER_LIMIT,
+                                                        path_user_identifier),
+    ('POST', '/users/check-code'): Rule('check_code', CHECK_CODE_IP_LIMIT, CHECK_CODE_IDENTIFIER_LIMIT, token_identifier),
+}
+TEMPLATE_RULES = [
+    (method, re.compile('^' + re.sub(r'\{[^/]+}', '[^/]+', path) + '$'), rule)
+    for (method, path), rule in RULES.items() if '{' in path
+]
+
+
+def find_rule(method: str, path: str) -> Rule | None:
+    if (method, path) in RULES:
+        return RULES[method, path]
+    for rule_method, regex, rule in TEMPLATE_RULES:
+        if rule_method == method and regex.match(path):
+            return rule
+    return None
+
+
+def client_ip(scope: Scope) -> str:
+    """The address our own proxies saw; entries left of theirs in X-Forwarded-For come from the client."""
+    if RATE_LIMIT_TRUSTED_PROXIES:
+        forwarded = [
+            address.strip() for name, value in scope['headers'] if name == b'x-forwarded-for'
+            for address in value.decode('latin-1').split(',') if address.strip()
+        ]
+        if len(forwarded) >= RATE_LIMIT_TRUSTED_PROXIES:
+            return forwarded[-RATE_LIMIT_TRUSTED_PROXIES]
+    return scope['client'][0] if scope.get('client') else 'unknown'
+
+
+class RateLimitMiddleware:
+    """Sheds load and throttles the auth hot paths before any handler work starts.
+
+    Every request counts against MAX_IN_FLIGHT_REQUESTS and each rate-limited
+    route against AUTH_MAX_IN_FLIGHT (503 when full). Limited routes then take
+    a token from a per-IP and a per-identifier bucket (429 when empty).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.backend = PostgresBackend() if RATE_LIMIT_BACKEND == 'postgres' else MemoryBackend(RATE_LIMIT_MEMORY_KEYS)
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        if scope['path'].startswith('/health/') or scope['path'] == '/metrics':
+            # Probes and scrapes must answer even when the worker is shedding load.
+            await self.app(scope, receive, send)
+            return
+        if MAX_IN_FLIGHT_REQUESTS and self.in_flight >= MAX_IN_FLIGHT_REQUESTS:
+            await self.reject(scope, receive, send, 503, 'Server is busy, try again later', 1)
+            return
+        self.in_flight += 1
+        try:
+            rule = find_rule(scope['method'], scope['path'])
+            if rule is None:
+                await self.app(scope, receive, send)
+            else:
+                await self.limited(rule, scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def limited(self, rule: Rule, scope: Scope, receive: Receive, send: Send):
+        if rule.in_flight >= AUTH_MAX_IN_FLIGHT:
+            await self.reject(scope, receive, send, 503, 'Server is busy, try again later', 1)
+            return
+        rule.in_flight += 1
+        try:
+            body, receive = await self.buffer_body(receive)
+            if body is None:
+                await self.reject(scope, receive, send, 413, 'Request body too large', None)
+                return
+            buckets = [(f'{rule.name}:ip:{client_ip(scope)}', rule.ip_limit)]
+            identifier = await rule.identify(scope, body)
+            if identifier is not None:
+                buckets.append((f'{rule.name}:id:{identifier}', rule.identifier_limit))
+            for key, (capacity, rate) in buckets:
+                tokens = await self.backend.take(key, capacity, rate)
+                if tokens < 0:
+                    await self.reject(scope, receive, send, 429, 'Too many requests', math.ceil((1 - tokens) / rate))
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            rule.in_flight -= 1
+
+    @staticmethod
+    async def buffer_body(receive: Receive):
+        # Read the (small) body once to find the identifier, then replay it to the app.
+        chunks, size, more_body = [], 0, True
+        while more_body:
+            message = await receive()
+            if message['type'] != 'http.request':
+                break
+            chunks.append(message.get('body', b''))
+            size += len(chunks[-1])
+            if size > MAX_BODY_SIZE:
+                return None, receive
+            more_body = message.get('more_body', False)
+        body = b''.join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return await receive()
+        return body, replay
+
+    @staticmethod
+    async def reject(scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, retry_after: int | None):
+        headers = {'retry-after': str(retry_after)} if retry_after else None
+        await JSONResponse({'detail': detail}, status_code=status_code, headers=headers)(scope, receive, send)
+
+
+async def prune_rate_limits(db, idle: timedelta = timedelta(days=1)):
+    await db.execute(delete(RateLimitModel).filter(RateLimitModel.updated_at < datetime.utcnow() - idle))
+    await db.commit()
+
+
+@periodic(60 * 60)
+async def prune_rate_limit_buckets():
+    if RATE_LIMIT_BACKEND == 'postgres':
+        async with AsyncSessionLocal() as db:
+            await prune_rate_limits(db)
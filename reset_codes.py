@@ -0,0 +1,59 @@
+import secrets
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from background import periodic
+from config import RESET_CODE_TTL, RESET_CODE_SWEEP_INTERVAL, RESET_CODE_SWEEP_BATCH_SIZE
+from database import AsyncSessionLocal
+from models import CodesModel
+
+
+async def issue_reset_code(db: AsyncSession, user_id) -> int:
+    """Return the user's unexpired code, or replace it with a fresh one. Users hold at most one code."""
+    now = datetime.utcnow()
+    issued = insert(CodesModel).values(
+        user_id=user_id,
+        code=secrets.randbelow(10 ** 6),
+        expires_at=now + timedelta(seconds=RESET_CODE_TTL),
+        created_at=now,
+        updated_at=now
+    )
+    still_valid = CodesModel.expires_at > now
+    return await db.scalar(issued.on_conflict_do_update(
+        constraint='_user_code_uc',
+        set_={
+            'code': case((still_valid, CodesModel.code), else_=issued.excluded.code),
+            'expires_at': case((still_valid, CodesModel.expires_at), else_=issued.excluded.expires_at),
+            'updated_at': now
+        }
+    ).returning(CodesModel.code))
+
+
+def valid_code(user_id, code: int | None = None, code_id: int | None = None):
+    filters = [CodesModel.user_id == user_id, CodesModel.expires_at > datetime.utcnow()]
+    if code is not None:
+        filters.append(CodesModel.code == code)
+    if code_id is not None:
+        filters.append(CodesModel.id == code_id)
+    return select(CodesModel).filter(*filters)
+
+
+async def sweep_expired_codes(db: AsyncSession, batch_size: int = RESET_CODE_SWEEP_BATCH_SIZE) -> int:
+    # Small committed batches keep row locks short, SKIP LOCKED steps around codes being redeemed.
+    swept = 0
+    while True:
+        expired = select(CodesModel.id).filter(CodesModel.expires_at <= datetime.utcnow()).limit(batch_size) \
+            .with_for_update(skip_locked=True).scalar_subquery()
+        result = await db.execute(delete(CodesModel).filter(CodesModel.id.in_(expired)))
+        await db.commit()
+        swept += result.rowcount
+        if result.rowcount < batch_size:
+            return swept
+
+
+@periodic(RESET_CODE_SWEEP_INTERVAL)
+async def sweep_reset_codes():
+    async with AsyncSessionLocal() as db:
+        await sweep_expired_codes(db)
@@ -0,0 +1,132 @@
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+RANGE_REGEX = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 256 * 1024
+ZERO_COPY_EXTENSION = 'http.response.zerocopysend'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return '*' in candidates or any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
+
+def not_modified_since(header: str, modified: int) -> bool:
+    try:
+        return modified <= int(parsedate_to_datetime(header).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Return the inclusive byte range requested by a single-range ``Range`` header.
+
+    Raises ``ValueError`` when the range cannot be satisfied; returns ``None`` for
+    headers we don't honour (multiple ranges, other units), which means "send it all".
+    """
+    match = RANGE_REGEX.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class MediaFileResponse(Response):
+    """Serve a file with strong validators, conditional GET and single byte ranges.
+
+    The body goes out through the ASGI zero-copy send extension when the server
+    offers it, otherwise it is read in chunks in the thread pool.
+    """
+
+    def __init__(self, request: Request, path: str, stat: os.stat_result, etag: str, media_type: str | None,
+                 cache_control: str = 'public, max-age=31536000, immutable'):
+        self.path = path
+        self.offset = 0
+        self.length = 0
+        self.send_body = request.method != 'HEAD'
+        headers = {
+            'etag': etag,
+            'last-modified': formatdate(stat.st_mtime, usegmt=True),
+            'accept-ranges': 'bytes',
+            'cache-control': cache_control,
+            'content-length': '0',
+        }
+        super().__init__(status_code=200, headers=headers, media_type=media_type)
+
+        if_none_match = request.headers.get('if-none-match')
+        if_modified_since = request.headers.get('if-modified-since')
+        if (if_none_match and etag_matches(if_none_match, etag)) or \
+                (if_none_match is None and if_modified_since and not_modified_since(if_modified_since, int(stat.st_mtime))):
+            self.status_code = 304
+            del self.headers['content-length']
+            return
+
+        byte_range = None
+        range_header = request.headers.get('range')
+        if_range = request.headers.get('if-range')
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, stat.st_size)
+            except ValueError:
+                self.status_code = 416
+                self.headers['content-range'] = f'bytes */{stat.st_size}'
+                return
+
+        if byte_range is None:
+            self.length = stat.st_size
+        else:
+            self.status_code = 206
+            self.offset, end = byte_range
+            self.length = end - self.offset + 1
+            self.headers['content-range'] = f'bytes {self.offset}-{end}/{stat.st_size}'
+        self.headers['content-length'] = str(self.length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if not self.send_body or self.length == 0:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        file = await run_in_threadpool(open, self.path, 'rb')
+        try:
+            if ZERO_COPY_EXTENSION in scope.get('extensions', {}):
+                await send({'type': ZERO_COPY_EXTENSION, 'file': file, 'offset': self.offset,
+                            'count': self.length, 'more_body': False})
+                return
+            await run_in_threadpool(file.seek, self.offset)
+            remaining = self.length
+            while remaining:
+                chunk = await run_in_threadpool(file.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining:
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await run_in_threadpool(file.close)
+
+
+async def media_file_response(request: Request, path: str, etag: str, media_type: str | None) -> MediaFileResponse:
+    """Stat the file off the event loop; a row whose file is gone is a 404, not a 500."""
+    try:
+        stat = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(detail='Media not found', status_code=status.HTTP_404_NOT_FOUND)
+    return MediaFileResponse(request, path, stat, etag, media_type)
@@ -1 +1,42 @@
-# Coming Soon
\ No newline at end of file
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from config import ADMIN_USER_IDS, SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD, SLOW_QUERY_EXPLAIN_RATE, HEALTH_CHECK_TIMEOUT
+from database import async_engine, pool_stats, server_connections
+from general import current_user_id
+from slow_queries import slow_queries
+
+admin = APIRouter(prefix='/admin', tags=['Admin'])
+
+
+async def require_admin(user_id: current_user_id):
+    if user_id not in ADMIN_USER_IDS:
+        raise HTTPException(detail='Admins only', status_code=status.HTTP_403_FORBIDDEN)
+    return user_id
+
+
+@admin.get('/slow-queries', status_code=status.HTTP_200_OK, dependencies=[Depends(require_admin)])
+async def get_slow_queries():
+    return {
+        'enabled': SLOW_QUERY_LOG,
+        'threshold_ms': SLOW_QUERY_THRESHOLD,
+        'explain_rate': SLOW_QUERY_EXPLAIN_RATE,
+        'entries': list(reversed(slow_queries)),
+    }
+
+
+@admin.delete('/slow-queries', status_code=status.HTTP_200_OK, dependencies=[Depends(require_admin)])
+async def clear_slow_queries():
+    slow_queries.clear()
+    return {'msg': 'Cleared'}
+
+
+@admin.get('/pool', status_code=status.HTTP_200_OK, dependencies=[Depends(require_admin)])
+async def pool():
+    """This worker's pool, plus the server-wide numbers to size workers * (size + overflow) against."""
+    stats = pool_stats.snapshot(async_engine.pool)
+    try:
+        stats['server'] = await asyncio.wait_for(server_connections(), HEALTH_CHECK_TIMEOUT)
+    except Exception:
+        stats['server'] = None
+    return stats
@@ -1,15 +1,16 @@
-import random
 from uuid import UUID
 from datetime import datetime, timedelta
 from config import SECRET_KEYS, ALGORITHM, tashkent, ACCESS_TOKEN_TIME, REFRESH_TOKEN_TIME
 from fastapi import APIRouter, status, HTTPException
-from general import db_dependency, detect_user_input, decode_jwt
-from models import UsersModel, CodesModel
-from routers.users import send_code_to_email, send_code_to_phone
-from schemas import RegisterSchema, LoginSchema, ForgotPasswordSchema, UpdatePasswordSchema, NewPasswordSchema
+from sqlalchemy import select
+from general import db_dependency, detect_user_input, user_cache
+from models import UsersModel
+from notifications import enqueue_reset_code
+from reset_codes import issue_reset_code, valid_code
+from schemas import RegisterSchema, LoginSchema, ForgotPasswordSchema, NewPasswordSchema
 from jose import jwt
-from werkzeug.security import generate_password_hash, check_password_hash
 from general import check_password
+from passwords import hash_password, verify_password, needs_rehash
 
 router = APIRouter(prefix='/auth', tags=['Auth'])
 
@@ -29,12 +30,11 @@ def create_tokens(username: str, user_id):
 
 @router.post('/register', status_code=status.HTTP_201_CREATED)
 async def registration(user_request: RegisterSchema, db: db_dependency):
-    password = check_password(user_request.password)
-    if not password:
+    if not check_password(user_request.password):
         raise HTTPException(detail='The password does not meet the requirement', status_code=status.HTTP_400_BAD_REQUEST)
     user = UsersModel(
         username=user_request.username,
-        password=password,
+        password=await hash_password(user_request.password),
         full_name=user_request.full_name,
         gender=user_request.gender,
         email=user_request.email,
@@ -42,7 +42,7 @@ async def registration(user_request: RegisterSchema, db: db_dependency):
     )
     try:
         db.add(user)
-        db.commit()
+        await db.commit()
         access_token, refresh_token = create_tokens(user_request.username, user_id=user.id)
         return {'access_token': access_token, 'refresh_token': refresh_token, 'message': 'Successfully registered', 'status': True}
     except Exception as e:
@@ -51,14 +51,20 @@ async def registration(user_request: RegisterSchema, db: db_dependency):
 @router.post('/login', status_code=status.HTTP_200_OK)
 async def sign_in(user_request: LoginSchema, db: db_dependency):
     user_input = await detect_user_input(user_request.username_or_phone_number_or_email)
-    user = db.query(UsersModel).filter(
+    user = await db.scalar(select(UsersModel).filter(
         (UsersModel.username == user_request.username_or_phone_number_or_email) if user_input == 'username' else
         (UsersModel.phone_number == user_request.username_or_phone_number_or_email) if user_input == 'phone_number' else
         (UsersModel.email == user_request.username_or_phone_number_or_email)
-    ).first()
+    ))
+    # Hand the connection back to the pool while the hash is checked.
+    await db.commit()
 
-    if user is None or not check_password_hash(user.password, user_request.password):
+    if user is None or not await verify_password(user.password, user_request.password):
         raise HTTPException(detail='Username or password is incorrect', status_code=status.HTTP_400_BAD_REQUEST)
+    if needs_rehash(user.password):
+        user.password = await hash_password(user_request.password)
+        await db.commit()
+        user_cache.invalidate(user.id)
 
     access_token, refresh_token = create_tokens(user.username, user.id)
     return {'access_token': access_token, 'refresh_token': refresh_token}
@@ -66,35 +72,32 @@ async def sign_in(user_request: LoginSchema, db: db_dependency):
 @router.post('/forgot-password', status_code=status.HTTP_200_OK)
 async def forgot_password(user_req: ForgotPasswordSchema, db: db_dependency):
     user_input = await detect_user_input(user_req.username_or_phone_number_or_email)
-    code = ''.join([str(random.randint(0,9)) for i in range(6)])
-    user = db.query(UsersModel).filter(
+    user = await db.scalar(select(UsersModel).filter(
         (UsersModel.username == user_req.username_or_phone_number_or_email) if user_input == 'username' else
         (UsersModel.email == user_req.username_or_phone_number_or_email) if user_input == 'email' else
         (UsersModel.phone_number == user_req.username_or_phone_number_or_email)
-    ).first()
-    print(code)
-    db_code =CodesModel(
-        user_id=user.id,
-        code=int(code)
-    )
-    db.add(db_code)
-    db.commit()
-    send_code_to_email(user.email, code) if user.email else send_code_to_phone(user.phone_number, code)
+    ))
+    if user is None:
+        raise HTTPException(detail='User not found', status_code=status.HTTP_404_NOT_FOUND)
+    code = await issue_reset_code(db, user.id)
+    enqueue_reset_code(db, user, code)
+    await db.commit()
     return {'msg': 'Code sent', 'user_id': user.id}
 
 @router.post('/check-code/{code}/{user_id}', status_code=status.HTTP_200_OK)
 async def check_code(user_id: UUID, code: int, db: db_dependency, update_req: NewPasswordSchema):
-    db_code = db.query(CodesModel).filter(CodesModel.code == code, CodesModel.user_id == user_id).first()
+    db_code = await db.scalar(valid_code(user_id, code=code))
     if not db_code:
         raise HTTPException(detail='Code not found', status_code=status.HTTP_404_NOT_FOUND)
-    db_user = db.query(UsersModel).filter(UsersModel.id == user_id).first()
+    db_user = await db.scalar(select(UsersModel).filter(UsersModel.id == user_id))
     if not db_user:
         raise HTTPException(detail='User not found', status_code=status.HTTP_404_NOT_FOUND)
     if not check_password(update_req.new_password):
         raise HTTPException(detail='The password does not meet the requirement', status_code=status.HTTP_400_BAD_REQUEST)
-    db_user.password = generate_password_hash(update_req.new_password)
-    db.delete(db_code)
-    db.commit()
+    db_user.password = await hash_password(update_req.new_password)
+    await db.delete(db_code)
+    await db.commit()
+    user_cache.invalidate(db_user.id)
     return {'msg': 'Updated'}
 
 
@@ -1,104 +1,179 @@
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Query
 from uuid import UUID
+from sqlalchemy import select, func, or_
 
-from general import db_dependency, JWTBearer, decode_jwt
+from config import PAGE_SIZE, THREAD_REPLY_LIMIT
+from counters import adjust_comments_count
+from general import db_dependency, JWTBearer, current_user_id
 from models import PostsModel, CommentsModel, UsersModel, CommentLikesModel, CommentRepliesModel
-from schemas import AddCommentSchema, ReplyCommentSchema
+from pagination import keyset, page, page_limit
+from routers.likes import add_like, remove_like
+from schemas import AddCommentSchema, ReplyCommentSchema, CommentThreadPageSchema
 
 comments = APIRouter(prefix='/comments', tags=['Comments'])
 
 @comments.get('/{post_id}', status_code=status.HTTP_200_OK)
-async def get_post_comments(post_id: UUID, db: db_dependency, user: str = Depends(JWTBearer())):
+async def get_post_comments(post_id: UUID, db: db_dependency, cursor: str | None = None, limit: page_limit = PAGE_SIZE,
+                            user: dict = Depends(JWTBearer())):
     if user is None:
         raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    post = db.query(PostsModel).filter(PostsModel.id == post_id).first()
-    if post is None:
+    if not await db.scalar(select(PostsModel.id).filter(PostsModel.id == post_id)):
         raise HTTPException(detail='Post not found', status_code=status.HTTP_404_NOT_FOUND)
-    return post.comments
+    post_comments = await db.scalars(
+        keyset(select(CommentsModel).filter(CommentsModel.post_id == post_id), CommentsModel, cursor, limit)
+    )
+    return page(post_comments, limit)
+
+def comment_author(row) -> dict:
+    return {'id': row.user_id, 'username': row.username, 'avatar_digest': row.avatar_digest}
+
+@comments.get('/thread/{post_id}', status_code=status.HTTP_200_OK, response_model=CommentThreadPageSchema)
+async def get_comment_thread(post_id: UUID, db: db_dependency, user_id: current_user_id, cursor: str | None = None,
+                             limit: page_limit = PAGE_SIZE,
+                             replies: int = Query(THREAD_REPLY_LIMIT, ge=0, le=THREAD_REPLY_LIMIT)):
+    """A page of top-level comments with their first replies, in four queries whatever the thread size."""
+    if not await db.scalar(select(PostsModel.id).filter(PostsModel.id == post_id)):
+        raise HTTPException(detail='Post not found', status_code=status.HTTP_404_NOT_FOUND)
+    comment_rows = (await db.execute(keyset(
+        select(CommentsModel.id, CommentsModel.content, CommentsModel.likes, CommentsModel.created_at,
+               CommentsModel.user_id, UsersModel.username, UsersModel.avatar_digest)
+        .join(UsersModel, UsersModel.id == CommentsModel.user_id).filter(CommentsModel.post_id == post_id),
+        CommentsModel, cursor, limit
+    ))).all()
+    thread = page(comment_rows, limit)
+    comment_ids = [row.id for row in thread['items']]
+
+    # Oldest replies first, numbered per comment so one query covers every comment on the page.
+    numbered = select(
+        CommentRepliesModel.id, CommentRepliesModel.comment_id, CommentRepliesModel.content, CommentRepliesModel.likes,
+        CommentRepliesModel.created_at, CommentRepliesModel.user_id,
+        func.row_number().over(partition_by=CommentRepliesModel.comment_id,
+                               order_by=(CommentRepliesModel.created_at, CommentRepliesModel.id)).label('position'),
+        func.count().over(partition_by=CommentRepliesModel.comment_id).label('total')
+    ).filter(CommentRepliesModel.comment_id.in_(comment_ids)).subquery()
+    # At least one row per comment, so replies_count is known even when no replies are requested.
+    reply_rows = (await db.execute(
+        select(numbered, UsersModel.username, UsersModel.avatar_digest)
+        .join(UsersModel, UsersModel.id == numbered.c.user_id)
+        .filter(numbered.c.position <= max(replies, 1)).order_by(numbered.c.comment_id, numbered.c.position)
+    )).all() if comment_ids else []
+    reply_ids = [row.id for row in reply_rows if row.position <= replies]
+
+    liked = set()
+    if comment_ids:
+        liked_rows = await db.execute(select(CommentLikesModel.comment_id, CommentLikesModel.comment_reply_id).filter(
+            CommentLikesModel.user_id == user_id,
+            or_(CommentLikesModel.comment_id.in_(comment_ids), CommentLikesModel.comment_reply_id.in_(reply_ids))
+        ))
+        liked = {row.comment_id or row.comment_reply_id for row in liked_rows}
+
+    replies_by_comment = {comment_id: {'total': 0, 'items': []} for comment_id in comment_ids}
+    for row in reply_rows:
+        replies_by_comment[row.comment_id]['total'] = row.total
+        if row.position <= replies:
+            replies_by_comment[row.comment_id]['items'].append({
+                'id': row.id,
+                'content': row.content,
+                'author': comment_author(row),
+                'likes': row.likes or 0,
+                'liked': row.id in liked,
+                'created_at': row.created_at
+            })
+    thread['items'] = [
+        {
+            'id': row.id,
+            'content': row.content,
+            'author': comment_author(row),
+            'likes': row.likes or 0,
+            'liked': row.id in liked,
+            'created_at': row.created_at,
+            'replies_count': replies_by_comment[row.id]['total'],
+            'replies': replies_by_comment[row.id]['items']
+        }
+        for row in thread['items']
+    ]
+    return thread
 
 @comments.post('/like/{comment_uid}', status_code=status.HTTP_200_OK)
-async def like_comment(comment_uid: UUID, db: db_dependency, user: str = Depends(JWTBearer())):
-    if user is None:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    comment = db.query(CommentsModel).filter(CommentsModel.id == comment_uid).first()
-    if not comment:
-        comment = db.query(CommentRepliesModel).filter(CommentRepliesModel.id == comment_uid).first()
-    db_user = db.query(UsersModel).filter(UsersModel.id == decode_jwt(user)['user_id']).first()
-    if not comment:
-        raise HTTPException(detail='Comment not found', status_code=status.HTTP_404_NOT_FOUND)
-    like = CommentLikesModel(
-        user_id=db_user.id,
-        comment_id=comment.id,
-        user=db_user,
-        comment=comment
-    )
-    db.add(like)
-    db.commit()
-    return {'msg': 'Liked to comment'}
+async def like_comment(comment_uid: UUID, db: db_dependency, user_id: current_user_id):
+    comment_likes = await add_like(db, CommentLikesModel, CommentsModel, 'comment_id', user_id, comment_uid)
+    if comment_likes is None:
+        comment_likes = await add_like(db, CommentLikesModel, CommentRepliesModel, 'comment_reply_id', user_id, comment_uid)
+    if comment_likes is None:
+        comment_exists = await db.scalar(select(CommentsModel.id).filter(CommentsModel.id == comment_uid).union_all(
+            select(CommentRepliesModel.id).filter(CommentRepliesModel.id == comment_uid)))
+        if not comment_exists:
+            raise HTTPException(detail='Comment not found', status_code=status.HTTP_404_NOT_FOUND)
+        return {'msg': 'Was liked'}
+    await db.commit()
+    return {'msg': 'Liked to comment', 'likes': comment_likes}
+
+@comments.delete('/unlike/{comment_uid}', status_code=status.HTTP_200_OK)
+async def unlike_comment(comment_uid: UUID, db: db_dependency, user_id: current_user_id):
+    comment_likes = await remove_like(db, CommentLikesModel, CommentsModel, 'comment_id', user_id, comment_uid)
+    if comment_likes is None:
+        comment_likes = await remove_like(db, CommentLikesModel, CommentRepliesModel, 'comment_reply_id', user_id, comment_uid)
+    if comment_likes is None:
+        raise HTTPException(detail='Liked comment not found', status_code=status.HTTP_404_NOT_FOUND)
+    await db.commit()
+    return {'msg': 'Comment like deleted', 'likes': comment_likes}
 
 @comments.post('/add-comment/{post_id}', status_code=status.HTTP_201_CREATED)
-async def write_comment(post_id: UUID, db: db_dependency, comment_req: AddCommentSchema, user: str = Depends(JWTBearer())):
-    if user is None:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    user_about = db.query(UsersModel).filter(UsersModel.id == decode_jwt(user)['user_id']).first()
-    post = db.query(PostsModel).filter(PostsModel.id == post_id).first()
-    if post is None:
+async def write_comment(post_id: UUID, db: db_dependency, comment_req: AddCommentSchema, user_id: current_user_id):
+    post_comments = await adjust_comments_count(db, post_id, 1)
+    if post_comments is None:
         raise HTTPException(detail='Post not found', status_code=status.HTTP_404_NOT_FOUND)
     comment = CommentsModel(
         content=comment_req.comment,
-        post_id=post.id,
-        user_id=user_about.id,
-        post=post,
-        user=user_about
+        post_id=post_id,
+        user_id=user_id
     )
     db.add(comment)
-    db.commit()
-    post_comments = db.query(CommentsModel).filter(CommentsModel.post_id == post_id).count()
+    await db.commit()
     return {'message': 'Comment wrote', 'count': post_comments}
 
 @comments.post('/reply/{comment_id}', status_code=status.HTTP_201_CREATED)
-async def reply_to_comment(comment_uid: UUID, reply_req: ReplyCommentSchema, db: db_dependency, user: str = Depends(JWTBearer())):
-    if user is None:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    comment = db.query(CommentsModel).filter(CommentsModel.id == comment_uid).first()
-    db_user = db.query(UsersModel).filter(UsersModel.id == decode_jwt(user)).first()
+async def reply_to_comment(comment_uid: UUID, reply_req: ReplyCommentSchema, db: db_dependency, user_id: current_user_id):
+    comment = await db.scalar(select(CommentsModel).filter(CommentsModel.id == comment_uid))
     if not comment:
         raise HTTPException(detail='Comment not found', status_code=status.HTTP_404_NOT_FOUND)
     reply = CommentRepliesModel(
         content=reply_req.reply,
         comment_id=comment.id,
-        user_id=db_user.id,
-        comment=comment,
-        user=db_user
+        user_id=user_id
     )
     db.add(reply)
-    db.commit()
+    await adjust_comments_count(db, comment.post_id, 1)
+    await db.commit()
     return {'msg': 'Replied'}
 
 @comments.delete('/delete/{comment_uid}', status_code=status.HTTP_200_OK)
-async def delete_comment(comment_uid: UUID, db: db_dependency, user: str = Depends(JWTBearer())):
-    if user is None:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    comment = db.query(CommentsModel).filter(CommentsModel.id == comment_uid).first()
-    if not comment:
-        comment = db.query(CommentRepliesModel).filter(CommentRepliesModel.id == comment_uid).first()
-    about_user = decode_jwt(user)
-    if not comment.user_id == about_user['user_id']:
+async def delete_comment(comment_uid: UUID, db: db_dependency, user_id: current_user_id):
+    comment = await db.scalar(select(CommentsModel).filter(CommentsModel.id == comment_uid))
+    if comment:
+        post_id = comment.post_id
+        removed = 1 + await db.scalar(
+            select(func.count()).select_from(CommentRepliesModel).filter(CommentRepliesModel.comment_id == comment.id))
+    else:
+        comment = await db.scalar(select(CommentRepliesModel).filter(CommentRepliesModel.id == comment_uid))
+        if not comment:
+            raise HTTPException(detail='Comment not found', status_code=status.HTTP_404_NOT_FOUND)
+        post_id = await db.scalar(select(CommentsModel.post_id).filter(CommentsModel.id == comment.comment_id))
+        removed = 1
+    if not comment.user_id == user_id:
         raise HTTPException(detail="You don't have permission to delete comment!", status_code=status.HTTP_400_BAD_REQUEST)
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await adjust_comments_count(db, post_id, -removed)
+    await db.commit()
     return {'message': 'Successfully deleted'}
 
 @comments.patch('/update/{comment_id}', status_code=status.HTTP_200_OK)
-async def update_comment(comment_uid: UUID, db: db_dependency, comment_req: AddCommentSchema, user: str = Depends(JWTBearer())):
-    if not user:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    comment = db.query(CommentsModel).filter(CommentsModel.id == comment_uid).first()
+async def update_comment(comment_uid: UUID, db: db_dependency, comment_req: AddCommentSchema, user_id: current_user_id):
+    comment = await db.scalar(select(CommentsModel).filter(CommentsModel.id == comment_uid))
     if not comment:
-        comment = db.query(CommentRepliesModel).filter(CommentRepliesModel.id == comment_uid).first()
-    about_user = decode_jwt(user)
-    if not comment.user_id == about_user['user_id']:
+        comment = await db.scalar(select(CommentRepliesModel).filter(CommentRepliesModel.id == comment_uid))
+    if not comment.user_id == user_id:
         raise HTTPException(detail="You don't have permission to delete comment!", status_code=status.HTTP_400_BAD_REQUEST)
     comment.content = comment_req.comment
-    db.commit()
+    await db.commit()
     return {'msg': 'Successfully updated.'}
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, status
+
+from config import PAGE_SIZE
+from general import db_dependency, current_user_id
+from pagination import page, page_limit
+from schemas import FeedPageSchema
+from timelines import feed_query
+
+feed = APIRouter(prefix='/feed', tags=['Feed'])
+
+
+@feed.get('', status_code=status.HTTP_200_OK, response_model=FeedPageSchema)
+async def home_feed(db: db_dependency, user_id: current_user_id, cursor: str | None = None,
+                    limit: page_limit = PAGE_SIZE):
+    feed_page = page(await db.scalars(feed_query(user_id, cursor, limit)), limit)
+    feed_page['items'] = [
+        {
+            "id": post.id,
+            "owner_id": post.owner_id,
+            "title": post.title,
+            "post_file": post.post_file,
+            "media_digest": post.media_digest,
+            "likes": post.likes if post.access_to_likes else False,
+            "views": post.views if post.access_to_views else False,
+            "created_at": post.created_at
+        }
+        for post in feed_page['items']
+    ]
+    return feed_page
@@ -0,0 +1,31 @@
+import asyncio
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from config import HEALTH_CHECK_TIMEOUT
+from database import ping
+
+health = APIRouter(prefix='/health', tags=['Health'])
+
+
+class Readiness:
+    """Flipped on once the lifespan startup has warmed the worker, and off again as it starts draining."""
+    ready = False
+
+
+@health.get('/live', status_code=status.HTTP_200_OK)
+async def live():
+    # No I/O: a slow database must not get a healthy worker restarted.
+    return {'status': 'alive'}
+
+
+@health.get('/ready', status_code=status.HTTP_200_OK)
+async def ready():
+    if not Readiness.ready:
+        return JSONResponse({'status': 'not ready'}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        await asyncio.wait_for(ping(), HEALTH_CHECK_TIMEOUT)
+    except Exception:
+        return JSONResponse({'status': 'database unavailable'}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {'status': 'ready'}
+
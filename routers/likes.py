@@ -1,44 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import uuid
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, status
 from uuid import UUID
-from general import db_dependency, JWTBearer, decode_jwt
-from models import UsersModel, PostsModel, PostLikesModel
+from sqlalchemy import select, update, delete, func, literal
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from config import PAGE_SIZE
+from general import db_dependency, current_user_id
+from models import PostsModel, PostLikesModel
+from pagination import keyset, page, page_limit
 
 likes = APIRouter(prefix='/likes', tags=['Likes'])
 
+
+async def add_like(db, like_model, target_model, target_column: str, user_id, target_id) -> int | None:
+    """Insert a like and bump the target's counter in one statement.
+
+    Returns the new counter, or None when the like already existed or the target is missing.
+    """
+    now = datetime.utcnow()
+    inserted = insert(like_model).from_select(
+        ['id', 'user_id', target_column, 'created_at', 'updated_at'],
+        select(
+            literal(uuid.uuid4(), postgresql.UUID),
+            literal(user_id, postgresql.UUID),
+            target_model.id,
+            literal(now),
+            literal(now)
+        ).filter(target_model.id == target_id)
+    ).on_conflict_do_nothing().returning(getattr(like_model, target_column)).cte('inserted')
+    return await db.scalar(
+        update(target_model).filter(target_model.id == inserted.c[target_column]).values(
+            likes=func.coalesce(target_model.likes, 0) + 1
+        ).returning(target_model.likes).execution_options(synchronize_session=False)
+    )
+
+
+async def remove_like(db, like_model, target_model, target_column: str, user_id, target_id) -> int | None:
+    deleted = delete(like_model).filter(
+        like_model.user_id == user_id,
+        getattr(like_model, target_column) == target_id
+    ).returning(getattr(like_model, target_column)).cte('deleted')
+    return await db.scalar(
+        update(target_model).filter(target_model.id == deleted.c[target_column]).values(
+            likes=func.greatest(func.coalesce(target_model.likes, 0) - 1, 0)
+        ).returning(target_model.likes).execution_options(synchronize_session=False)
+    )
+
+
 @likes.get('/my-liked-posts', status_code=status.HTTP_200_OK)
-async def user_liked_posts(db: db_dependency, user: str = Depends(JWTBearer())):
-    if user is None:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    db_user = db.query(UsersModel).filter(UsersModel.id == decode_jwt(user)['user_id']).first()
-    liked_posts = db.query(PostLikesModel).filter(PostLikesModel.user_id == db_user.id).all()
-    return liked_posts
+async def user_liked_posts(db: db_dependency, user_id: current_user_id, cursor: str | None = None,
+                           limit: page_limit = PAGE_SIZE):
+    liked_posts = await db.scalars(
+        keyset(select(PostLikesModel).filter(PostLikesModel.user_id == user_id), PostLikesModel, cursor, limit)
+    )
+    return page(liked_posts, limit)
 
 @likes.post('/like/{post_id}', status_code=status.HTTP_200_OK)
-async def like_post(post_id: UUID, db: db_dependency, user: str = Depends(JWTBearer())):
-    if user is None:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    db_user = db.query(UsersModel).filter(UsersModel.id == decode_jwt(user)['user_id'])
-    post = db.query(PostsModel).filter(PostsModel.id == post_id).first()
-    if not post:
-        raise HTTPException(detail='Post not found', status_code=status.HTTP_404_NOT_FOUND)
-    try:
-        like = PostLikesModel(
-            user_id=db_user.id,
-            post_id=post.id
-        )
-        db.add(like)
-        return {'msg': 'Successfully liked'}
-    except:
+async def like_post(post_id: UUID, db: db_dependency, user_id: current_user_id):
+    post_likes = await add_like(db, PostLikesModel, PostsModel, 'post_id', user_id, post_id)
+    if post_likes is None:
+        if not await db.scalar(select(PostsModel.id).filter(PostsModel.id == post_id)):
+            raise HTTPException(detail='Post not found', status_code=status.HTTP_404_NOT_FOUND)
         return {'msg': 'Was liked'}
+    await db.commit()
+    return {'msg': 'Successfully liked', 'likes': post_likes}
 
 @likes.delete('/unlike/{post_id}', status_code=status.HTTP_200_OK)
-async def unlike_post(post_id: UUID, db: db_dependency, user: str = Depends(JWTBearer())):
-    if user is None:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    user_id = decode_jwt(user)['user_id']
-    is_liked = db.query(PostLikesModel).filter(PostLikesModel.user_id == user_id, PostLikesModel.post_id == post_id).first()
-    if not is_liked:
+async def unlike_post(post_id: UUID, db: db_dependency, user_id: current_user_id):
+    post_likes = await remove_like(db, PostLikesModel, PostsModel, 'post_id', user_id, post_id)
+    if post_likes is None:
         raise HTTPException(detail='Liked post not found', status_code=status.HTTP_404_NOT_FOUND)
-    db.delete(is_liked)
-    db.commit()
-    return {'msg': 'Liked post deleted'}
\ No newline at end of file
+    await db.commit()
+    return {'msg': 'Liked post deleted', 'likes': post_likes}
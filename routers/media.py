@@ -0,0 +1,72 @@
+import re
+from typing import Literal
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select
+
+from derivatives import VARIANT_SIZES, closest_variant
+from general import JWTBearer, db_dependency
+from models import MediaModel, PostsModel, UsersModel
+from responses import media_file_response
+
+DIGEST_REGEX = re.compile(r'^[0-9a-f]{64}$')
+VARIANT_MEDIA_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+media = APIRouter(prefix='/media', tags=['Media'])
+
+
+def media_url(request: Request, digest: str, size: int | None, extension: str, media_row: MediaModel | None):
+    url = request.url_for('serve_media', digest=digest)
+    variant = closest_variant(media_row, size, extension) if size else None
+    if variant is not None:
+        url = url.include_query_params(variant=variant['name'], extension=extension)
+    return RedirectResponse(str(url), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+
+@media.api_route('/{digest}', methods=['GET', 'HEAD'])
+async def serve_media(digest: str, request: Request, db: db_dependency, variant: str | None = None,
+                      extension: Literal['webp', 'jpeg'] = 'webp'):
+    if not DIGEST_REGEX.match(digest) or (variant is not None and variant not in VARIANT_SIZES):
+        raise HTTPException(detail='Media not found', status_code=status.HTTP_404_NOT_FOUND)
+    db_media = await db.scalar(select(MediaModel).filter(MediaModel.digest == digest))
+    # Hand the connection back before the file streams; a slow client must not hold it open in a transaction.
+    await db.commit()
+    if db_media is None:
+        raise HTTPException(detail='Media not found', status_code=status.HTTP_404_NOT_FOUND)
+    if variant is None:
+        return await media_file_response(request, db_media.path, f'"{digest}"', db_media.content_type)
+    if not db_media.variants or variant not in db_media.variants:
+        raise HTTPException(detail='Variant not found', status_code=status.HTTP_404_NOT_FOUND)
+    return await media_file_response(request, db_media.variants[variant][extension], f'"{digest}.{variant}.{extension}"',
+                                     VARIANT_MEDIA_TYPES[extension])
+
+
+@media.get('/posts/{post_id}')
+async def post_media(post_id: UUID, request: Request, db: db_dependency, size: int | None = None,
+                     extension: Literal['webp', 'jpeg'] = 'webp', user: dict = Depends(JWTBearer())):
+    if user is None:
+        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
+    row = (await db.execute(
+        select(PostsModel.media_digest, MediaModel).outerjoin(MediaModel, MediaModel.digest == PostsModel.media_digest).filter(
+            PostsModel.id == post_id)
+    )).first()
+    await db.commit()
+    if row is None or row.media_digest is None:
+        raise HTTPException(detail='Post media not found', status_code=status.HTTP_404_NOT_FOUND)
+    return media_url(request, row.media_digest, size, extension, row.MediaModel)
+
+
+@media.get('/avatars/{user_id}')
+async def avatar_media(user_id: UUID, request: Request, db: db_dependency, size: int | None = None,
+                       extension: Literal['webp', 'jpeg'] = 'webp', user: dict = Depends(JWTBearer())):
+    if user is None:
+        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
+    row = (await db.execute(
+        select(UsersModel.avatar_digest, MediaModel).outerjoin(MediaModel, MediaModel.digest == UsersModel.avatar_digest).filter(
+            UsersModel.id == user_id)
+    )).first()
+    await db.commit()
+    if row is None or row.avatar_digest is None:
+        raise HTTPException(detail='Avatar not found', status_code=status.HTTP_404_NOT_FOUND)
+    return media_url(request, row.avatar_digest, size, extension, row.MediaModel)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metrics import render
+
+metrics = APIRouter(tags=['Metrics'])
+
+
+@metrics.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(render(), media_type='text/plain; version=0.0.4')
@@ -1,89 +1,96 @@
+from typing import List
 from uuid import UUID
-from fastapi import APIRouter, HTTPException, status, File, UploadFile, Depends
-from sqlalchemy.orm import joinedload
-from general import JWTBearer, db_dependency, decode_jwt
-from models import UsersModel, PostsModel, CommentsModel, PostViewsModel, PostLikesModel
-from schemas import CreatePostSchema, PostSchema, UpdatePostSchema
-from config import UPLOAD_FOLDER
+from fastapi import APIRouter, HTTPException, status, File, UploadFile, Depends, BackgroundTasks
+from sqlalchemy import select, delete, case, exists, func
+from config import PAGE_SIZE
+from general import JWTBearer, db_dependency, current_user_id
+from derivatives import generate_derivatives
+from models import PostsModel, PostLikesModel, SavesModel
+from pagination import keyset, page, page_limit
+from schemas import CreatePostSchema, PostSchema, UpdatePostSchema, PostBatchRequestSchema, BatchPostSchema
+from storage import store_upload, release
+from timelines import fan_out_post
+from views import view_buffer
 
 posts = APIRouter(prefix='/posts', tags=['Posts'])
 
-async def save_post(file: File(), post_uid: UUID):
-    file_location = f"{UPLOAD_FOLDER}/posts/{post_uid}.{file.filename.split('.')[-1]}"
-    with open(file_location, "wb") as file_object:
-        file_object.write(file.file.read())
-    return file_location
-
 @posts.post('/new-post', status_code=status.HTTP_201_CREATED)
-async def add_new_post(db: db_dependency, post_request: CreatePostSchema, user: str = Depends(JWTBearer())):
-    if not user:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-
-    user_about = decode_jwt(token=user)
-    owner = db.query(UsersModel).filter(UsersModel.id == user_about['user_id']).first()
-
+async def add_new_post(db: db_dependency, post_request: CreatePostSchema, user_id: current_user_id,
+                       background_tasks: BackgroundTasks):
     new_post = PostsModel(
         title=post_request.title,
         access_to_views=post_request.access_to_views,
         access_to_comments=post_request.access_to_comments,
         access_to_likes=post_request.access_to_likes,
-        owner_id=user_about['user_id'],
-        owner=owner
+        owner_id=user_id
     )
     db.add(new_post)
-    db.commit()
+    await db.commit()
+    background_tasks.add_task(fan_out_post, new_post.id)
     return {"message": "Post created successfully!", "post_id": new_post.id}
 
 @posts.post('/upload-post-file/{post_id}', status_code=status.HTTP_200_OK)
-async def upload_post_file(db: db_dependency, post_id: UUID, file: UploadFile = File(...)):
+async def upload_post_file(db: db_dependency, post_id: UUID, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     try:
-        post = db.query(PostsModel).filter(PostsModel.id == post_id).first()
+        post = await db.scalar(select(PostsModel).filter(PostsModel.id == post_id))
         if not post:
             raise HTTPException(detail='Post not found', status_code=status.HTTP_404_NOT_FOUND)
-        post.post_file = await save_post(file, post_uid=post.id)
-        db.commit()
+        media = await store_upload(db, file)
+        await release(db, post.media_digest)
+        post.media_digest = media.digest
+        post.post_file = media.path
+        await db.commit()
+        background_tasks.add_task(generate_derivatives, media.digest)
         return {'message': 'Successfully created.'}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(detail=e, status_code=status.HTTP_400_BAD_REQUEST)
 
 @posts.get('/get-my-posts', status_code=status.HTTP_200_OK)
-async def get_my_posts(db: db_dependency, user: str = Depends(JWTBearer())):
-    if not user:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
+async def get_my_posts(db: db_dependency, user_id: current_user_id, cursor: str | None = None,
+                       limit: page_limit = PAGE_SIZE):
+    user_posts = await db.scalars(keyset(select(PostsModel).filter_by(owner_id=user_id), PostsModel, cursor, limit))
+    return page(user_posts, limit)
 
-    about_user = decode_jwt(user)
-
-    try:
-        user_posts = db.query(PostsModel).filter_by(owner_id=about_user['user_id']).all()
-    except Exception as e:
-        raise HTTPException(detail=e, status_code=status.HTTP_400_BAD_REQUEST)
-
-    return user_posts
+@posts.post('/batch', status_code=status.HTTP_200_OK, response_model=List[BatchPostSchema])
+async def get_posts_batch(db: db_dependency, batch_req: PostBatchRequestSchema, user_id: current_user_id):
+    """Hydrate a grid of posts in one query; unlike GET /posts/{id} this does not count as a view."""
+    post_ids = list(dict.fromkeys(batch_req.post_ids))
+    columns = [
+        PostsModel.id,
+        PostsModel.title,
+        PostsModel.post_file,
+        # Hidden counters never leave the database; NULL becomes False like in get_post.
+        case((PostsModel.access_to_likes, func.coalesce(PostsModel.likes, 0))).label('likes'),
+        case((PostsModel.access_to_views, func.coalesce(PostsModel.views, 0))).label('views'),
+        case((PostsModel.access_to_comments, PostsModel.comments_count)).label('comments'),
+    ]
+    if batch_req.viewer_flags:
+        columns += [
+            exists().where(PostLikesModel.post_id == PostsModel.id, PostLikesModel.user_id == user_id).label('has_liked'),
+            exists().where(SavesModel.post_id == PostsModel.id, SavesModel.user_id == user_id).label('has_saved'),
+        ]
+    rows = (await db.execute(select(*columns).filter(PostsModel.id.in_(post_ids)))).mappings().all()
+    position = {post_id: index for index, post_id in enumerate(post_ids)}
+    return [
+        {**row, **{counter: False for counter in ('likes', 'views', 'comments') if row[counter] is None}}
+        for row in sorted(rows, key=lambda row: position[row['id']])
+    ]
 
 @posts.get('/{post_uuid}', response_model=PostSchema)
-async def get_post(post_uuid: UUID, db: db_dependency, user: str = Depends(JWTBearer())):
-    if not user:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    try:
-        view = PostViewsModel(
-            user_id=decode_jwt(user)['user_id'],
-            post_id=post_uuid
-        )
-        db.add(view)
-        db.commit()
-    except Exception as e:
-        raise HTTPException(detail=e, status_code=status.HTTP_400_BAD_REQUEST)
-    post = db.query(PostsModel).filter(PostsModel.id == post_uuid).first()
+async def get_post(post_uuid: UUID, db: db_dependency, user_id: current_user_id):
+    post = await db.scalar(select(PostsModel).filter(PostsModel.id == post_uuid))
     if not post:
         raise HTTPException(detail='Post not found', status_code=status.HTTP_404_NOT_FOUND)
-    comments_count = db.query(CommentsModel).filter(CommentsModel.post_id == post_uuid).count()
+    view_buffer.record(user_id, post.id)
     post_data = {
         "id": post.id,
         "title": post.title,
         "post_file": post.post_file,
         "likes": post.likes if post.access_to_likes else False,
         "views": post.views if post.access_to_views else False,
-        "comments": comments_count if post.access_to_comments else False
+        "comments": post.comments_count if post.access_to_comments else False
     }
     post_schema = PostSchema(**post_data)
 
@@ -91,24 +98,22 @@ async def get_post(post_uuid: UUID, db: db_dependency, user: str = Depends(JWTBe
 
 
 @posts.put('/update/{post_uuid}', status_code=status.HTTP_200_OK)
-async def update_post(post_uuid: UUID, db: db_dependency, update_req: UpdatePostSchema, user: str = Depends(JWTBearer())):
-    if not user:
-        raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    about_owner = decode_jwt(user)
-    post = db.query(PostsModel).filter(PostsModel.id == post_uuid).first()
-    if str(post.owner_id) != str(about_owner['user_id']):
+async def update_post(post_uuid: UUID, db: db_dependency, update_req: UpdatePostSchema, user_id: current_user_id):
+    post = await db.scalar(select(PostsModel).filter(PostsModel.id == post_uuid))
+    if str(post.owner_id) != str(user_id):
         raise HTTPException(detail="You don't have permission to update this post", status_code=status.HTTP_403_FORBIDDEN)
-    post.title = update_req.title,
+    post.title = update_req.title
     post.access_to_views = bool(update_req.access_to_views)
     post.access_to_likes = bool(update_req.access_to_likes)
     post.access_to_comments = bool(update_req.access_to_comments)
-    db.commit()
+    await db.commit()
     return {'message': 'Successfully updated'}
 
 @posts.delete('/delete/{post_uuid}', status_code=status.HTTP_200_OK)
-async def delete_post(post_uuid: UUID, db: db_dependency, user: str = Depends(JWTBearer())):
+async def delete_post(post_uuid: UUID, db: db_dependency, user: dict = Depends(JWTBearer())):
     if not user:
         raise HTTPException(detail='User is not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    db.query(PostsModel).filter_by(id=post_uuid).delete()
-    db.commit()
+    deleted = await db.execute(delete(PostsModel).filter_by(id=post_uuid).returning(PostsModel.media_digest))
+    await release(db, deleted.scalar())
+    await db.commit()
     return {'message': "Post successfully deleted"}
\ No newline at end of file
@@ -1,25 +1,71 @@
 from typing import List
+from uuid import UUID
 
-from fastapi import APIRouter, status, Depends, HTTPException
-from sqlalchemy.orm.strategy_options import joinedload
+from fastapi import APIRouter, status, Depends, HTTPException, Query
+from sqlalchemy import select, func, or_, tuple_, literal, Float
 
+from config import PAGE_SIZE, AUTOCOMPLETE_LIMIT
 from general import JWTBearer, db_dependency
-from models import UsersModel, PostsModel, CommentsModel
-from schemas import UserSchema
+from models import UsersModel
+from pagination import encode_cursor, decode_cursor, page_limit
+from schemas import UserSearchSchema, UserSearchPageSchema
 
 search = APIRouter(prefix='/search', tags=['Search'])
 
+# pg_trgm can't use the GIN index for patterns shorter than one trigram.
+MIN_TRIGRAM_LENGTH = 3
 
-@search.get('/{username}', status_code=status.HTTP_200_OK, response_model=List[UserSchema])
-async def search_user_by_username(username: str, db: db_dependency, user: str = Depends(JWTBearer())):
+
+def escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def username_prefix(prefix: str):
+    # Matches the lower(username) text_pattern_ops index.
+    return func.lower(UsersModel.username).like(f'{escape_like(prefix.lower())}%')
+
+
+@search.get('/autocomplete', status_code=status.HTTP_200_OK, response_model=List[UserSearchSchema])
+async def autocomplete_users(db: db_dependency, q: str = Query(min_length=1, max_length=100),
+                             limit: int = Query(AUTOCOMPLETE_LIMIT, ge=1, le=AUTOCOMPLETE_LIMIT),
+                             user: dict = Depends(JWTBearer())):
     if user is None:
         raise HTTPException(detail='User not authenticated', status_code=status.HTTP_403_FORBIDDEN)
-    db_users = db.query(UsersModel).options(
-        joinedload(UsersModel.posts)).filter(
-        UsersModel.username.ilike(f'%{username}%')
-    ).all()
+    rows = await db.execute(
+        select(UsersModel.id, UsersModel.username, UsersModel.full_name, UsersModel.avatar_digest).filter(
+            username_prefix(q)
+        ).order_by(func.lower(UsersModel.username)).limit(limit)
+    )
+    return rows.mappings().all()
+
+
+@search.get('/{username}', status_code=status.HTTP_200_OK, response_model=UserSearchPageSchema)
+async def search_user_by_username(username: str, db: db_dependency, cursor: str | None = None,
+                                  limit: page_limit = PAGE_SIZE,
+                                  user: dict = Depends(JWTBearer())):
+    if user is None:
+        raise HTTPException(detail='User not authenticated', status_code=status.HTTP_403_FORBIDDEN)
+    if len(username) < MIN_TRIGRAM_LENGTH:
+        matches = username_prefix(username)
+    else:
+        pattern = f'%{escape_like(username)}%'
+        matches = or_(UsersModel.username.ilike(pattern), UsersModel.full_name.ilike(pattern))
+    rank = func.greatest(
+        func.similarity(UsersModel.username, username),
+        func.coalesce(func.similarity(UsersModel.full_name, username), 0)
+    ).label('rank')
+
+    query = select(UsersModel.id, UsersModel.username, UsersModel.full_name, UsersModel.avatar_digest, rank).filter(matches)
+    if cursor is not None:
+        last_rank, last_id = decode_cursor(cursor, 2)
+        try:
+            query = query.filter(tuple_(rank, UsersModel.id) < tuple_(literal(float(last_rank), Float), UUID(last_id)))
+        except (TypeError, ValueError):
+            raise HTTPException(detail='Invalid cursor', status_code=status.HTTP_400_BAD_REQUEST)
+    rows = (await db.execute(query.order_by(rank.desc(), UsersModel.id.desc()).limit(limit + 1))).mappings().all()
 
-    if not db_users:
+    if not rows and cursor is None:
         raise HTTPException(detail='No users found', status_code=status.HTTP_404_NOT_FOUND)
 
-    return db_users
+    next_cursor = encode_cursor(rows[limit - 1]['rank'], rows[limit - 1]['id']) if len(rows) > limit else None
+    return {'items': rows[:limit], 'next_cursor': next_cursor}
@@ -2,9 +2,11 @@ from typing import Optional, List, Union, Annotated, Dict
 from uuid import UUID
 from datetime import datetime, date
 from fastapi import File
-from pydantic import BaseModel, UUID4
+from pydantic import BaseModel, UUID4, Field
 from pydantic.v1 import root_validator
 
+from config import BATCH_POSTS_LIMIT
+
 
 class RegisterSchema(BaseModel):
     full_name: str
@@ -60,10 +62,37 @@ class CommentSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class CommentAuthorSchema(BaseModel):
+    id: UUID
+    username: str
+    avatar_digest: str | None = None
+
+class ThreadReplySchema(BaseModel):
+    id: UUID
+    content: str
+    author: CommentAuthorSchema
+    likes: int
+    liked: bool
+    created_at: datetime
+
+class ThreadCommentSchema(BaseModel):
+    id: UUID
+    content: str
+    author: CommentAuthorSchema
+    likes: int
+    liked: bool
+    created_at: datetime
+    replies_count: int
+    replies: List[ThreadReplySchema]
+
+class CommentThreadPageSchema(BaseModel):
+    items: List[ThreadCommentSchema]
+    next_cursor: str | None = None
+
 class PostSchema(BaseModel):
     id: UUID
     title: str
-    post_file: str
+    post_file: str | None
     likes: Union[int, bool]
     views: Union[int, bool]
     comments: Union[int, bool]
@@ -71,6 +100,29 @@ class PostSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class PostBatchRequestSchema(BaseModel):
+    post_ids: List[UUID] = Field(min_length=1, max_length=BATCH_POSTS_LIMIT)
+    viewer_flags: bool = False
+
+class BatchPostSchema(PostSchema):
+    post_file: str | None = None
+    has_liked: bool | None = None
+    has_saved: bool | None = None
+
+class FeedPostSchema(BaseModel):
+    id: UUID
+    owner_id: UUID
+    title: str
+    post_file: str | None = None
+    media_digest: str | None = None
+    likes: Union[int, bool]
+    views: Union[int, bool]
+    created_at: datetime
+
+class FeedPageSchema(BaseModel):
+    items: List[FeedPostSchema]
+    next_cursor: str | None = None
+
 class UserSchema(BaseModel):
     id: UUID
     username: str
@@ -84,6 +136,19 @@ class UserSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class UserSearchSchema(BaseModel):
+    id: UUID
+    username: str
+    full_name: str | None = None
+    avatar_digest: str | None = None
+
+    class Config:
+        from_attributes = True
+
+class UserSearchPageSchema(BaseModel):
+    items: List[UserSearchSchema]
+    next_cursor: str | None = None
+
 class AddCommentSchema(BaseModel):
     comment: str
 
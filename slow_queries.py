@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event
+
+from config import SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD, SLOW_QUERY_EXPLAIN_RATE, SLOW_QUERY_BUFFER_SIZE
+from database import async_engine
+from metrics import current_request, route_name
+
+logger = logging.getLogger(__name__)
+
+# Only plain reads are re-run under EXPLAIN ANALYZE; anything else would execute its side effects twice.
+EXPLAINABLE_REGEX = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+LOCKING_REGEX = re.compile(r'\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE|KEY\s+SHARE)\b', re.IGNORECASE)
+MAX_PARAMETER_LENGTH = 100
+
+slow_queries: deque = deque(maxlen=SLOW_QUERY_BUFFER_SIZE)
+explain_tasks: set = set()
+
+
+def format_parameters(parameters) -> list:
+    if not isinstance(parameters, (tuple, list)):
+        return [repr(parameters)[:MAX_PARAMETER_LENGTH]]
+    return [repr(value)[:MAX_PARAMETER_LENGTH] for value in parameters]
+
+
+def explainable(statement: str, executemany: bool) -> bool:
+    return not executemany and bool(EXPLAINABLE_REGEX.match(statement)) and not LOCKING_REGEX.search(statement)
+
+
+async def explain(entry: dict, statement: str, parameters):
+    # Own connection and a rolled back transaction, so the request never waits on the plan.
+    try:
+        async with async_engine.connect() as connection:
+            rows = await connection.exec_driver_sql(f'EXPLAIN (ANALYZE, BUFFERS) {statement}', tuple(parameters or ()))
+            entry['plan'] = [row[0] for row in rows]
+    except Exception as e:
+        entry['plan_error'] = str(e)
+    slow_queries.append(entry)
+
+
+def start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['slow_query_started'] = time.perf_counter()
+
+
+def check_duration(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('slow_query_started', None)
+    if started is None or statement.startswith('EXPLAIN'):
+        return
+    duration = (time.perf_counter() - started) * 1000
+    if duration < SLOW_QUERY_THRESHOLD:
+        return
+    stats = current_request.get()
+    route = route_name(stats.scope) if stats is not None else None
+    logger.warning('Slow query (%.1f ms) in %s: %s %s', duration, route or 'background job', ' '.join(statement.split()),
+                   format_parameters(parameters))
+    # One EXPLAIN at a time: profiling must not become the load it is trying to explain.
+    if explain_tasks or random.random() >= SLOW_QUERY_EXPLAIN_RATE or not explainable(statement, executemany):
+        return
+    entry = {
+        'at': datetime.utcnow(),
+        'route': route,
+        'duration_ms': round(duration, 2),
+        'statement': statement,
+        'parameters': format_parameters(parameters),
+    }
+    task = asyncio.get_running_loop().create_task(explain(entry, statement, parameters))
+    explain_tasks.add(task)
+    task.add_done_callback(explain_tasks.discard)
+
+
+if SLOW_QUERY_LOG:
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', start_timer)
+    event.listen(async_engine.sync_engine, 'after_cursor_execute', check_duration)
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from fastapi import UploadFile
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from background import periodic
+from config import UPLOAD_FOLDER, MEDIA_GC_INTERVAL, MEDIA_GC_GRACE, MEDIA_GC_BATCH_SIZE
+from database import AsyncSessionLocal
+from derivatives import variant_paths
+from models import MediaModel, PostsModel, UsersModel
+from uploads import check_declared_size, copy_stream
+
+MEDIA_ROOT = f"{UPLOAD_FOLDER}/media"
+MEDIA_TMP = f"{MEDIA_ROOT}/tmp"
+MEDIA_TRASH = f"{MEDIA_ROOT}/trash"
+
+
+def blob_path(digest: str) -> str:
+    return f"{MEDIA_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def hash_to_temp(source, limit: int) -> tuple[str, str, int]:
+    os.makedirs(MEDIA_TMP, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=MEDIA_TMP, suffix='.part')
+    hasher = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            size = copy_stream(source, target, limit, hasher)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, hasher.hexdigest(), size
+
+
+def publish(temp_path: str, path: str):
+    if os.path.exists(path):
+        os.unlink(temp_path)
+        # Possibly left behind by a rolled back upload; touched so the orphan sweep gives this one its grace period.
+        os.utime(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+
+
+def remove_files(paths: list[str], untouched_since: float | None = None):
+    for path in paths:
+        try:
+            if untouched_since is None or os.stat(path).st_mtime < untouched_since:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def move_to_trash(paths: list[str]) -> list[tuple[str, str]]:
+    os.makedirs(MEDIA_TRASH, exist_ok=True)
+    moved = []
+    for path in paths:
+        trashed = f"{MEDIA_TRASH}/{os.path.basename(path)}"
+        try:
+            os.replace(path, trashed)
+        except FileNotFoundError:
+            continue
+        os.utime(trashed)
+        moved.append((path, trashed))
+    return moved
+
+
+def restore_from_trash(moved: list[tuple[str, str]]):
+    for path, trashed in moved:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(trashed, path)
+
+
+def stale_files(untouched_since: float) -> list[str]:
+    stale = []
+    for directory, _, names in os.walk(MEDIA_ROOT):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime < untouched_since:
+                    stale.append(path)
+            except FileNotFoundError:
+                pass
+    return stale
+
+
+async def store_upload(db: AsyncSession, file: UploadFile) -> MediaModel:
+    """Store ``file`` as a blob and take a reference to it; identical content is stored once."""
+    limit = check_declared_size(file)
+    temp_path, digest, size = await run_in_threadpool(hash_to_temp, file.file, limit)
+    try:
+        # Upserting first holds the row lock, so a concurrent collect_garbage either
+        # finishes with this blob before we publish or skips it. If the caller's
+        # transaction rolls back, the published blob is left to sweep_orphan_files.
+        media = await db.scalar(
+            insert(MediaModel).values(
+                digest=digest,
+                path=blob_path(digest),
+                size=size,
+                content_type=file.content_type,
+                ref_count=1
+            ).on_conflict_do_update(
+                index_elements=[MediaModel.digest],
+                set_={'ref_count': MediaModel.ref_count + 1, 'updated_at': datetime.utcnow()}
+            ).returning(MediaModel).execution_options(populate_existing=True)
+        )
+        await run_in_threadpool(publish, temp_path, media.path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return media
+
+
+async def release(db: AsyncSession, digest: str | None):
+    if digest is None:
+        return
+    await db.execute(
+        update(MediaModel).filter(MediaModel.digest == digest).values(
+            ref_count=MediaModel.ref_count - 1,
+            updated_at=datetime.utcnow()
+        )
+    )
+
+
+async def recount_references(db: AsyncSession, cutoff: datetime):
+    post_refs = select(func.count()).select_from(PostsModel).filter(
+        PostsModel.media_digest == MediaModel.digest).scalar_subquery()
+    avatar_refs = select(func.count()).select_from(UsersModel).filter(
+        UsersModel.avatar_digest == MediaModel.digest).scalar_subquery()
+    await db.execute(
+        update(MediaModel).filter(
+            MediaModel.updated_at < cutoff,
+            MediaModel.ref_count != post_refs + avatar_refs
+        ).values(ref_count=post_refs + avatar_refs).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def collect_garbage(db: AsyncSession, batch_size: int = MEDIA_GC_BATCH_SIZE) -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=MEDIA_GC_GRACE)
+    await recount_references(db, cutoff)
+    collected = 0
+    while True:
+        rows = (await db.scalars(
+            select(MediaModel).filter(
+                MediaModel.ref_count <= 0,
+                MediaModel.updated_at < cutoff
+            ).limit(batch_size).with_for_update(skip_locked=True)
+        )).all()
+        if not rows:
+            break
+        # Files are only deleted once the rows are; until then they wait in the trash, still under the row locks.
+        moved = await run_in_threadpool(move_to_trash, [path for row in rows for path in [row.path, *variant_paths(row)]])
+        try:
+            await db.execute(delete(MediaModel).filter(MediaModel.digest.in_([row.digest for row in rows])))
+            await db.commit()
+        except BaseException:
+            await run_in_threadpool(restore_from_trash, moved)
+            raise
+        await run_in_threadpool(remove_files, [trashed for _, trashed in moved])
+        collected += len(rows)
+        if len(rows) < batch_size:
+            break
+    return collected
+
+
+async def sweep_orphan_files(db: AsyncSession, batch_size: int = MEDIA_GC_BATCH_SIZE) -> int:
+    """Delete files no media row accounts for: rolled back uploads, half-written temp files, a crashed GC's trash.
+
+    Only files untouched for MEDIA_GC_GRACE are considered, which covers uploads whose row isn't committed yet.
+    """
+    untouched_since = time.time() - MEDIA_GC_GRACE
+    orphans, by_digest = [], {}
+    for path in await run_in_threadpool(stale_files, untouched_since):
+        if os.path.dirname(path) == MEDIA_TMP:
+            orphans.append(path)
+        else:
+            by_digest.setdefault(os.path.basename(path).split('.', 1)[0], []).append(path)
+
+    digests, restore = list(by_digest), []
+    for start in range(0, len(digests), batch_size):
+        batch = digests[start:start + batch_size]
+        known = set(await db.scalars(select(MediaModel.digest).filter(MediaModel.digest.in_(batch))))
+        await db.commit()
+        for digest in batch:
+            for path in by_digest[digest]:
+                if digest not in known:
+                    orphans.append(path)
+                elif os.path.dirname(path) == MEDIA_TRASH:
+                    # The GC died before its DELETE committed, so the row still needs the file.
+                    restore.append((f"{os.path.dirname(blob_path(digest))}/{os.path.basename(path)}", path))
+    await run_in_threadpool(restore_from_trash, restore)
+    # Checked again right before unlinking, in case an upload of the same content just touched it.
+    await run_in_threadpool(remove_files, orphans, untouched_since)
+    return len(orphans)
+
+
+@periodic(MEDIA_GC_INTERVAL)
+async def collect_media_garbage():
+    async with AsyncSessionLocal() as db:
+        await collect_garbage(db)
+        await sweep_orphan_files(db)
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import uuid
+
+# Only the database has to come from the environment (or .env); everything else gets a harmless local value.
+for key, value in {
+    'SECRET_KEYS': 'test-secret',
+    'ALGORITHM': 'HS256',
+    'ACCESS_TOKEN_TIME': '1',
+    'REFRESH_TOKEN_TIME': '2',
+    'UPLOAD_FOLDER': tempfile.mkdtemp(prefix='uploads-'),
+    'SENDER_EMAIL': 'sender@example.com',
+    'SENDER_EMAIL_PASSWORD': '',
+    'VONAGE_KEY': 'key',
+    'VONAGE_SECRET': 'secret',
+    'EMAIL_TRANSPORT': 'log',
+    'SMS_TRANSPORT': 'log',
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx
+import pytest
+
+from database import AsyncSessionLocal, create_schema, async_engine
+from models import UsersModel
+from routers.authentication import create_tokens
+
+
+@pytest.fixture(scope='session')
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture(scope='session', autouse=True)
+async def schema(anyio_backend):
+    # Session scoped, so every test shares one event loop and the engine's pooled connections stay usable.
+    await create_schema()
+    yield
+    await async_engine.dispose()
+
+
+@pytest.fixture
+async def db():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def client():
+    # No lifespan: the background jobs would race the tests for the same rows.
+    from main import app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        yield client
+
+
+@pytest.fixture
+def make_user(db):
+    """Insert a user directly and return it with bearer headers, without going through the rate-limited login."""
+    async def make_user(**fields) -> tuple[UsersModel, dict]:
+        name = f't_{uuid.uuid4().hex[:12]}'
+        user = UsersModel(**{'username': name, 'password': 'x', 'full_name': 'Test User', 'gender': 'male',
+                             'email': f'{name}@example.com', **fields})
+        db.add(user)
+        await db.commit()
+        access_token, _ = create_tokens(user.username, user.id)
+        return user, {'Authorization': f'Bearer {access_token}'}
+    return make_user
@@ -0,0 +1,31 @@
+import pytest
+
+import routers.admin
+from slow_queries import slow_queries
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def admin_ids(monkeypatch):
+    ids = []
+    monkeypatch.setattr(routers.admin, 'ADMIN_USER_IDS', ids)
+    return ids
+
+
+async def test_admin_is_recognised_by_id_not_username(client, make_user, admin_ids):
+    admin, admin_headers = await make_user()
+    _, impostor_headers = await make_user()
+    admin_ids.append(admin.id)
+
+    assert (await client.get('/admin/slow-queries', headers=admin_headers)).status_code == 200
+    assert (await client.get('/admin/slow-queries', headers=impostor_headers)).status_code == 403
+    assert (await client.get('/admin/slow-queries')).status_code in (401, 403)
+
+
+async def test_clear_slow_queries(client, make_user, admin_ids):
+    admin, headers = await make_user()
+    admin_ids.append(admin.id)
+    slow_queries.append({'statement': 'SELECT 1'})
+    assert (await client.delete('/admin/slow-queries', headers=headers)).status_code == 200
+    assert list(slow_queries) == []
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from sqlalchemy import delete, func, select
+
+import benchmarks.seed
+from benchmarks.report import compare, percentile, query_totals, summarize
+from benchmarks.seed import seed
+from models import CommentsModel, PostLikesModel, PostsModel, UsersModel
+
+pytestmark = pytest.mark.anyio
+
+# Its own seed value too: the same one would regenerate the ids of real bench_* rows.
+SIZES = dict(users=4, posts_per_user=2, comments_per_post=2, likes_per_post=2, saves_per_user=1, follows_per_user=2,
+             seed_value=987654)
+
+
+@pytest.fixture
+async def prefix(db, monkeypatch):
+    # Kept apart from any real bench_* data in the same database.
+    monkeypatch.setattr(benchmarks.seed, 'USERNAME_PREFIX', 'btest_')
+    yield 'btest_'
+    await db.execute(delete(UsersModel).filter(UsersModel.username.startswith('btest_')))
+    await db.commit()
+
+
+async def totals(db, dataset):
+    on_bench_posts = lambda model: select(func.count()).select_from(model).filter(model.post_id.in_(dataset.post_ids))
+    return (
+        await db.scalar(on_bench_posts(CommentsModel)),
+        await db.scalar(on_bench_posts(PostLikesModel)),
+        tuple((await db.execute(select(func.sum(PostsModel.comments_count), func.sum(PostsModel.likes))
+                                .filter(PostsModel.id.in_(dataset.post_ids)))).one()),
+    )
+
+
+async def test_reused_dataset_is_reset_between_runs(db, prefix):
+    dataset = await seed(**SIZES, reseed=True)
+    assert len(dataset.user_ids) == 4 and len(dataset.post_ids) == 8
+    seeded = await totals(db, dataset)
+    assert seeded == (16, 16, (16, 16))
+
+    # What a run's write scenarios leave behind.
+    db.add(CommentsModel(content='benchmark comment', post_id=dataset.post_ids[0], user_id=dataset.user_ids[0]))
+    like = await db.scalar(select(PostLikesModel).filter(PostLikesModel.post_id.in_(dataset.post_ids)).limit(1))
+    await db.delete(like)
+    await db.commit()
+    assert await totals(db, dataset) != seeded
+
+    assert (await seed(**SIZES)).post_ids == dataset.post_ids
+    assert await totals(db, dataset) == seeded
+
+    with pytest.raises(SystemExit):
+        await seed(**{**SIZES, 'seed_value': 7})
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([3.0], 0.95) == 3
+
+
+def test_summary_and_comparison(tmp_path):
+    before = 'db_queries_per_request_sum{method="GET",route="/posts/{post_uuid}"} 10\n' \
+             'db_queries_per_request_count{method="GET",route="/posts/{post_uuid}"} 10\n'
+    after = 'db_queries_per_request_sum{method="GET",route="/posts/{post_uuid}"} 40\n' \
+            'db_queries_per_request_count{method="GET",route="/posts/{post_uuid}"} 20\n'
+    assert query_totals(after) == {'GET /posts/{post_uuid}': [40.0, 20.0]}
+
+    endpoints = summarize({'GET /posts/{post_uuid}': ([0.02] * 9 + [0.5], [1])}, 2, before, after)
+    row = endpoints['GET /posts/{post_uuid}']
+    assert (row['requests'], row['errors'], row['rps'], row['p50_ms'], row['p99_ms']) == (10, 1, 5.0, 20.0, 500.0)
+    assert row['queries_per_request'] == 3
+
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'endpoints': {'GET /posts/{post_uuid}': {**row, 'p99_ms': 100.0, 'queries_per_request': 1}}}))
+    assert compare(endpoints, str(baseline), 0.2) == [
+        'GET /posts/{post_uuid}: p99_ms 100.0 -> 500.0',
+        'GET /posts/{post_uuid}: queries/request 1 -> 3.0',
+    ]
+    assert compare(endpoints, str(baseline), 5) == ['GET /posts/{post_uuid}: queries/request 1 -> 3.0']
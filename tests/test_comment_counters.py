@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import select, update
+
+from counters import reconcile_comments_count
+from models import PostsModel
+from tests.test_posts import create_post
+
+pytestmark = pytest.mark.anyio
+
+
+async def stored_count(db, post_id) -> int:
+    db.expunge_all()
+    return await db.scalar(select(PostsModel.comments_count).filter(PostsModel.id == post_id))
+
+
+async def test_comments_count_follows_comments_replies_and_deletes(client, db, make_user):
+    _, headers = await make_user()
+    post_id = await create_post(client, headers)
+
+    for expected in (1, 2):
+        response = await client.post(f'/comments/add-comment/{post_id}', headers=headers, json={'comment': 'hi'})
+        assert response.json()['count'] == expected
+    comment_id = (await client.get(f'/comments/{post_id}', headers=headers)).json()['items'][0]['id']
+    for _ in range(2):
+        response = await client.post(f'/comments/reply/{comment_id}', headers=headers,
+                                     params={'comment_uid': comment_id}, json={'reply': 'hello'})
+        assert response.status_code == 201
+    assert await stored_count(db, post_id) == 4
+    assert (await client.get(f'/posts/{post_id}', headers=headers)).json()['comments'] == 4
+
+    reply_id = (await client.get(f'/comments/thread/{post_id}', headers=headers)).json()['items'][0]['replies'][0]['id']
+    assert (await client.delete(f'/comments/delete/{reply_id}', headers=headers)).status_code == 200
+    assert await stored_count(db, post_id) == 3
+    # A top-level comment takes its remaining reply with it.
+    assert (await client.delete(f'/comments/delete/{comment_id}', headers=headers)).status_code == 200
+    assert await stored_count(db, post_id) == 1
+
+
+async def test_comment_on_missing_post_is_404(client, make_user):
+    _, headers = await make_user()
+    response = await client.post('/comments/add-comment/00000000-0000-4000-8000-000000000000', headers=headers,
+                                 json={'comment': 'hi'})
+    assert response.status_code == 404
+
+
+async def test_reconcile_repairs_drifted_counters(client, db, make_user):
+    _, headers = await make_user()
+    post_id = await create_post(client, headers)
+    await client.post(f'/comments/add-comment/{post_id}', headers=headers, json={'comment': 'hi'})
+    await db.execute(update(PostsModel).filter(PostsModel.id == post_id).values(comments_count=40))
+    await db.commit()
+
+    assert await reconcile_comments_count(db, batch_size=5000) >= 1
+    assert await stored_count(db, post_id) == 1
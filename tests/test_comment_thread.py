@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from config import THREAD_REPLY_LIMIT
+from database import async_engine
+from models import PostsModel, CommentsModel, CommentRepliesModel, CommentLikesModel
+
+pytestmark = pytest.mark.anyio
+
+
+@contextmanager
+def counted_queries():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, 'before_cursor_execute', count)
+
+
+async def seed_thread(db, user_id, comments: int, replies: int):
+    post = PostsModel(title='thread', owner_id=user_id)
+    db.add(post)
+    await db.flush()
+    started = datetime.utcnow()
+    comment_rows, reply_rows = [], []
+    for index in range(comments):
+        comment = CommentsModel(content=f'comment {index}', post_id=post.id, user_id=user_id,
+                                created_at=started - timedelta(minutes=index))
+        comment_rows.append(comment)
+        db.add(comment)
+        await db.flush()
+        for position in range(replies):
+            reply = CommentRepliesModel(content=f'reply {index}.{position}', comment_id=comment.id, user_id=user_id,
+                                        created_at=started + timedelta(seconds=position))
+            reply_rows.append(reply)
+            db.add(reply)
+    await db.commit()
+    return post, comment_rows, reply_rows
+
+
+async def test_thread_caps_replies_and_counts_them(client, db, make_user):
+    user, headers = await make_user()
+    post, comments, replies = await seed_thread(db, user.id, 2, THREAD_REPLY_LIMIT + 2)
+    db.add_all([CommentLikesModel(user_id=user.id, comment_id=comments[1].id),
+                CommentLikesModel(user_id=user.id, comment_reply_id=replies[0].id)])
+    await db.commit()
+
+    response = await client.get(f'/comments/thread/{post.id}', headers=headers)
+    assert response.status_code == 200
+    items = response.json()['items']
+    assert [item['id'] for item in items] == [str(comments[0].id), str(comments[1].id)]
+    assert [item['liked'] for item in items] == [False, True]
+    first = items[0]
+    assert first['author']['username'] == user.username
+    assert first['replies_count'] == THREAD_REPLY_LIMIT + 2
+    # Oldest replies first, capped at the limit.
+    assert [reply['content'] for reply in first['replies']] == [f'reply 0.{index}' for index in range(THREAD_REPLY_LIMIT)]
+    assert [reply['liked'] for reply in first['replies']] == [True] + [False] * (THREAD_REPLY_LIMIT - 1)
+
+    response = await client.get(f'/comments/thread/{post.id}', headers=headers, params={'replies': 0})
+    assert [(item['replies_count'], item['replies']) for item in response.json()['items']] == [
+        (THREAD_REPLY_LIMIT + 2, []), (THREAD_REPLY_LIMIT + 2, [])
+    ]
+    response = await client.get(f'/comments/thread/{post.id}', headers=headers,
+                                params={'replies': THREAD_REPLY_LIMIT + 1})
+    assert response.status_code == 422
+
+
+async def test_thread_query_count_does_not_grow_with_the_thread(client, db, make_user):
+    user, headers = await make_user()
+    small, _, _ = await seed_thread(db, user.id, 1, 1)
+    large, _, _ = await seed_thread(db, user.id, 10, THREAD_REPLY_LIMIT + 1)
+
+    with counted_queries() as small_queries:
+        assert (await client.get(f'/comments/thread/{small.id}', headers=headers)).status_code == 200
+    with counted_queries() as large_queries:
+        response = await client.get(f'/comments/thread/{large.id}', headers=headers)
+    assert len(response.json()['items']) == 10
+    # The post lookup, then one query each for the comments, their replies and the viewer's likes.
+    assert len(large_queries) == len(small_queries) == 4
+
+
+async def test_thread_of_missing_post_is_404(client, make_user):
+    _, headers = await make_user()
+    response = await client.get('/comments/thread/00000000-0000-4000-8000-000000000000', headers=headers)
+    assert response.status_code == 404
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+from sqlalchemy import delete, select
+
+import derivatives
+from database import async_engine
+from derivatives import closest_variant, generate_derivatives
+from models import MediaModel
+from storage import blob_path
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def image_media(db):
+    buffer = io.BytesIO()
+    Image.new('RGB', (1600, 800), 'orange').save(buffer, format='PNG')
+    content = buffer.getvalue()
+    digest = hashlib.sha256(content).hexdigest()
+    path = blob_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(content)
+    db.add(MediaModel(digest=digest, path=path, size=len(content), content_type='image/png', ref_count=1))
+    await db.commit()
+    yield digest
+    await db.execute(delete(MediaModel).filter(MediaModel.digest == digest))
+    await db.commit()
+
+
+async def test_variants_are_rendered_without_holding_a_connection(db, image_media, monkeypatch):
+    checked_out = []
+    render = derivatives.render_variants
+
+    def watched_render(path):
+        checked_out.append(async_engine.pool.checkedout())
+        return render(path)
+
+    # A thread pool, so the instrumented function doesn't have to be picklable.
+    monkeypatch.setattr(derivatives, 'render_variants', watched_render)
+    monkeypatch.setattr(derivatives, 'get_process_pool', lambda: ThreadPoolExecutor(1))
+    before = async_engine.pool.checkedout()
+    await generate_derivatives(image_media)
+    assert checked_out == [before]
+
+    media = await db.scalar(select(MediaModel).filter(MediaModel.digest == image_media))
+    assert set(media.variants) == {'thumb', 'medium', 'full'}
+    assert (media.variants['thumb']['width'], media.variants['thumb']['height']) == (150, 75)
+    assert (media.variants['full']['width'], media.variants['full']['height']) == (1080, 540)
+    for variant in media.variants.values():
+        assert os.path.exists(variant['webp']) and os.path.exists(variant['jpeg'])
+    assert closest_variant(media, 300)['name'] == 'medium'
+    assert closest_variant(media, 5000, 'jpeg')['name'] == 'full'
+
+
+async def test_undecodable_upload_is_served_without_variants(client, db, make_user, monkeypatch, caplog):
+    monkeypatch.setattr(derivatives, 'get_process_pool', lambda: ThreadPoolExecutor(1))
+    _, headers = await make_user()
+    response = await client.post('/posts/new-post', headers=headers, json={
+        'title': 'broken', 'access_to_views': True, 'access_to_comments': True, 'access_to_likes': True})
+    post_id = response.json()['post_id']
+    content = b'\xff\xd8\xff\xe0 definitely not a jpeg ' + os.urandom(2000)
+
+    # The render runs as a background task; an exception there would surface from the client call.
+    with caplog.at_level(logging.WARNING, logger='derivatives'):
+        response = await client.post(f'/posts/upload-post-file/{post_id}', headers=headers,
+                                     files={'file': ('photo.jpg', content, 'image/jpeg')})
+    assert response.status_code == 200
+    digest = hashlib.sha256(content).hexdigest()
+    assert f'Could not render variants of {digest}' in caplog.text
+    assert await db.scalar(select(MediaModel.variants).filter(MediaModel.digest == digest)) is None
+
+    response = await client.get(f'/media/posts/{post_id}', headers=headers, params={'size': 150})
+    assert response.status_code == 307
+    assert response.headers['location'].endswith(f'/media/{digest}')
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import select, func
+
+import timelines
+from models import TimelineModel, UsersModel
+from tests.test_posts import create_post
+
+pytestmark = pytest.mark.anyio
+
+
+async def feed_ids(client, headers) -> list:
+    response = await client.get('/feed', headers=headers)
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()['items']]
+
+
+async def test_follow_backfills_fans_out_and_unfollow_drops(client, db, make_user):
+    author, author_headers = await make_user()
+    follower, follower_headers = await make_user()
+    older = [await create_post(client, author_headers, f'old {index}') for index in range(2)]
+
+    response = await client.post(f'/users/follow/{author.id}', headers=follower_headers)
+    assert response.json() == {'msg': 'Followed', 'followers': 1}
+    assert await feed_ids(client, follower_headers) == older[::-1]
+
+    newer = await create_post(client, author_headers, 'new')
+    assert await feed_ids(client, follower_headers) == [newer, *older[::-1]]
+    # The author sees their own posts too.
+    assert await feed_ids(client, author_headers) == [newer, *older[::-1]]
+
+    response = await client.delete(f'/users/unfollow/{author.id}', headers=follower_headers)
+    assert response.json() == {'msg': 'Unfollowed', 'followers': 0}
+    assert await feed_ids(client, follower_headers) == []
+
+
+async def test_follow_is_idempotent(client, db, make_user):
+    author, _ = await make_user()
+    follower, headers = await make_user()
+    assert (await client.post(f'/users/follow/{author.id}', headers=headers)).json()['followers'] == 1
+    assert (await client.post(f'/users/follow/{author.id}', headers=headers)).json() == {'msg': 'Already following'}
+    assert (await client.post(f'/users/follow/{follower.id}', headers=headers)).status_code == 400
+
+    db.expunge_all()
+    counts = (await db.execute(select(UsersModel.id, UsersModel.followers_count, UsersModel.following_count)
+                               .filter(UsersModel.id.in_([author.id, follower.id])))).all()
+    assert {row.id: (row.followers_count, row.following_count) for row in counts} == {
+        author.id: (1, 0), follower.id: (0, 1)
+    }
+
+
+async def test_celebrity_posts_are_pulled_at_read_time(client, db, make_user, monkeypatch):
+    monkeypatch.setattr(timelines, 'FANOUT_FOLLOWER_LIMIT', 0)
+    author, author_headers = await make_user()
+    _, follower_headers = await make_user()
+    await client.post(f'/users/follow/{author.id}', headers=follower_headers)
+    post_id = await create_post(client, author_headers, access_to_likes=False)
+
+    delivered = await db.scalar(select(func.count()).select_from(TimelineModel).filter(
+        TimelineModel.author_id == author.id, TimelineModel.user_id != author.id
+    ))
+    assert delivered == 0
+    response = await client.get('/feed', headers=follower_headers)
+    [item] = response.json()['items']
+    assert item['id'] == post_id
+    assert item['likes'] is False
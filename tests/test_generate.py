@@ -0,0 +1,83 @@
+import uuid
+from argparse import Namespace
+from collections import Counter
+
+import pytest
+
+from benchmarks import generate
+from benchmarks.generate import GENERATORS, Settings, row_id
+
+
+def make_settings(seed: int = 7, **overrides) -> Settings:
+    args = Namespace(**{'seed': seed, 'users': 300, 'posts': 400, 'follows_per_user': 5, 'likes_per_post': 4,
+                        'comments_per_post': 2, 'views_per_post': 3, 'follow_skew': 3, 'post_skew': 1.5, **overrides})
+    return Settings(args, 'hash')
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(generate, 'CHUNK_SIZE', 100)
+
+
+def chunk_count(settings: Settings, table: str) -> int:
+    return -(-generate.parent_count(settings, table) // generate.CHUNK_SIZE)
+
+
+def rows(settings: Settings, table: str, chunks=None) -> list:
+    parents = generate.parent_count(settings, table)
+    chunk_numbers = range(chunk_count(settings, table)) if chunks is None else chunks
+    return [row for chunk in chunk_numbers for row in GENERATORS[table](
+        settings, chunk, chunk * generate.CHUNK_SIZE, min((chunk + 1) * generate.CHUNK_SIZE, parents)
+    )]
+
+
+@pytest.mark.parametrize('table', list(GENERATORS))
+def test_same_seed_gives_the_same_rows_in_any_chunk_order(table):
+    settings = make_settings()
+    in_order = rows(settings, table)
+    assert in_order
+    assert rows(make_settings(), table) == in_order
+    # Workers finish chunks in any order; each chunk only depends on its own number.
+    reversed_chunks = rows(settings, table, reversed(range(chunk_count(settings, table))))
+    assert sorted(reversed_chunks) == sorted(in_order)
+
+
+def test_other_seeds_get_other_ids_and_data():
+    first, second = rows(make_settings(7), 'posts'), rows(make_settings(8), 'posts')
+    assert not {row[0] for row in first} & {row[0] for row in second}
+    assert [row[1] for row in first] != [row[1] for row in second]
+
+
+def test_ids_are_uuids_that_grow_with_the_index():
+    settings = make_settings()
+    ids = [row_id(settings, 'posts', index) for index in range(3)]
+    assert [uuid.UUID(value).version for value in ids] == [4, 4, 4]
+    assert ids == sorted(ids)
+    user_ids = [row[0] for row in rows(settings, 'users')]
+    assert len(set(user_ids)) == settings.users
+
+
+def test_children_match_the_post_counters():
+    settings = make_settings()
+    posts = rows(settings, 'posts')
+    likes, comments = Counter(), Counter()
+    for like in rows(settings, 'post_likes'):
+        likes[like[2]] += 1
+    for comment in rows(settings, 'comments'):
+        comments[comment[2]] += 1
+    assert {post[0]: post[3] for post in posts if post[3]} == dict(likes)
+    assert {post[0]: post[5] for post in posts if post[5]} == dict(comments)
+    # One like per user and post, so the unique constraint holds.
+    pairs = [(like[1], like[2]) for like in rows(settings, 'post_likes')]
+    assert len(pairs) == len(set(pairs))
+
+
+def test_follows_are_skewed_distinct_and_never_self():
+    settings = make_settings()
+    follows = rows(settings, 'follows')
+    pairs = [(follow[1], follow[2]) for follow in follows]
+    assert len(pairs) == len(set(pairs))
+    assert all(follower != following for follower, following in pairs)
+    followers = Counter(following for _, following in pairs)
+    # The lowest user numbers are the celebrities.
+    assert followers[row_id(settings, 'users', 0)] > len(pairs) / settings.users * 5
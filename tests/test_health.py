@@ -0,0 +1,42 @@
+import pytest
+
+import routers.admin
+from routers.health import Readiness
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def readiness():
+    previous = Readiness.ready
+    yield Readiness
+    Readiness.ready = previous
+
+
+async def test_liveness_does_not_depend_on_readiness(client, readiness):
+    readiness.ready = False
+    assert (await client.get('/health/live')).status_code == 200
+
+
+async def test_readiness_follows_startup_and_drain(client, readiness):
+    readiness.ready = False
+    assert (await client.get('/health/ready')).status_code == 503
+    readiness.ready = True
+    response = await client.get('/health/ready')
+    assert response.status_code == 200
+    assert response.json() == {'status': 'ready'}
+
+
+async def test_pool_stats_are_for_admins_only(client, make_user, monkeypatch):
+    admin, admin_headers = await make_user()
+    _, headers = await make_user()
+    monkeypatch.setattr(routers.admin, 'ADMIN_USER_IDS', [admin.id])
+
+    assert (await client.get('/health/pool')).status_code == 404
+    assert (await client.get('/admin/pool')).status_code in (401, 403)
+    assert (await client.get('/admin/pool', headers=headers)).status_code == 403
+    response = await client.get('/admin/pool', headers=admin_headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats['checkouts'] > 0
+    assert stats['server']['in_use'] >= 1 and stats['server']['max_connections'] > 0
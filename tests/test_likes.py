@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from models import PostLikesModel, PostsModel
+
+pytestmark = pytest.mark.anyio
+
+
+async def new_post(client, headers) -> str:
+    response = await client.post('/posts/new-post', headers=headers, json={
+        'title': 'likeable', 'access_to_views': True, 'access_to_comments': True, 'access_to_likes': True})
+    return response.json()['post_id']
+
+
+async def counter_and_rows(db, post_id) -> tuple[int, int]:
+    db.expunge_all()
+    return (
+        await db.scalar(select(PostsModel.likes).filter(PostsModel.id == post_id)),
+        await db.scalar(select(func.count()).select_from(PostLikesModel).filter(PostLikesModel.post_id == post_id)),
+    )
+
+
+async def test_likes_are_idempotent(client, db, make_user):
+    _, headers = await make_user()
+    post_id = await new_post(client, headers)
+
+    response = await client.post(f'/likes/like/{post_id}', headers=headers)
+    assert response.json() == {'msg': 'Successfully liked', 'likes': 1}
+    response = await client.post(f'/likes/like/{post_id}', headers=headers)
+    assert response.json() == {'msg': 'Was liked'}
+    assert await counter_and_rows(db, post_id) == (1, 1)
+
+    response = await client.delete(f'/likes/unlike/{post_id}', headers=headers)
+    assert response.json()['likes'] == 0
+    assert (await client.delete(f'/likes/unlike/{post_id}', headers=headers)).status_code == 404
+    assert await counter_and_rows(db, post_id) == (0, 0)
+
+    assert (await client.post(f'/likes/like/{uuid.uuid4()}', headers=headers)).status_code == 404
+
+
+async def test_concurrent_likes_keep_the_counter_in_step(client, db, make_user):
+    _, owner_headers = await make_user()
+    post_id = await new_post(client, owner_headers)
+    likers = [(await make_user())[1] for _ in range(8)]
+
+    # Every liker sends the same like twice at once; exactly one of each pair counts.
+    responses = await asyncio.gather(*(client.post(f'/likes/like/{post_id}', headers=headers)
+                                       for headers in likers * 2))
+    assert all(response.status_code == 200 for response in responses)
+    assert await counter_and_rows(db, post_id) == (8, 8)
+
+    await asyncio.gather(*(client.delete(f'/likes/unlike/{post_id}', headers=headers) for headers in likers * 2))
+    assert await counter_and_rows(db, post_id) == (0, 0)
+
+
+async def test_comment_likes(client, make_user):
+    _, headers = await make_user()
+    post_id = await new_post(client, headers)
+    await client.post(f'/comments/add-comment/{post_id}', headers=headers, json={'comment': 'nice'})
+    comment_id = (await client.get(f'/comments/{post_id}', headers=headers)).json()['items'][0]['id']
+
+    assert (await client.post(f'/comments/like/{comment_id}', headers=headers)).json()['likes'] == 1
+    assert (await client.post(f'/comments/like/{comment_id}', headers=headers)).json() == {'msg': 'Was liked'}
+    assert (await client.delete(f'/comments/unlike/{comment_id}', headers=headers)).json()['likes'] == 0
+    assert (await client.post(f'/comments/like/{uuid.uuid4()}', headers=headers)).status_code == 404
@@ -0,0 +1,92 @@
+import hashlib
+import os
+
+import pytest
+from sqlalchemy import delete
+
+from database import async_engine
+from models import MediaModel
+from storage import blob_path
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def stored_media(db):
+    content = os.urandom(1000)
+    digest = hashlib.sha256(content).hexdigest()
+    path = blob_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(content)
+    db.add(MediaModel(digest=digest, path=path, size=len(content), content_type='image/png', ref_count=1))
+    await db.commit()
+    yield digest, content
+    await db.execute(delete(MediaModel).filter(MediaModel.digest == digest))
+    await db.commit()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+async def test_serves_ranges_and_validators(client, stored_media):
+    digest, content = stored_media
+    response = await client.get(f'/media/{digest}')
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers['etag'] == f'"{digest}"'
+
+    response = await client.get(f'/media/{digest}', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.content == content[10:20]
+    assert response.headers['content-range'] == f'bytes 10-19/{len(content)}'
+
+    response = await client.get(f'/media/{digest}', headers={'If-None-Match': f'"{digest}"'})
+    assert response.status_code == 304
+
+
+async def test_missing_file_is_not_found(client, stored_media):
+    digest, _ = stored_media
+    os.unlink(blob_path(digest))
+    response = await client.get(f'/media/{digest}')
+    assert response.status_code == 404
+
+
+def media_scope(digest: str, headers: list = (), **extra) -> dict:
+    return {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': f'/media/{digest}', 'raw_path': f'/media/{digest}'.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'test'), *headers], 'client': ('127.0.0.1', 1234), 'server': ('test', 80), **extra}
+
+
+async def receive():
+    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+
+async def test_connection_is_released_before_streaming(stored_media):
+    from main import app
+    digest, content = stored_media
+    checked_out = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            checked_out.append(async_engine.pool.checkedout())
+
+    before = async_engine.pool.checkedout()
+    await app(media_scope(digest), receive, send)
+    assert checked_out == [before]
+
+
+async def test_zero_copy_send_gets_the_file_object(stored_media):
+    from main import app
+    digest, content = stored_media
+    sent = []
+
+    async def send(message):
+        if message['type'] == 'http.response.zerocopysend':
+            # Servers sendfile() from the object while it is still open.
+            file = message['file']
+            file.seek(message['offset'])
+            sent.append(file.read(message['count']))
+
+    scope = media_scope(digest, [(b'range', b'bytes=100-199')], extensions={'http.response.zerocopysend': {}})
+    await app(scope, receive, send)
+    assert sent == [content[100:200]]
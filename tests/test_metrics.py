@@ -0,0 +1,72 @@
+import logging
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from benchmarks.report import query_totals
+from config import N_PLUS_ONE_THRESHOLD
+from database import async_engine
+from metrics import MetricsMiddleware, n_plus_one_total, statement_shape
+from tests.test_posts import create_post
+
+pytestmark = pytest.mark.anyio
+
+
+async def metrics_text(client) -> str:
+    response = await client.get('/metrics')
+    assert response.status_code == 200
+    return response.text
+
+
+def test_statement_shape_ignores_placeholder_counts():
+    assert statement_shape('SELECT * FROM posts\n WHERE id IN ($1::UUID, $2::UUID, $3::UUID)') == \
+        statement_shape('SELECT * FROM posts WHERE id IN ($1::UUID)') == 'SELECT * FROM posts WHERE id IN ($n)'
+
+
+async def test_queries_are_counted_per_route_template(client, make_user):
+    _, headers = await make_user()
+    post_id = await create_post(client, headers)
+    await client.post(f'/comments/add-comment/{post_id}', headers=headers, json={'comment': 'hi'})
+
+    before = query_totals(await metrics_text(client))
+    for _ in range(3):
+        assert (await client.get(f'/comments/thread/{post_id}', headers=headers)).status_code == 200
+    after = query_totals(await metrics_text(client))
+
+    label = 'GET /comments/thread/{post_id}'
+    queries, requests = after[label]
+    previous_queries, previous_requests = before.get(label, [0, 0])
+    assert requests - previous_requests == 3
+    # The post lookup, the comments, their replies and the viewer's likes.
+    assert queries - previous_queries == 3 * 4
+
+
+async def test_statuses_and_unmatched_paths_are_labelled(client):
+    await client.get('/no/such/path/12345')
+    body = await metrics_text(client)
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/metrics",le="+Inf"}' in body
+    assert 'db_pool_checkouts_total ' in body
+
+
+async def test_repeated_statement_shapes_are_flagged_as_n_plus_one(caplog):
+    app = FastAPI()
+
+    @app.get('/loop/{times}')
+    async def loop(times: int):
+        async with async_engine.connect() as connection:
+            for value in range(times):
+                await connection.execute(text('SELECT CAST(:value AS integer)'), {'value': value})
+        return {}
+
+    labels = ('GET', '/loop/{times}')
+    transport = httpx.ASGITransport(app=MetricsMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        await client.get(f'/loop/{N_PLUS_ONE_THRESHOLD}')
+        assert n_plus_one_total.series[labels] == 0
+        with caplog.at_level(logging.WARNING, logger='metrics'):
+            await client.get(f'/loop/{N_PLUS_ONE_THRESHOLD + 1}')
+    assert n_plus_one_total.series[labels] == 1
+    assert 'Possible N+1 in GET /loop/{times}' in caplog.text
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import delete, select, update
+
+from config import NOTIFICATIONS_RETRY_DELAY, NOTIFICATIONS_MAX_RETRY_DELAY, NOTIFICATIONS_MAX_ATTEMPTS
+from models import OutboxModel
+from notifications import SmtpTransport, LogTransport, REDACTED_BODY, deliver_batch, enqueue, enqueue_reset_code, \
+    retry_delay, set_transport, transports
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyHandler:
+    """Refuses every recipient once with a temporary error, then accepts it."""
+
+    def __init__(self):
+        self.refused = set()
+        self.received = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address not in self.refused:
+            self.refused.add(address)
+            return '450 Mailbox busy, try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.append(envelope)
+        return '250 Message accepted'
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    handler = FlakyHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    transport = SmtpTransport('127.0.0.1', port, False, 'noreply@example.com', '', 5)
+    previous = transports['email']
+    set_transport('email', transport)
+    yield handler
+    set_transport('email', previous)
+    transport.close()
+    controller.stop()
+
+
+@pytest.fixture(autouse=True)
+async def empty_outbox(db):
+    await db.execute(delete(OutboxModel))
+    await db.commit()
+
+
+async def outbox_row(db, recipient: str) -> OutboxModel:
+    db.expunge_all()
+    return await db.scalar(select(OutboxModel).filter(OutboxModel.recipient == recipient))
+
+
+async def make_due(db, recipient: str):
+    await db.execute(update(OutboxModel).filter(OutboxModel.recipient == recipient)
+                     .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+    await db.commit()
+
+
+async def test_temporary_failure_is_retried_with_backoff(db, smtp_server):
+    enqueue(db, 'email', 'someone@example.com', 'Your code is 123456', subject='Code')
+    await db.commit()
+
+    before = datetime.utcnow()
+    assert await deliver_batch(db) == 1
+    message = await outbox_row(db, 'someone@example.com')
+    assert message.status == 'pending'
+    assert message.attempts == 1
+    assert '450' in message.last_error
+    assert message.body == 'Your code is 123456'
+    assert before + retry_delay(1) <= message.next_attempt_at <= datetime.utcnow() + retry_delay(1)
+    assert smtp_server.received == []
+
+    # Not due yet, so a second pass leaves it alone.
+    assert await deliver_batch(db) == 0
+
+    await make_due(db, 'someone@example.com')
+    assert await deliver_batch(db) == 1
+    message = await outbox_row(db, 'someone@example.com')
+    assert message.status == 'sent'
+    assert message.attempts == 2
+    assert message.body == REDACTED_BODY
+    assert [envelope.rcpt_tos for envelope in smtp_server.received] == [['someone@example.com']]
+
+    await make_due(db, 'someone@example.com')
+    assert await deliver_batch(db) == 0
+    assert len(smtp_server.received) == 1
+
+
+async def test_message_fails_after_max_attempts(db):
+    class Refusing:
+        def send(self, messages):
+            return {message.id: 'refused' for message in messages}
+
+    previous = transports['sms']
+    set_transport('sms', Refusing())
+    try:
+        enqueue(db, 'sms', '+998900000000', 'Your code is 123456')
+        await db.commit()
+        for attempt in range(1, NOTIFICATIONS_MAX_ATTEMPTS + 1):
+            await make_due(db, '+998900000000')
+            assert await deliver_batch(db) == 1
+            message = await outbox_row(db, '+998900000000')
+            assert message.attempts == attempt
+            assert message.status == ('failed' if attempt == NOTIFICATIONS_MAX_ATTEMPTS else 'pending')
+        assert message.body == REDACTED_BODY
+        await make_due(db, '+998900000000')
+        assert await deliver_batch(db) == 0
+    finally:
+        set_transport('sms', previous)
+
+
+async def test_no_transaction_is_open_while_sending(db):
+    seen = []
+
+    class Watching(LogTransport):
+        def send(self, messages):
+            seen.append(db.in_transaction())
+            return super().send(messages)
+
+    previous = transports['sms']
+    set_transport('sms', Watching())
+    try:
+        enqueue(db, 'sms', '+998900000001', 'hello')
+        await db.commit()
+        assert await deliver_batch(db) == 1
+    finally:
+        set_transport('sms', previous)
+    assert seen == [False]
+    assert (await outbox_row(db, '+998900000001')).status == 'sent'
+
+
+async def test_claimed_messages_are_leased(db):
+    enqueue(db, 'sms', '+998900000002', 'hello')
+    await db.commit()
+
+    class Hanging:
+        def send(self, messages):
+            raise RuntimeError('worker died')
+
+    previous = transports['sms']
+    set_transport('sms', Hanging())
+    try:
+        with pytest.raises(RuntimeError):
+            await deliver_batch(db)
+    finally:
+        set_transport('sms', previous)
+    await db.rollback()
+    # The dead worker's claim was committed, so nobody else picks the message up until the lease runs out.
+    assert await deliver_batch(db) == 0
+    message = await outbox_row(db, '+998900000002')
+    assert message.attempts == 1 and message.next_attempt_at > datetime.utcnow() + timedelta(seconds=60)
+
+
+async def test_delivered_reset_code_is_not_kept(db, make_user):
+    user, _ = await make_user()
+    enqueue_reset_code(db, user, 4321)
+    await db.commit()
+    assert '004321' in (await outbox_row(db, user.email)).body
+
+    previous = transports['email']
+    set_transport('email', LogTransport())
+    try:
+        assert await deliver_batch(db) == 1
+    finally:
+        set_transport('email', previous)
+    db.expunge_all()
+    assert (await outbox_row(db, user.email)).body == REDACTED_BODY
+
+
+def test_retry_delay_doubles_up_to_the_cap():
+    assert retry_delay(1) == timedelta(seconds=NOTIFICATIONS_RETRY_DELAY)
+    assert retry_delay(2) == timedelta(seconds=NOTIFICATIONS_RETRY_DELAY * 2)
+    assert retry_delay(3) == timedelta(seconds=NOTIFICATIONS_RETRY_DELAY * 4)
+    assert retry_delay(100) == timedelta(seconds=NOTIFICATIONS_MAX_RETRY_DELAY)
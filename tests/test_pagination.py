@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import MAX_PAGE_SIZE
+from models import PostsModel, CommentsModel, PostLikesModel, SavesModel
+from pagination import encode_cursor, decode_cursor
+
+pytestmark = pytest.mark.anyio
+
+
+async def collect(client, url: str, headers: dict, limit: int) -> list:
+    ids, cursor = [], None
+    while True:
+        params = {'limit': limit} if cursor is None else {'limit': limit, 'cursor': cursor}
+        response = await client.get(url, headers=headers, params=params)
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body['items']) <= limit
+        ids += [item['id'] for item in body['items']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids
+
+
+async def seed_posts(db, owner_id, count: int) -> list:
+    # Pairs share a created_at, so the id tiebreak has to keep the pages apart.
+    started = datetime.utcnow()
+    posts = [PostsModel(title=f'post {index}', owner_id=owner_id, created_at=started - timedelta(seconds=index // 2))
+             for index in range(count)]
+    db.add_all(posts)
+    await db.commit()
+    return posts
+
+
+def newest_first(rows) -> list:
+    return [str(row.id) for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('2024-01-01T00:00:00', 'abc', 3)
+    assert decode_cursor(cursor, 3) == ['2024-01-01T00:00:00', 'abc', 3]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 7])
+async def test_my_posts_pages_cover_every_post_once(client, db, make_user, limit):
+    user, headers = await make_user()
+    posts = await seed_posts(db, user.id, 7)
+    assert await collect(client, '/posts/get-my-posts', headers, limit) == newest_first(posts)
+
+
+async def test_comments_likes_and_saves_page_through(client, db, make_user):
+    user, headers = await make_user()
+    posts = await seed_posts(db, user.id, 5)
+    started = datetime.utcnow()
+    comments = [CommentsModel(content=f'comment {index}', post_id=posts[0].id, user_id=user.id,
+                              created_at=started - timedelta(seconds=index // 2)) for index in range(5)]
+    likes = [PostLikesModel(user_id=user.id, post_id=post.id) for post in posts]
+    saves = [SavesModel(user_id=user.id, post_id=post.id) for post in posts]
+    db.add_all(comments + likes + saves)
+    await db.commit()
+
+    assert await collect(client, f'/comments/{posts[0].id}', headers, 2) == newest_first(comments)
+    assert await collect(client, '/likes/my-liked-posts', headers, 2) == newest_first(likes)
+    assert await collect(client, '/saves/saved-posts', headers, 2) == newest_first(saves)
+
+
+async def test_rows_added_between_pages_do_not_shift_the_cursor(client, db, make_user):
+    user, headers = await make_user()
+    posts = await seed_posts(db, user.id, 4)
+    first = (await client.get('/posts/get-my-posts', headers=headers, params={'limit': 2})).json()
+    await seed_posts(db, user.id, 2)
+    second = (await client.get('/posts/get-my-posts', headers=headers,
+                               params={'limit': 2, 'cursor': first['next_cursor']})).json()
+    seen = [item['id'] for item in first['items'] + second['items']]
+    assert seen == newest_first(posts)
+
+
+@pytest.mark.parametrize('cursor', ['nonsense', encode_cursor('yesterday', 'not-a-uuid'), encode_cursor(1)])
+async def test_invalid_cursor_is_rejected(client, make_user, cursor):
+    _, headers = await make_user()
+    response = await client.get('/posts/get-my-posts', headers=headers, params={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid cursor'
+
+
+@pytest.mark.parametrize('limit', [0, MAX_PAGE_SIZE + 1])
+async def test_limit_is_bounded(client, make_user, limit):
+    _, headers = await make_user()
+    response = await client.get('/posts/get-my-posts', headers=headers, params={'limit': limit})
+    assert response.status_code == 422
@@ -0,0 +1,38 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from config import PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH
+from passwords import hash_password, needs_rehash, verify_password
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_hash_round_trip():
+    password_hash = await hash_password('Secret-password-1')
+    assert await verify_password(password_hash, 'Secret-password-1')
+    assert not await verify_password(password_hash, 'Secret-password-2')
+    assert not needs_rehash(password_hash)
+
+
+def test_outdated_hashes_need_rehash():
+    assert needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:1000', PASSWORD_SALT_LENGTH))
+    assert needs_rehash(generate_password_hash('x', PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH - 8))
+    assert needs_rehash('plain-text')
+
+
+def test_short_method_names_are_expanded(monkeypatch):
+    # "pbkdf2" is written out as "pbkdf2:sha256:<iterations>", which must not count as outdated.
+    import passwords
+    monkeypatch.setattr(passwords, 'CURRENT_METHOD',
+                        generate_password_hash('probe', 'pbkdf2', PASSWORD_SALT_LENGTH).split('$', 1)[0])
+    assert not needs_rehash(generate_password_hash('x', 'pbkdf2', PASSWORD_SALT_LENGTH))
+
+
+async def test_login_upgrades_an_outdated_hash(client, db, make_user):
+    user, _ = await make_user(password=generate_password_hash('Secret-password-1', 'pbkdf2:sha256:1000', 8))
+    response = await client.post('/auth/login', json={'username_or_phone_number_or_email': user.username,
+                                                      'password': 'Secret-password-1'})
+    assert response.status_code == 200
+    await db.refresh(user)
+    assert not needs_rehash(user.password)
+    assert await verify_password(user.password, 'Secret-password-1')
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database import ASYNC_DATABASE_URL, InstrumentedPool, PoolStats, async_engine, pool_stats
+from general import get_db
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def tiny_engine():
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedPool, pool_size=1, max_overflow=0,
+                                 pool_timeout=0.1)
+    yield engine
+    await engine.dispose()
+
+
+def test_waits_land_in_their_buckets():
+    stats = PoolStats()
+    for seconds in (0.0005, 0.003, 0.003, 2, 60):
+        stats.record_wait(seconds)
+    buckets = stats.snapshot(async_engine.pool)['checkout_wait_seconds']['buckets']
+    assert buckets['le_0.001'] == 1 and buckets['le_0.005'] == 2 and buckets['le_5'] == 1 and buckets['le_inf'] == 1
+    assert stats.wait_max == 60
+    assert stats.wait_total == pytest.approx(62.0065)
+
+
+async def test_checkouts_are_counted(db):
+    before = pool_stats.snapshot(async_engine.pool)
+    await db.execute(text('SELECT 1'))
+    await db.commit()
+    after = pool_stats.snapshot(async_engine.pool)
+    assert after['checkouts'] == before['checkouts'] + 1
+    assert set(after) >= {'size', 'checked_out', 'idle', 'overflow', 'connects', 'checkout_timeouts'}
+
+
+async def test_exhausted_pool_counts_a_timeout_and_answers_503(client, make_user, tiny_engine):
+    from main import app
+    _, headers = await make_user()
+    sessions = async_sessionmaker(bind=tiny_engine)
+
+    async def tiny_db():
+        async with sessions() as session:
+            yield session
+    app.dependency_overrides[get_db] = tiny_db
+    timeouts = pool_stats.timeouts
+    try:
+        async with tiny_engine.connect():
+            response = await client.get('/posts/get-my-posts', headers=headers)
+        assert response.status_code == 503
+        assert response.headers['retry-after'] == '1'
+        assert pool_stats.timeouts == timeouts + 1
+        # Once the connection is back the same request goes through.
+        assert (await client.get('/posts/get-my-posts', headers=headers)).status_code == 200
+    finally:
+        app.dependency_overrides.pop(get_db)
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_post(client, headers, title: str = 'A post', **access) -> str:
+    response = await client.post('/posts/new-post', headers=headers, json={
+        'title': title, 'access_to_views': True, 'access_to_comments': True, 'access_to_likes': True, **access
+    })
+    assert response.status_code == 201
+    return response.json()['post_id']
+
+
+async def test_post_lifecycle(client, make_user):
+    _, headers = await make_user()
+    post_id = await create_post(client, headers)
+
+    response = await client.get(f'/posts/{post_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.json()['title'] == 'A post'
+
+    response = await client.put(f'/posts/update/{post_id}', headers=headers, json={
+        'title': 'Renamed', 'access_to_views': True, 'access_to_comments': False, 'access_to_likes': False
+    })
+    assert response.status_code == 200
+    body = (await client.get(f'/posts/{post_id}', headers=headers)).json()
+    assert body['comments'] is False and body['likes'] is False
+
+    assert (await client.delete(f'/posts/delete/{post_id}', headers=headers)).status_code == 200
+    assert (await client.get(f'/posts/{post_id}', headers=headers)).status_code == 404
+
+
+async def test_registration_and_login(client):
+    username = f'r_{int(time.time() * 1000) % 10 ** 10}'
+    response = await client.post('/auth/register', json={
+        'full_name': 'New User', 'username': username, 'email': f'{username}@example.com', 'password': 'Secret-pass-1'
+    })
+    assert response.status_code == 201
+    response = await client.post('/auth/login', json={'username_or_phone_number_or_email': username,
+                                                      'password': 'Secret-pass-1'})
+    assert response.status_code == 200
+    assert response.json()['access_token']
+
+
+async def test_queries_do_not_block_the_event_loop(client, db):
+    slow = asyncio.create_task(db.execute(text('SELECT pg_sleep(0.5)')))
+    await asyncio.sleep(0.05)
+    started = time.monotonic()
+    assert (await client.get('/health/live')).status_code == 200
+    assert time.monotonic() - started < 0.3
+    assert not slow.done()
+    await slow
@@ -0,0 +1,57 @@
+import uuid
+
+import pytest
+
+from config import BATCH_POSTS_LIMIT
+from tests.test_posts import create_post
+from views import view_buffer
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_keeps_request_order_and_drops_duplicates_and_missing(client, make_user):
+    _, headers = await make_user()
+    first, second, third = [await create_post(client, headers, f'post {index}') for index in range(3)]
+    response = await client.post('/posts/batch', headers=headers, json={
+        'post_ids': [third, first, str(uuid.uuid4()), third, second]
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert [post['id'] for post in body] == [third, first, second]
+    assert [post['title'] for post in body] == ['post 2', 'post 0', 'post 1']
+    assert body[0]['has_liked'] is None and body[0]['has_saved'] is None
+
+
+async def test_batch_hides_private_counters_and_does_not_count_views(client, make_user):
+    _, headers = await make_user()
+    hidden = await create_post(client, headers, access_to_likes=False, access_to_views=False, access_to_comments=False)
+    shown = await create_post(client, headers)
+    await client.post(f'/comments/add-comment/{shown}', headers=headers, json={'comment': 'hi'})
+
+    body = (await client.post('/posts/batch', headers=headers, json={'post_ids': [hidden, shown]})).json()
+    assert {key: body[0][key] for key in ('likes', 'views', 'comments')} == {
+        'likes': False, 'views': False, 'comments': False
+    }
+    assert {key: body[1][key] for key in ('likes', 'views', 'comments')} == {'likes': 0, 'views': 0, 'comments': 1}
+    assert not {post_id for _, post_id in view_buffer.pending} & {hidden, shown}
+
+
+async def test_batch_viewer_flags(client, make_user):
+    _, headers = await make_user()
+    liked, saved, plain = [await create_post(client, headers) for _ in range(3)]
+    await client.post(f'/likes/like/{liked}', headers=headers)
+    await client.post(f'/saves/add/{saved}', headers=headers)
+
+    body = (await client.post('/posts/batch', headers=headers, json={
+        'post_ids': [liked, saved, plain], 'viewer_flags': True
+    })).json()
+    assert [(post['has_liked'], post['has_saved']) for post in body] == [(True, False), (False, True), (False, False)]
+    assert body[0]['likes'] == 1
+
+
+@pytest.mark.parametrize('count', [0, BATCH_POSTS_LIMIT + 1])
+async def test_batch_size_is_bounded(client, make_user, count):
+    _, headers = await make_user()
+    response = await client.post('/posts/batch', headers=headers,
+                                 json={'post_ids': [str(uuid.uuid4()) for _ in range(count)]})
+    assert response.status_code == 422
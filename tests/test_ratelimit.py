@@ -0,0 +1,67 @@
+import uuid
+
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBackend, client_ip, find_rule, parse_limit
+
+pytestmark = pytest.mark.anyio
+
+
+def scope_with(*forwarded: str) -> dict:
+    return {'client': ('10.0.0.2', 5000), 'headers': [(b'x-forwarded-for', value.encode()) for value in forwarded]}
+
+
+def test_forwarded_header_is_ignored_unless_proxies_are_trusted(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUSTED_PROXIES', 0)
+    assert client_ip(scope_with('1.2.3.4')) == '10.0.0.2'
+
+
+def test_client_cannot_spoof_its_address(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUSTED_PROXIES', 1)
+    # The client sent "6.6.6.6"; our proxy appended the address it actually saw.
+    assert client_ip(scope_with('6.6.6.6, 203.0.113.7')) == '203.0.113.7'
+    assert client_ip(scope_with('6.6.6.6', '203.0.113.7')) == '203.0.113.7'
+
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUSTED_PROXIES', 2)
+    assert client_ip(scope_with('6.6.6.6, 203.0.113.7, 10.0.0.1')) == '203.0.113.7'
+    assert client_ip(scope_with('203.0.113.7')) == '10.0.0.2'
+
+
+def test_templated_routes_are_limited():
+    assert find_rule('POST', f'/auth/check-code/123456/{uuid.uuid4()}').name == 'check_code'
+    assert find_rule('POST', '/users/check-code').name == 'check_code'
+    assert find_rule('GET', f'/auth/check-code/123456/{uuid.uuid4()}') is None
+    assert find_rule('POST', '/posts/add-post') is None
+
+
+async def test_memory_bucket_refills():
+    backend = MemoryBackend(max_keys=10)
+    capacity, rate = parse_limit('3/60')
+    tokens = [await backend.take('key', capacity, rate) for _ in range(4)]
+    assert tokens == pytest.approx([2, 1, 0, -1], abs=0.01)
+    backend.buckets['key'] = (-1, backend.buckets['key'][1] - 40)
+    assert await backend.take('key', capacity, rate) == pytest.approx(0, abs=0.01)
+
+
+async def test_login_is_limited_per_identifier(client):
+    identifier = f'nobody_{uuid.uuid4().hex[:10]}'
+    statuses = [
+        (await client.post('/auth/login', json={'username_or_phone_number_or_email': identifier, 'password': 'x'})).status_code
+        for _ in range(6)
+    ]
+    assert statuses[:5] == [400] * 5
+    assert statuses[5] == 429
+
+
+async def test_code_checks_share_a_bucket_per_user(client, make_user):
+    user, headers = await make_user()
+    statuses = []
+    for _ in range(3):
+        statuses.append((await client.post(f'/auth/check-code/123456/{user.id}', json={'new_password': 'x'})).status_code)
+        statuses.append((await client.post('/users/check-code', json={'code': 123456}, headers=headers)).status_code)
+    assert 429 not in statuses[:5]
+    assert statuses[5] == 429
+    response = await client.post(f'/auth/check-code/654321/{user.id}', json={'new_password': 'x'})
+    assert response.status_code == 429
+    assert int(response.headers['retry-after']) > 0
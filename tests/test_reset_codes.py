@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from config import RESET_CODE_TTL
+from models import CodesModel
+from reset_codes import issue_reset_code, sweep_expired_codes, valid_code
+
+pytestmark = pytest.mark.anyio
+
+
+async def expire(db, user_id):
+    await db.execute(update(CodesModel).filter(CodesModel.user_id == user_id)
+                     .values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    await db.commit()
+
+
+async def stored_code(db, user_id) -> CodesModel | None:
+    db.expunge_all()
+    return await db.scalar(select(CodesModel).filter(CodesModel.user_id == user_id))
+
+
+async def test_code_is_reused_until_it_expires(db, make_user):
+    user, _ = await make_user()
+    code = await issue_reset_code(db, user.id)
+    await db.commit()
+    first = await stored_code(db, user.id)
+    assert datetime.utcnow() + timedelta(seconds=RESET_CODE_TTL - 5) < first.expires_at
+
+    assert await issue_reset_code(db, user.id) == code
+    await db.commit()
+    assert (await stored_code(db, user.id)).expires_at == first.expires_at
+
+    await expire(db, user.id)
+    assert await db.scalar(valid_code(user.id, code=code)) is None
+    await issue_reset_code(db, user.id)
+    await db.commit()
+    assert (await stored_code(db, user.id)).expires_at > datetime.utcnow()
+
+
+async def test_expired_code_is_rejected(client, db, make_user):
+    user, _ = await make_user()
+    code = await issue_reset_code(db, user.id)
+    await db.commit()
+    await expire(db, user.id)
+    response = await client.post(f'/auth/check-code/{code}/{user.id}', json={'new_password': 'New-password-1'})
+    assert response.status_code == 404
+
+
+async def test_sweep_removes_only_expired_codes(db, make_user):
+    expired_user, _ = await make_user()
+    valid_user, _ = await make_user()
+    await issue_reset_code(db, expired_user.id)
+    await issue_reset_code(db, valid_user.id)
+    await db.commit()
+    await expire(db, expired_user.id)
+
+    assert await sweep_expired_codes(db, batch_size=1) >= 1
+    assert await stored_code(db, expired_user.id) is None
+    assert await stored_code(db, valid_user.id) is not None
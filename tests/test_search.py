@@ -0,0 +1,55 @@
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def people(make_user):
+    stem = f's{uuid.uuid4().hex[:6]}'
+    users = {}
+    for username, full_name in ((stem, 'Exact Match'), (f'{stem}_two', 'Second'), (f'{stem}x3', 'Third'),
+                                (f'zz{uuid.uuid4().hex[:6]}', f'Named {stem} Here')):
+        users[username], headers = await make_user(username=username, full_name=full_name)
+    return stem, users, headers
+
+
+async def test_autocomplete_matches_prefixes_in_order(client, people):
+    stem, users, headers = people
+    response = await client.get('/search/autocomplete', headers=headers, params={'q': stem.upper()})
+    assert [row['username'] for row in response.json()] == [stem, f'{stem}_two', f'{stem}x3']
+
+    response = await client.get('/search/autocomplete', headers=headers, params={'q': stem, 'limit': 1})
+    assert [row['username'] for row in response.json()] == [stem]
+
+    # LIKE wildcards in the query are taken literally.
+    response = await client.get('/search/autocomplete', headers=headers, params={'q': f'{stem}_'})
+    assert [row['username'] for row in response.json()] == [f'{stem}_two']
+    response = await client.get('/search/autocomplete', headers=headers, params={'q': f'{stem}%'})
+    assert response.json() == []
+
+
+async def test_search_ranks_and_pages_through_every_match(client, people):
+    stem, users, headers = people
+    response = await client.get(f'/search/{stem}', headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body['items'][0]['username'] == stem
+    assert {row['username'] for row in body['items']} == set(users)
+
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 1, **({'cursor': cursor} if cursor else {})}
+        body = (await client.get(f'/search/{stem}', headers=headers, params=params)).json()
+        seen += [row['username'] for row in body['items']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(users)
+
+
+async def test_search_errors(client, people):
+    stem, _, headers = people
+    assert (await client.get(f'/search/{uuid.uuid4().hex}', headers=headers)).status_code == 404
+    assert (await client.get(f'/search/{stem}', headers=headers, params={'cursor': 'nonsense'})).status_code == 400
@@ -0,0 +1,131 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select, update
+from starlette.datastructures import Headers
+
+from config import MEDIA_GC_GRACE, MAX_IMAGE_UPLOAD_SIZE
+from models import MediaModel
+from storage import MEDIA_TMP, MEDIA_TRASH, blob_path, collect_garbage, store_upload, sweep_orphan_files
+
+pytestmark = pytest.mark.anyio
+
+
+def upload(content: bytes, content_type: str = 'application/octet-stream') -> UploadFile:
+    return UploadFile(io.BytesIO(content), size=len(content), headers=Headers({'content-type': content_type}))
+
+
+def age(path: str):
+    old = time.time() - 2 * MEDIA_GC_GRACE
+    os.utime(path, (old, old))
+
+
+async def stored(db, content: bytes) -> tuple[str, str]:
+    media = await store_upload(db, upload(content))
+    return media.digest, media.path
+
+
+async def media_row(db, digest: str) -> MediaModel | None:
+    db.expunge_all()
+    return await db.scalar(select(MediaModel).filter(MediaModel.digest == digest))
+
+
+async def make_collectable(db, digest: str):
+    await db.execute(update(MediaModel).filter(MediaModel.digest == digest).values(
+        ref_count=0, updated_at=datetime.utcnow() - timedelta(seconds=2 * MEDIA_GC_GRACE)))
+    await db.commit()
+
+
+async def test_identical_uploads_are_stored_once(db):
+    content = os.urandom(4096)
+    first = await store_upload(db, upload(content))
+    second = await store_upload(db, upload(content))
+    await db.commit()
+    assert first.digest == second.digest
+    assert (await media_row(db, first.digest)).ref_count == 2
+    with open(blob_path(first.digest), 'rb') as file:
+        assert file.read() == content
+    assert not [name for name in os.listdir(MEDIA_TMP) if name.endswith('.part') and
+                os.path.getmtime(os.path.join(MEDIA_TMP, name)) > time.time() - 60]
+
+
+async def test_oversized_upload_leaves_nothing_behind(db):
+    before = set(os.listdir(MEDIA_TMP)) if os.path.isdir(MEDIA_TMP) else set()
+    with pytest.raises(HTTPException) as error:
+        await store_upload(db, UploadFile(io.BytesIO(b'x' * (MAX_IMAGE_UPLOAD_SIZE + 1)), headers=Headers({'content-type': 'image/png'})))
+    assert error.value.status_code == 413
+    assert set(os.listdir(MEDIA_TMP)) <= before
+
+
+async def test_garbage_collection_deletes_unreferenced_blobs(db):
+    media = await store_upload(db, upload(os.urandom(1024)))
+    await db.commit()
+    await make_collectable(db, media.digest)
+
+    assert await collect_garbage(db) >= 1
+    assert await media_row(db, media.digest) is None
+    assert not os.path.exists(media.path)
+    assert not os.path.exists(f'{MEDIA_TRASH}/{media.digest}')
+
+
+async def test_failed_delete_puts_the_files_back(db, monkeypatch):
+    digest, path = await stored(db, os.urandom(1024))
+    await db.commit()
+    await make_collectable(db, digest)
+
+    commit = db.commit
+    calls = []
+
+    async def failing_commit():
+        calls.append(1)
+        # The first commit belongs to recount_references; fail the one for the DELETE.
+        if len(calls) == 2:
+            raise RuntimeError('connection lost')
+        await commit()
+
+    monkeypatch.setattr(db, 'commit', failing_commit)
+    with pytest.raises(RuntimeError):
+        await collect_garbage(db)
+    monkeypatch.undo()
+    await db.rollback()
+    assert await media_row(db, digest) is not None
+    assert os.path.exists(path)
+
+
+async def test_orphan_sweep(db):
+    _, rolled_back = await stored(db, os.urandom(1024))
+    await db.rollback()
+    assert os.path.exists(rolled_back)
+    _, young_orphan = await stored(db, os.urandom(1024))
+    await db.rollback()
+    kept_digest, kept = await stored(db, os.urandom(1024))
+    await db.commit()
+    half_written = f'{MEDIA_TMP}/leftover.part'
+    with open(half_written, 'wb') as file:
+        file.write(b'partial')
+    os.makedirs(MEDIA_TRASH, exist_ok=True)
+    os.replace(kept, f'{MEDIA_TRASH}/{kept_digest}')
+    for path in (rolled_back, f'{MEDIA_TRASH}/{kept_digest}', half_written):
+        age(path)
+
+    await sweep_orphan_files(db)
+    assert not os.path.exists(rolled_back)
+    assert not os.path.exists(half_written)
+    assert os.path.exists(young_orphan)
+    # A crashed collection left a referenced blob in the trash; it goes back where the row expects it.
+    assert os.path.exists(kept)
+
+
+async def test_reupload_protects_an_old_orphan(db):
+    content = os.urandom(1024)
+    _, orphan = await stored(db, content)
+    await db.rollback()
+    age(orphan)
+    await store_upload(db, upload(content))
+    await sweep_orphan_files(db)
+    await db.commit()
+    assert os.path.exists(orphan)
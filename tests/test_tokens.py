@@ -0,0 +1,54 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from jose import jwt
+
+import general
+from config import ALGORITHM, SECRET_KEYS
+from general import TokenCache
+
+pytestmark = pytest.mark.anyio
+
+
+def test_cache_expires_and_evicts():
+    cache = TokenCache(max_size=2)
+    cache.put('a', {'user_id': '1', 'exp': time.time() + 60})
+    cache.put('expired', {'user_id': '2', 'exp': time.time() - 1})
+    cache.put('no-exp', {'user_id': '3'})
+    assert cache.get('a')['user_id'] == '1'
+    assert cache.get('expired') is None
+    assert cache.get('no-exp') is None
+
+    cache.put('b', {'user_id': '4', 'exp': time.time() + 60})
+    cache.get('a')
+    cache.put('c', {'user_id': '5', 'exp': time.time() + 60})
+    # "b" was the least recently used once "a" was read again.
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+async def test_each_token_is_decoded_once(client, make_user, monkeypatch):
+    _, headers = await make_user()
+    decoded = []
+    decode = general.decode_jwt
+
+    def counting_decode(token):
+        decoded.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(general, 'decode_jwt', counting_decode)
+    for _ in range(3):
+        assert (await client.get('/posts/get-my-posts', headers=headers)).status_code == 200
+    assert len(decoded) == 1
+
+
+async def test_bad_tokens_are_rejected(client, make_user):
+    user, _ = await make_user()
+    expired = jwt.encode({'sub': user.username, 'user_id': str(user.id), 'token_type': 'access',
+                          'exp': datetime.utcnow() - timedelta(minutes=1)}, SECRET_KEYS, algorithm=ALGORITHM)
+    forged = jwt.encode({'sub': user.username, 'user_id': str(user.id), 'token_type': 'access',
+                         'exp': datetime.utcnow() + timedelta(minutes=5)}, 'not-the-key', algorithm=ALGORITHM)
+    for token in (expired, forged, 'garbage'):
+        response = await client.get('/posts/get-my-posts', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 403
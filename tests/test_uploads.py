@@ -0,0 +1,97 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from sqlalchemy import select
+
+import derivatives
+import uploads
+from models import PostsModel, UsersModel
+from uploads import copy_stream
+
+pytestmark = pytest.mark.anyio
+
+
+class ChunkCounter(io.BytesIO):
+    def __init__(self, content: bytes):
+        super().__init__(content)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+@pytest.fixture(autouse=True)
+def in_process_renders(monkeypatch):
+    monkeypatch.setattr(derivatives, 'get_process_pool', lambda: ThreadPoolExecutor(1))
+
+
+async def new_post(client, headers) -> str:
+    response = await client.post('/posts/new-post', headers=headers, json={
+        'title': 'upload', 'access_to_views': True, 'access_to_comments': True, 'access_to_likes': True})
+    return response.json()['post_id']
+
+
+def test_copy_stream_is_chunked_and_bounded(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads, 'UPLOAD_CHUNK_SIZE', 1000)
+    content = os.urandom(4500)
+    source, hasher = ChunkCounter(content), hashlib.sha256()
+    with open(tmp_path / 'copy', 'wb') as target:
+        assert copy_stream(source, target, 5000, hasher) == 4500
+    assert (tmp_path / 'copy').read_bytes() == content
+    assert hasher.hexdigest() == hashlib.sha256(content).hexdigest()
+    # Four full chunks, the remainder, and the empty read that ends the loop.
+    assert source.reads == 6
+
+    with open(tmp_path / 'too-large', 'wb') as target, pytest.raises(HTTPException) as error:
+        copy_stream(io.BytesIO(content), target, 4000)
+    assert error.value.status_code == 413
+
+
+async def test_post_file_upload(client, db, make_user):
+    _, headers = await make_user()
+    post_id = await new_post(client, headers)
+    content = os.urandom(20000)
+    response = await client.post(f'/posts/upload-post-file/{post_id}', headers=headers,
+                                 files={'file': ('clip.bin', content, 'application/octet-stream')})
+    assert response.status_code == 200
+
+    post = await db.scalar(select(PostsModel).filter(PostsModel.id == post_id))
+    assert post.media_digest == hashlib.sha256(content).hexdigest()
+    with open(post.post_file, 'rb') as file:
+        assert file.read() == content
+
+
+async def test_oversized_upload_is_rejected(client, make_user, monkeypatch):
+    monkeypatch.setitem(uploads.UPLOAD_LIMITS, 'video', 10000)
+    _, headers = await make_user()
+    post_id = await new_post(client, headers)
+    response = await client.post(f'/posts/upload-post-file/{post_id}', headers=headers,
+                                 files={'file': ('clip.mp4', os.urandom(10001), 'video/mp4')})
+    assert response.status_code == 413
+
+
+async def test_avatar_upload(client, db, make_user):
+    user, headers = await make_user()
+    response = await client.patch('/users/change-logo', headers=headers,
+                                  files={'new_logo': ('me.txt', b'not an image', 'text/plain')})
+    assert response.status_code == 400
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 300), 'teal').save(buffer, format='PNG')
+    response = await client.patch('/users/change-logo', headers=headers,
+                                  files={'new_logo': ('me.png', buffer.getvalue(), 'image/png')})
+    assert response.status_code == 200
+    db.expunge_all()
+    stored = await db.scalar(select(UsersModel).filter(UsersModel.id == user.id))
+    assert stored.avatar_digest == hashlib.sha256(buffer.getvalue()).hexdigest()
+    assert os.path.exists(stored.avatar_pic)
+    # The derivative job ran as a background task once the response was sent.
+    response = await client.get(f'/media/avatars/{user.id}', headers=headers, params={'size': 150})
+    assert response.status_code == 307
+    assert response.headers['location'].endswith(f'/media/{stored.avatar_digest}?variant=thumb&extension=webp')
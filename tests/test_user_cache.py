@@ -0,0 +1,57 @@
+import random
+
+import pytest
+from sqlalchemy import update
+
+import general
+from general import UserCache, user_cache
+from models import UsersModel
+
+pytestmark = pytest.mark.anyio
+
+
+async def rename_behind_the_apps_back(db, user_id, full_name: str):
+    await db.execute(update(UsersModel).filter(UsersModel.id == user_id).values(full_name=full_name))
+    await db.commit()
+
+
+async def test_current_user_is_cached_until_invalidated(client, db, make_user):
+    user, headers = await make_user(full_name='Before')
+    assert (await client.get('/users/me', headers=headers)).json()['full_name'] == 'Before'
+
+    await rename_behind_the_apps_back(db, user.id, 'Behind')
+    assert (await client.get('/users/me', headers=headers)).json()['full_name'] == 'Before'
+
+    response = await client.patch('/users/update', headers=headers, json={
+        'full_name': 'After', 'username': user.username, 'gender': 'male', 'day_of_birth': '2000-01-01', 'bio': '',
+        'email': user.email, 'phone_number': f'+99890{random.randrange(10 ** 7):07d}'
+    })
+    assert response.status_code == 200
+    assert (await client.get('/users/me', headers=headers)).json()['full_name'] == 'After'
+
+
+async def test_entries_expire_and_are_bounded(db, make_user, monkeypatch):
+    first, _ = await make_user(full_name='First')
+    second, _ = await make_user()
+    cache = UserCache(ttl=30, max_size=1)
+    clock = [1000.0]
+    monkeypatch.setattr(general.time, 'monotonic', lambda: clock[0])
+    db.expunge_all()
+
+    assert (await cache.load(db, str(first.id))).full_name == 'First'
+    await rename_behind_the_apps_back(db, first.id, 'Renamed')
+    db.expunge_all()
+    assert (await cache.load(db, str(first.id))).full_name == 'First'
+    clock[0] += 31
+    db.expunge_all()
+    assert (await cache.load(db, str(first.id))).full_name == 'Renamed'
+
+    await cache.load(db, str(second.id))
+    assert list(cache.entries) == [str(second.id)]
+
+
+async def test_cache_is_shared_by_requests(client, make_user):
+    user, headers = await make_user()
+    user_cache.invalidate(user.id)
+    await client.get('/users/me', headers=headers)
+    assert str(user.id) in user_cache.entries
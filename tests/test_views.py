@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+import views
+from models import PostsModel
+from views import flush_view_buffer, view_buffer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def empty_buffer():
+    view_buffer.drain()
+    yield
+    view_buffer.drain()
+
+
+async def post_views(db, post_id) -> int | None:
+    db.expunge_all()
+    return await db.scalar(select(PostsModel.views).filter(PostsModel.id == post_id))
+
+
+async def test_reads_are_buffered_and_counted_once_per_viewer(client, db, make_user):
+    owner, owner_headers = await make_user()
+    _, viewer_headers = await make_user()
+    post_id = (await client.post('/posts/new-post', headers=owner_headers, json={
+        'title': 'viewed', 'access_to_views': True, 'access_to_comments': True, 'access_to_likes': True
+    })).json()['post_id']
+
+    for headers in (owner_headers, viewer_headers, viewer_headers, viewer_headers):
+        assert (await client.get(f'/posts/{post_id}', headers=headers)).status_code == 200
+    assert len(view_buffer.pending) == 2
+    assert not await post_views(db, post_id)
+
+    await flush_view_buffer()
+    assert view_buffer.pending == set()
+    assert await post_views(db, post_id) == 2
+
+    await client.get(f'/posts/{post_id}', headers=viewer_headers)
+    await flush_view_buffer()
+    assert await post_views(db, post_id) == 2
+
+
+async def test_views_of_deleted_posts_are_dropped(make_user):
+    user, _ = await make_user()
+    view_buffer.record(user.id, uuid.uuid4())
+    await flush_view_buffer()
+    assert view_buffer.pending == set()
+
+
+async def test_failed_flush_keeps_the_views(make_user, monkeypatch):
+    user, _ = await make_user()
+    post_id = uuid.uuid4()
+    view_buffer.record(user.id, post_id)
+
+    async def failing(db, batch):
+        raise ConnectionError('database went away')
+
+    monkeypatch.setattr(views, 'flush_views', failing)
+    with pytest.raises(ConnectionError):
+        await flush_view_buffer()
+    assert view_buffer.pending == {(str(user.id), str(post_id))}
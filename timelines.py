@@ -0,0 +1,94 @@
+from datetime import datetime
+from sqlalchemy import select, update, delete, union, func, literal, tuple_, case
+from sqlalchemy.dialects.postgresql import insert, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import FANOUT_FOLLOWER_LIMIT, TIMELINE_BACKFILL_SIZE
+from database import AsyncSessionLocal
+from models import FollowsModel, PostsModel, TimelineModel, UsersModel
+from pagination import seek_position
+
+TIMELINE_COLUMNS = ['user_id', 'post_id', 'author_id', 'created_at', 'updated_at']
+
+
+def fans_out(followers_count: int) -> bool:
+    # Celebrity posts are pulled into feeds at read time instead of being copied to every follower.
+    return followers_count <= FANOUT_FOLLOWER_LIMIT
+
+
+async def fan_out_post(post_id):
+    """Deliver a new post to its author's timeline and, below the celebrity threshold, to every follower's."""
+    async with AsyncSessionLocal() as db:
+        post = (await db.execute(
+            select(PostsModel.id, PostsModel.owner_id, PostsModel.created_at, UsersModel.followers_count)
+            .join(UsersModel, UsersModel.id == PostsModel.owner_id).filter(PostsModel.id == post_id)
+        )).first()
+        if post is None:
+            return
+        delivered = (literal(post.id, UUID), literal(post.owner_id, UUID), literal(post.created_at),
+                     literal(datetime.utcnow()))
+        recipients = select(literal(post.owner_id, UUID), *delivered)
+        if fans_out(post.followers_count):
+            recipients = recipients.union_all(
+                select(FollowsModel.follower_id, *delivered).filter(FollowsModel.following_id == post.owner_id)
+            )
+        await db.execute(insert(TimelineModel).from_select(TIMELINE_COLUMNS, recipients).on_conflict_do_nothing())
+        await db.commit()
+
+
+async def adjust_follow_counts(db: AsyncSession, follower_id, following_id, delta: int) -> int | None:
+    """Shift both users' counters in one statement and return the followed user's follower count."""
+    rows = await db.execute(
+        update(UsersModel).filter(UsersModel.id.in_([follower_id, following_id])).values(
+            followers_count=case(
+                (UsersModel.id == following_id, func.greatest(UsersModel.followers_count + delta, 0)),
+                else_=UsersModel.followers_count
+            ),
+            following_count=case(
+                (UsersModel.id == follower_id, func.greatest(UsersModel.following_count + delta, 0)),
+                else_=UsersModel.following_count
+            )
+        ).returning(UsersModel.id, UsersModel.followers_count).execution_options(synchronize_session=False)
+    )
+    return {row.id: row.followers_count for row in rows}.get(following_id)
+
+
+async def backfill_timeline(db: AsyncSession, user_id, author_id):
+    # A new follow only pulls in the author's latest posts, older ones stay reachable from their profile.
+    await db.execute(insert(TimelineModel).from_select(
+        TIMELINE_COLUMNS,
+        select(literal(user_id, UUID), PostsModel.id, PostsModel.owner_id, PostsModel.created_at, literal(datetime.utcnow()))
+        .filter(PostsModel.owner_id == author_id)
+        .order_by(PostsModel.created_at.desc(), PostsModel.id.desc()).limit(TIMELINE_BACKFILL_SIZE)
+    ).on_conflict_do_nothing())
+
+
+async def drop_author_from_timeline(db: AsyncSession, user_id, author_id):
+    await db.execute(delete(TimelineModel).filter(TimelineModel.user_id == user_id, TimelineModel.author_id == author_id))
+
+
+def feed_query(user_id, cursor: str | None, limit: int):
+    """Newest-first page of a user's home feed.
+
+    Delivered posts come from one range scan of the user's timeline; posts of
+    followed celebrities are merged in from their own (owner, created_at) index.
+    """
+    delivered = select(TimelineModel.post_id, TimelineModel.created_at).filter(TimelineModel.user_id == user_id)
+    pulled = select(PostsModel.id.label('post_id'), PostsModel.created_at).join(
+        FollowsModel, FollowsModel.following_id == PostsModel.owner_id
+    ).join(UsersModel, UsersModel.id == PostsModel.owner_id).filter(
+        FollowsModel.follower_id == user_id,
+        UsersModel.followers_count > FANOUT_FOLLOWER_LIMIT
+    )
+    if cursor is not None:
+        position = seek_position(cursor)
+        delivered = delivered.filter(tuple_(TimelineModel.created_at, TimelineModel.post_id) < position)
+        pulled = pulled.filter(tuple_(PostsModel.created_at, PostsModel.id) < position)
+    # union() rather than union_all(): posts fanned out before their author crossed the threshold show up in both.
+    candidates = union(
+        delivered.order_by(TimelineModel.created_at.desc(), TimelineModel.post_id.desc()).limit(limit + 1),
+        pulled.order_by(PostsModel.created_at.desc(), PostsModel.id.desc()).limit(limit + 1)
+    ).subquery()
+    return select(PostsModel).join(candidates, PostsModel.id == candidates.c.post_id).order_by(
+        PostsModel.created_at.desc(), PostsModel.id.desc()
+    ).limit(limit + 1)
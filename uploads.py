@@ -0,0 +1,39 @@
+import os
+from fastapi import HTTPException, UploadFile, status
+
+from config import UPLOAD_CHUNK_SIZE, MAX_UPLOAD_SIZE, MAX_IMAGE_UPLOAD_SIZE, MAX_VIDEO_UPLOAD_SIZE
+
+UPLOAD_LIMITS = {
+    'image': MAX_IMAGE_UPLOAD_SIZE,
+    'video': MAX_VIDEO_UPLOAD_SIZE,
+}
+
+
+def upload_limit(content_type: str | None) -> int:
+    return UPLOAD_LIMITS.get((content_type or '').split('/')[0], MAX_UPLOAD_SIZE)
+
+
+def too_large(limit: int):
+    return HTTPException(detail=f'File is too large, limit is {limit} bytes',
+                         status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+
+def check_declared_size(file: UploadFile) -> int:
+    limit = upload_limit(file.content_type)
+    if file.size is not None and file.size > limit:
+        raise too_large(limit)
+    return limit
+
+
+def copy_stream(source, target, limit: int, hasher=None) -> int:
+    written = 0
+    while chunk := source.read(UPLOAD_CHUNK_SIZE):
+        written += len(chunk)
+        if written > limit:
+            raise too_large(limit)
+        if hasher is not None:
+            hasher.update(chunk)
+        target.write(chunk)
+    target.flush()
+    os.fsync(target.fileno())
+    return written
@@ -0,0 +1,61 @@
+from datetime import datetime
+from sqlalchemy import select, update, func, values, column, literal
+from sqlalchemy.dialects.postgresql import insert, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from background import periodic
+from config import VIEWS_FLUSH_INTERVAL, VIEWS_FLUSH_BATCH_SIZE
+from database import AsyncSessionLocal
+from models import PostViewsModel, PostsModel, UsersModel
+
+
+class ViewBuffer:
+    """Collects (user, post) views in memory until the next flush."""
+
+    def __init__(self):
+        self.pending: set[tuple[str, str]] = set()
+
+    def record(self, user_id, post_id):
+        self.pending.add((str(user_id), str(post_id)))
+
+    def drain(self) -> list[tuple[str, str]]:
+        pending, self.pending = self.pending, set()
+        return list(pending)
+
+    def restore(self, views: list[tuple[str, str]]):
+        self.pending.update(views)
+
+
+view_buffer = ViewBuffer()
+
+
+async def flush_views(db: AsyncSession, views: list[tuple[str, str]]):
+    now = datetime.utcnow()
+    buffered = values(column('user_id', UUID(as_uuid=False)), column('post_id', UUID(as_uuid=False)), name='buffered').data(views)
+    # Joining posts/users drops views of rows deleted since they were recorded.
+    inserted = insert(PostViewsModel).from_select(
+        ['user_id', 'post_id', 'created_at', 'updated_at'],
+        select(buffered.c.user_id, buffered.c.post_id, literal(now), literal(now))
+        .join(PostsModel, PostsModel.id == buffered.c.post_id)
+        .join(UsersModel, UsersModel.id == buffered.c.user_id)
+    ).on_conflict_do_nothing(constraint='_user_post_uc').returning(PostViewsModel.post_id).cte('inserted')
+    deltas = select(inserted.c.post_id, func.count().label('delta')).group_by(inserted.c.post_id).subquery()
+    await db.execute(
+        update(PostsModel).filter(PostsModel.id == deltas.c.post_id).values(
+            views=func.coalesce(PostsModel.views, 0) + deltas.c.delta
+        ).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+@periodic(VIEWS_FLUSH_INTERVAL)
+async def flush_view_buffer():
+    views = view_buffer.drain()
+    for start in range(0, len(views), VIEWS_FLUSH_BATCH_SIZE):
+        batch = views[start:start + VIEWS_FLUSH_BATCH_SIZE]
+        try:
+            async with AsyncSessionLocal() as db:
+                await flush_views(db, batch)
+        except Exception:
+            view_buffer.restore(views[start:])
+            raise